@@ -0,0 +1,7 @@
+from admission.admission import (
+    AdmissionGate,
+    hashing_gate,
+    default_gate,
+    all_gates,
+    gate_stats,
+)
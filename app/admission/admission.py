@@ -0,0 +1,215 @@
+# std
+import asyncio
+import collections
+from typing import Any, AsyncIterator, Callable, Optional
+
+# user
+import env_vars
+import exceptions
+import metrics
+
+
+class AdmissionGate:
+    """FastAPI dependency that limits how many requests a route serves at once.
+
+    Requests past `max_concurrent` wait in a queue of at most `max_queue` entries for up to
+    `max_wait` seconds. When the queue is full, or the wait runs out, the request is shed with a 503
+    and a Retry-After header instead of adding to the latency of everything already admitted."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait: float,
+        retry_after: int,
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError("An admission gate needs to admit at least one request")
+
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+
+        self._active = 0
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+        self._admitted = 0
+        self._rejected = 0
+
+    async def __call__(self) -> AsyncIterator[None]:
+        await self._acquire()
+
+        try:
+            yield
+
+        finally:
+            self._release()
+
+    async def _acquire(self) -> None:
+        # a free slot and nobody waiting ahead of us: go straight through ===
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._admitted += 1
+            self._observe()
+            return
+        # ===
+
+        # no room left to wait: shed the request ===
+        if len(self._waiters) >= self.max_queue:
+            self._rejected += 1
+            metrics.count_shed(self.name)
+            raise exceptions.create_http_service_overloaded(self.retry_after)
+        # ===
+
+        # wait for a finishing request to hand over its slot ===
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._observe()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            metrics.count_shed(self.name)
+            self._abandon(waiter)
+            raise exceptions.create_http_service_overloaded(self.retry_after)
+
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        self._admitted += 1
+        # ===
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Removes a waiter that gave up, passing on the slot it was handed in the meantime if
+        any"""
+
+        if waiter.done() and not waiter.cancelled():
+            self._release()
+            return
+
+        waiter.cancel()
+
+        try:
+            self._waiters.remove(waiter)
+
+        except ValueError:
+            pass
+
+        self._observe()
+
+    def _release(self) -> None:
+        # hand the slot straight to the next waiter so the count of active requests stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+        else:
+            self._active -= 1
+
+        self._observe()
+
+    def _observe(self) -> None:
+        metrics.observe_admission(self.name, self._active, len(self._waiters))
+
+    def stats(self) -> dict[str, Any]:
+        """Returns a snapshot of the gate usage"""
+
+        return {
+            "name": self.name,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+        }
+
+
+class SettingsGate(AdmissionGate):
+    """Admission gate whose budget comes from the settings. It is read when the first request
+    arrives, so that the routes can be built without loading the settings"""
+
+    def __init__(self, name: str, read_limits: Callable[[], dict[str, Any]]) -> None:
+        # the budget from the settings replaces this one on first use
+        super().__init__(name, max_concurrent=1, max_queue=0, max_wait=0, retry_after=1)
+
+        self._read_limits: Optional[Callable[[], dict[str, Any]]] = read_limits
+
+    def _configure(self) -> None:
+        if self._read_limits is None:
+            return
+
+        limits = self._read_limits()
+        self._read_limits = None
+
+        if limits["max_concurrent"] < 1:
+            raise ValueError("An admission gate needs to admit at least one request")
+
+        self.max_concurrent = limits["max_concurrent"]
+        self.max_queue = limits["max_queue"]
+        self.max_wait = limits["max_wait"]
+        self.retry_after = limits["retry_after"]
+
+    async def _acquire(self) -> None:
+        self._configure()
+        await super()._acquire()
+
+    def stats(self) -> dict[str, Any]:
+        self._configure()
+
+        return super().stats()
+
+
+# every gate created by the application, keyed by name
+all_gates: dict[str, AdmissionGate] = {}
+
+
+def _register(gate: AdmissionGate) -> AdmissionGate:
+    all_gates[gate.name] = gate
+
+    return gate
+
+
+def gate_stats() -> dict[str, dict[str, Any]]:
+    """Returns the usage of every gate of the application, keyed by name"""
+
+    return {name: gate.stats() for name, gate in all_gates.items()}
+
+
+def _hashing_limits() -> dict[str, Any]:
+    return {
+        "max_concurrent": env_vars.ADMISSION_HASHING_MAX_CONCURRENT,
+        "max_queue": env_vars.ADMISSION_HASHING_MAX_QUEUE,
+        "max_wait": env_vars.ADMISSION_MAX_WAIT_SECONDS,
+        "retry_after": env_vars.ADMISSION_RETRY_AFTER_SECONDS,
+    }
+
+
+def _default_limits() -> dict[str, Any]:
+    return {
+        "max_concurrent": env_vars.ADMISSION_DEFAULT_MAX_CONCURRENT,
+        "max_queue": env_vars.ADMISSION_DEFAULT_MAX_QUEUE,
+        "max_wait": env_vars.ADMISSION_MAX_WAIT_SECONDS,
+        "retry_after": env_vars.ADMISSION_RETRY_AFTER_SECONDS,
+    }
+
+
+def hashing_gate(name: str) -> AdmissionGate:
+    """Creates the gate for a route that does password hashing, these get a small budget"""
+
+    return _register(SettingsGate(name, _hashing_limits))
+
+
+def default_gate(name: str) -> AdmissionGate:
+    """Creates the gate for a cheap route, these get a budget of their own so that a storm on the
+    hashing routes can't starve them"""
+
+    return _register(SettingsGate(name, _default_limits))
@@ -0,0 +1,136 @@
+# standard imports
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+# third party imports
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from jose import jwt
+
+# user imports
+import tokens
+
+ALGORITHMS = ["HS256", "RS256", "ES256", "EdDSA"]
+
+
+def generate_key_material(algorithm: str) -> tuple[str, str]:
+    """Returns a fresh shared secret, or a PEM private key and its PEM public key"""
+
+    if algorithm.startswith("HS"):
+        secret = "benchmark-secret-that-is-long-enough-for-hs256"
+        return secret, secret
+
+    if algorithm.startswith("RS"):
+        private_key: Any = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    elif algorithm.startswith("ES"):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+
+    return private_pem.decode(), public_pem.decode()
+
+
+def ops_per_second(func: Callable[[], Any], seconds: float) -> float:
+    """Calls the function for about the given time and returns how many calls it made per second"""
+
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+
+    return calls / (time.perf_counter() - start)
+
+
+def bench_raw_jose(
+    algorithm: str, private_pem: str, public_pem: str, claims: dict, seconds: float
+) -> tuple[float, float]:
+    """Measures python-jose called with the raw secret or PEM, which parses the key on every call"""
+
+    token = jwt.encode(claims, private_pem, algorithm=algorithm)
+
+    encode = ops_per_second(lambda: jwt.encode(claims, private_pem, algorithm=algorithm), seconds)
+    decode = ops_per_second(lambda: jwt.decode(token, public_pem, algorithms=algorithm), seconds)
+
+    return encode, decode
+
+
+def bench_backend(
+    backend: tokens.JWTBackend, algorithm: str, private_pem: str, claims: dict, seconds: float
+) -> tuple[float, float]:
+    """Measures a backend using a key it prepared once"""
+
+    key = tokens.load_key(algorithm, private_pem, backend=backend)
+    token = key.encode(claims)
+
+    encode = ops_per_second(lambda: key.encode(claims), seconds)
+    decode = ops_per_second(lambda: key.decode(token), seconds)
+
+    return encode, decode
+
+
+def main() -> None:
+    """Prints the encode and decode ops/sec of every JWT backend for each algorithm"""
+
+    parser = argparse.ArgumentParser(description="Compares the speed of the JWT backends")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each measure")
+    parser.add_argument("--algorithms", nargs="+", default=ALGORITHMS, choices=ALGORITHMS)
+    args = parser.parse_args()
+    seconds = args.seconds
+
+    claims = {
+        "sub": "joe@example.com",
+        "username": "joejoejoe",
+        "role": "standard",
+        "disabled": False,
+        "ver": 0,
+        "exp": datetime.utcnow() + timedelta(minutes=30),
+    }
+
+    backends: list[tokens.JWTBackend] = [tokens.JoseBackend()]
+
+    try:
+        backends.append(tokens.PyJWTBackend())
+
+    except ValueError as err:
+        print(f"Skipping the pyjwt backend: {err}")
+
+    print(f"{'algorithm':<10}{'backend':<14}{'encode/s':>12}{'decode/s':>12}")
+
+    for algorithm in args.algorithms:
+        private_pem, public_pem = generate_key_material(algorithm)
+        results = []
+
+        # how tokens were handled before the backends, as the baseline ===
+        if algorithm in tokens.JoseBackend.algorithms:
+            encode, decode = bench_raw_jose(algorithm, private_pem, public_pem, claims, seconds)
+            results.append(("jose (raw)", encode, decode))
+        # ===
+
+        for backend in backends:
+            if algorithm in backend.algorithms:
+                encode, decode = bench_backend(backend, algorithm, private_pem, claims, seconds)
+                results.append((backend.name, encode, decode))
+
+        for name, encode, decode in results:
+            print(f"{algorithm:<10}{name:<14}{encode:>12,.0f}{decode:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
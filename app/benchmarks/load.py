@@ -0,0 +1,277 @@
+# standard imports
+import argparse
+import asyncio
+import json
+import platform
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+# third party imports
+import beanie
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import email_handler
+import env_vars
+import loop_monitor
+import models
+import queries
+import utils
+from main import app
+
+PASSWORD = "p@ssword1"
+API = "/api/v1/user"
+
+
+@dataclass
+class Scenario:
+    """One endpoint to load: `prepare` creates what the requests need, one item per request, and
+    `send` makes the request for one of those items"""
+
+    expected_status: int
+    prepare: Callable[[int], Awaitable[list[Any]]]
+    send: Callable[[httpx.AsyncClient, Any], Awaitable[httpx.Response]]
+
+
+class Fixtures:
+    """Creates the users, tokens and one time records the requests need, straight through the
+    queries so that preparing a run doesn't count towards it"""
+
+    def __init__(self, hashed_password: str) -> None:
+        self.hashed_password = hashed_password
+
+    async def user(self) -> str:
+        email = f"{uuid.uuid4().hex}@example.com"
+        await queries.create_user_record(f"user{uuid.uuid4().hex[:8]}", email, self.hashed_password)
+        return email
+
+    async def users(self, count: int) -> list[str]:
+        return [await self.user() for _ in range(count)]
+
+    async def auth_headers(self, count: int) -> list[dict[str, str]]:
+        headers = []
+
+        for email in await self.users(count):
+            token = await utils.create_token(email, env_vars.ACCESS_TOKEN_EXPIRE_MINUTES)
+            headers.append({"Authorization": f"Bearer {token}"})
+
+        return headers
+
+    async def shared_auth_headers(self, count: int) -> list[dict[str, str]]:
+        return (await self.auth_headers(1)) * count
+
+    async def sign_up_links(self, count: int) -> list[str]:
+        links = []
+
+        for _ in range(count):
+            link = str(uuid.uuid4())
+            await queries.create_a_create_user_record(link, f"{link}@example.com")
+            links.append(link)
+
+        return links
+
+    async def reset_links(self, count: int) -> list[str]:
+        links = []
+
+        for email in await self.users(count):
+            link = str(uuid.uuid4())
+            token = await utils.create_token(email, env_vars.ACCESS_TOKEN_EXPIRE_MINUTES)
+            await queries.save_forgot_password_attempt(email, link, token)
+            links.append(link)
+
+        return links
+
+    async def new_emails(self, count: int) -> list[str]:
+        return [f"{uuid.uuid4().hex}@example.com" for _ in range(count)]
+
+    async def shared_email(self, count: int) -> list[str]:
+        return [await self.user()] * count
+
+
+def scenarios(fixtures: Fixtures) -> dict[str, Scenario]:
+    """The endpoints added by router.add_routers, each with what it needs to succeed"""
+
+    return {
+        "token": Scenario(
+            200,
+            fixtures.shared_email,
+            lambda client, email: client.post(
+                f"{API}/token/", data={"username": email, "password": PASSWORD}
+            ),
+        ),
+        "details": Scenario(
+            200,
+            fixtures.shared_auth_headers,
+            lambda client, headers: client.get(f"{API}/details/", headers=headers),
+        ),
+        "new-email": Scenario(
+            202,
+            fixtures.new_emails,
+            lambda client, email: client.post(
+                f"{API}/new-email/", params={"provided_email": email}
+            ),
+        ),
+        "new-user": Scenario(
+            201,
+            fixtures.sign_up_links,
+            lambda client, link: client.post(
+                f"{API}/new-user/{link}/",
+                json={"username": f"user{uuid.uuid4().hex[:8]}", "password": PASSWORD},
+            ),
+        ),
+        "forgot-password": Scenario(
+            202,
+            fixtures.shared_email,
+            lambda client, email: client.post(f"{API}/forgot-password/", json={"email": email}),
+        ),
+        "reset-password": Scenario(
+            202,
+            fixtures.reset_links,
+            lambda client, link: client.post(
+                f"{API}/reset-password/{link}/", json={"password": PASSWORD}
+            ),
+        ),
+        "disable": Scenario(
+            202,
+            fixtures.auth_headers,
+            lambda client, headers: client.put(f"{API}/disable/", headers=headers),
+        ),
+        "edit": Scenario(
+            202,
+            fixtures.auth_headers,
+            lambda client, headers: client.put(
+                f"{API}/edit/", headers=headers, json={"role": "admin"}
+            ),
+        ),
+        "update-password": Scenario(
+            202,
+            fixtures.auth_headers,
+            lambda client, headers: client.put(
+                f"{API}/update-password/", headers=headers, json={"password": PASSWORD}
+            ),
+        ),
+    }
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of the sorted values"""
+
+    index = max(0, int(round(fraction * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+async def drive(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int
+) -> dict[str, Any]:
+    """Sends the requests from `concurrency` concurrent workers and returns the throughput and the
+    latency percentiles in ms"""
+
+    items = await scenario.prepare(requests)
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    next_item = iter(items)
+
+    async def worker() -> None:
+        for item in next_item:
+            start = time.perf_counter()
+            response = await scenario.send(client, item)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    return {
+        "requests": requests,
+        "errors": requests - statuses.get(str(scenario.expected_status), 0),
+        "statuses": statuses,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1],
+    }
+
+
+async def run(endpoints: list[str], requests: int, concurrency: int) -> dict[str, Any]:
+    started_at = datetime.utcnow().isoformat()
+
+    # an in-memory stand-in for MongoDB and a transport that keeps the emails in memory
+    database = AsyncMongoMockClient().greymintauth_load
+    await beanie.init_beanie(database=database, document_models=models.DOCUMENT_MODELS)
+    settings = await utils.configure_password_hashing()
+    email_handler.start_dispatcher(email_handler.MemoryTransport())
+
+    fixtures = Fixtures(await utils.hash_password(PASSWORD))
+    results = {}
+
+    # anything blocking the event loop under load is logged with its stack and counted here
+    monitor = loop_monitor.LoopMonitor(
+        interval=env_vars.LOOP_MONITOR_INTERVAL_MS / 1000,
+        threshold=env_vars.LOOP_MONITOR_THRESHOLD_MS / 1000,
+    )
+    monitor.start()
+
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://load") as client:
+            for name, scenario in scenarios(fixtures).items():
+                if name in endpoints:
+                    results[name] = await drive(client, scenario, requests, concurrency)
+                    report(name, results[name])
+
+    finally:
+        await monitor.stop()
+        await email_handler.stop_dispatcher()
+        utils.shutdown_password_pool()
+
+    event_loop = monitor.stats()
+    print(f"Event loop max lag {event_loop['max_lag_ms']:.1f} ms, {event_loop['blocks']} blocks")
+
+    return {
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "requests": requests,
+        "concurrency": concurrency,
+        "password_hashing": utils.describe_context_settings(settings),
+        "results": results,
+        "event_loop": event_loop,
+    }
+
+
+def report(name: str, result: dict[str, Any]) -> None:
+    print(
+        f"{name:<17}{result['rps']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+        f"{result['p99_ms']:>9.2f}{result['errors']:>8}"
+    )
+
+
+def main() -> None:
+    """Loads every endpoint of the in-process app and saves the throughput and latencies as JSON"""
+
+    names = list(scenarios(Fixtures("")))
+
+    parser = argparse.ArgumentParser(description="Measures the throughput and tail latency")
+    parser.add_argument("--requests", type=int, default=200, help="requests sent to each endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--endpoints", nargs="+", default=names, choices=names)
+    parser.add_argument("--output", default="load-results.json", help="file the results go to")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<17}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    results = asyncio.run(run(args.endpoints, args.requests, args.concurrency))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(f"Saved the results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# standard imports
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+
+# third party imports
+from bson import ObjectId
+
+# user imports
+import env_vars
+import models
+import utils
+
+PASSWORD = "p@ssword1"
+
+# the functions every request depends on, and the request and response models
+CASES = [
+    "hash_password",
+    "validate_password",
+    "create_token",
+    "get_data_from_jwt",
+    "validate_username",
+    "UserDetails",
+    "user_details_from",
+    "UserCreateStepTwo",
+    "UserUpdate",
+    "UserUpdatePassword",
+    "UserForgotPasswordRequest",
+    "UserResetPasswordRequest",
+    "Token",
+    "TokenData",
+]
+
+# cases that hash a password take hundreds of ms each, they get fewer calls for the allocations
+SLOW_CASES = {"hash_password", "validate_password"}
+
+
+async def build_cases() -> dict[str, Callable[[], Awaitable[Any]]]:
+    """Returns the functions to measure, each wrapped in a call with realistic arguments"""
+
+    hashed_password = await utils.hash_password(PASSWORD)
+    user = models.UserAuthRecord(
+        id=ObjectId(), email="joe@example.com", disabled=False, hashed_password=hashed_password
+    )
+    expires_in = env_vars.ACCESS_TOKEN_EXPIRE_MINUTES
+    token = await utils.create_token(user.email, expires_in)
+    details = models.UserDetailsRecord(
+        username="joejoejoe", email="joe@example.com", disabled=False, role="standard"
+    )
+
+    async def call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return func(*args, **kwargs)
+
+    return {
+        "hash_password": lambda: utils.hash_password(PASSWORD),
+        "validate_password": lambda: utils.validate_password(user, PASSWORD),
+        "create_token": lambda: utils.create_token(user.email, expires_in),
+        "get_data_from_jwt": lambda: utils.get_data_from_jwt(token),
+        "validate_username": lambda: utils.validate_username("joejoejoe"),
+        "UserDetails": lambda: call(
+            utils.UserDetails,
+            username="joejoejoe",
+            email="joe@example.com",
+            disabled=False,
+            role="standard",
+        ),
+        "user_details_from": lambda: call(utils.user_details_from, details),
+        "UserCreateStepTwo": lambda: call(
+            utils.UserCreateStepTwo, username="joejoejoe", password=PASSWORD
+        ),
+        "UserUpdate": lambda: call(utils.UserUpdate, email="joe@example.com", role="admin"),
+        "UserUpdatePassword": lambda: call(utils.UserUpdatePassword, password=PASSWORD),
+        "UserForgotPasswordRequest": lambda: call(
+            utils.UserForgotPasswordRequest, email="joe@example.com"
+        ),
+        "UserResetPasswordRequest": lambda: call(utils.UserResetPasswordRequest, password=PASSWORD),
+        "Token": lambda: call(utils.Token, access_token=token, token_type="bearer"),
+        "TokenData": lambda: call(utils.TokenData, username="joejoejoe"),
+    }
+
+
+async def ops_per_second(case: Callable[[], Awaitable[Any]], seconds: float) -> float:
+    """Calls the case for about the given time, at least 3 times, and returns the calls per
+    second"""
+
+    calls = 0
+    start = time.perf_counter()
+
+    while calls < 3 or time.perf_counter() - start < seconds:
+        await case()
+        calls += 1
+
+    return calls / (time.perf_counter() - start)
+
+
+async def peak_bytes_per_call(case: Callable[[], Awaitable[Any]], calls: int) -> int:
+    """Returns the median of the most memory one call allocated on top of what was already in
+    use. tracemalloc slows everything down, so this is measured apart from the speed"""
+
+    peaks = []
+    tracemalloc.start()
+
+    try:
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await case()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+
+    finally:
+        tracemalloc.stop()
+
+    return int(statistics.median(peaks))
+
+
+async def measure(names: list[str], seconds: float, repeat: int, calls: int) -> dict[str, Any]:
+    settings = await utils.configure_password_hashing()
+
+    try:
+        cases = await build_cases()
+        results = {}
+
+        for name in names:
+            case = cases[name]
+            # the best of the rounds, the others were slowed down by something else
+            ops = max([await ops_per_second(case, seconds) for _ in range(repeat)])
+            peak = await peak_bytes_per_call(case, 3 if name in SLOW_CASES else calls)
+            results[name] = {"ops_per_sec": ops, "peak_bytes": peak}
+            print(f"{name:<28}{ops:>14,.1f}{peak:>14,}")
+
+    finally:
+        utils.shutdown_password_pool()
+
+    return {
+        "python": sys.version.split()[0],
+        "password_hashing": utils.describe_context_settings(settings),
+        "jwt": f"{env_vars.ALGORITHM} on {env_vars.JWT_BACKEND}",
+        "results": results,
+    }
+
+
+def regressions(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[str]:
+    """Returns a line for every function that is slower than the baseline by more than the
+    threshold, a percentage"""
+
+    found = []
+
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+
+        before = baseline["results"][name]["ops_per_sec"]
+        change = (result["ops_per_sec"] - before) / before * 100
+
+        if change < -threshold:
+            after = result["ops_per_sec"]
+            found.append(f"{name}: {before:,.1f} -> {after:,.1f} ops/sec ({change:+.1f}%)")
+
+    return found
+
+
+def main() -> None:
+    """Measures the utils every request depends on, saves a baseline or checks against one"""
+
+    parser = argparse.ArgumentParser(description="Measures the speed and memory of the utils")
+    parser.add_argument("--seconds", type=float, default=0.5, help="time of each speed round")
+    parser.add_argument("--repeat", type=int, default=3, help="speed rounds, the best one counts")
+    parser.add_argument("--calls", type=int, default=50, help="calls measured for the memory")
+    parser.add_argument("--only", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--save-baseline", metavar="PATH", help="save the results as the baseline")
+    parser.add_argument("--check", metavar="PATH", help="compare the results to this baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=20, help="slowdown in percent that fails --check"
+    )
+    args = parser.parse_args()
+
+    print(f"{'function':<28}{'ops/sec':>14}{'peak bytes':>14}")
+    current = asyncio.run(measure(args.only, args.seconds, args.repeat, args.calls))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(current, file, indent=2)
+
+        print(f"Saved the baseline to {args.save_baseline}")
+
+    if args.check:
+        with open(args.check) as file:
+            baseline = json.load(file)
+
+        for setting in ("python", "password_hashing", "jwt"):
+            if baseline.get(setting) != current[setting]:
+                print(f"Warning: the baseline used {setting} {baseline.get(setting)}")
+
+        found = regressions(baseline, current, args.threshold)
+
+        if found:
+            print(f"Slower than the baseline by more than {args.threshold:g}%:")
+            print("\n".join(found))
+            sys.exit(1)
+
+        print(f"No function is slower than the baseline by more than {args.threshold:g}%")
+
+
+if __name__ == "__main__":
+    main()
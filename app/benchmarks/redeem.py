@@ -0,0 +1,138 @@
+# standard imports
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+# third party imports
+import beanie
+import motor.motor_asyncio
+from pymongo import monitoring
+
+# user imports
+import env_vars
+import models
+import queries
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands sent to the server, each one is a round trip"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+async def redeem_with_lookup_then_delete(record_uuid: str) -> Optional[models.CreateUser]:
+    """How the create user controller redeemed a link before: a lookup, then a delete that looked
+    the record up again by id"""
+
+    record = await queries.get_create_user_record_by_uuid(record_uuid)
+
+    if record is None:
+        return None
+
+    again = await models.CreateUser.get(record.id)
+
+    if again is not None:
+        await again.delete()
+
+    return record
+
+
+async def measure(
+    redeem: Callable[[str], Awaitable[Optional[models.CreateUser]]],
+    records: int,
+    counter: Optional[CommandCounter],
+) -> tuple[list[float], Optional[float]]:
+    """Creates the records and redeems each of them, returns the latency of every redemption in ms
+    and the round trips each took"""
+
+    uuids = [str(uuid.uuid4()) for _ in range(records)]
+
+    for record_uuid in uuids:
+        await queries.create_a_create_user_record(record_uuid, f"{record_uuid}@example.com")
+
+    latencies = []
+    commands_before = counter.count if counter else 0
+
+    for record_uuid in uuids:
+        start = time.perf_counter()
+        assert await redeem(record_uuid) is not None
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    round_trips = (counter.count - commands_before) / records if counter else None
+
+    return latencies, round_trips
+
+
+def report(name: str, latencies: list[float], round_trips: Optional[float]) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    trips = f"{round_trips:.1f}" if round_trips is not None else "n/a"
+
+    print(
+        f"{name:<22}{trips:>12}{statistics.mean(latencies):>10.3f}"
+        f"{statistics.median(latencies):>10.3f}{p95:>10.3f}"
+    )
+
+
+async def run(mongo: str, use_mongomock: bool, records: int) -> None:
+    counter = None
+
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+
+    else:
+        counter = CommandCounter()
+        client = motor.motor_asyncio.AsyncIOMotorClient(mongo, event_listeners=[counter])
+
+    database = client.greymintauth_benchmark
+    await beanie.init_beanie(database=database, document_models=[models.CreateUser])
+
+    try:
+        before = await measure(redeem_with_lookup_then_delete, records, counter)
+        after = await measure(queries.redeem_create_user_record, records, counter)
+
+    finally:
+        if not use_mongomock:
+            await client.drop_database(database.name)
+
+    print(f"{'redemption':<22}{'round trips':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    report("lookup then delete", *before)
+    report("find_one_and_delete", *after)
+
+    saved = statistics.mean(before[0]) - statistics.mean(after[0])
+    print(f"saved {saved:.3f} ms per redemption on average")
+
+
+def main() -> None:
+    """Compares redeeming a one time link with a lookup and a delete to a find_one_and_delete"""
+
+    parser = argparse.ArgumentParser(description="Measures the time saved by atomic redemptions")
+    parser.add_argument("--mongo", default=env_vars.MONGO_CONNECTION, help="MongoDB to measure")
+    parser.add_argument(
+        "--mongomock",
+        action="store_true",
+        help="use an in-memory stand-in, this only shows the CPU cost and can't count round trips",
+    )
+    parser.add_argument("--records", type=int, default=500)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.mongo, args.mongomock, args.records))
+
+
+if __name__ == "__main__":
+    main()
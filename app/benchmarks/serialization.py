@@ -0,0 +1,128 @@
+# standard imports
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+# third party imports
+import beanie
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, serialize_response
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+from main import app
+import models
+import utils
+
+
+def find_route(name: str) -> APIRoute:
+    """Returns the route of the endpoint with the given name"""
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.name == name:
+            return route
+
+    raise ValueError(f"No endpoint called {name}")
+
+
+def before(route: APIRoute, build: Callable[[], Any]) -> Callable[[], Awaitable[Response]]:
+    """How a response was made before: the endpoint returned a validated model, and FastAPI
+    validated it again against the response_model and encoded it with jsonable_encoder and json"""
+
+    async def respond() -> Response:
+        content = await serialize_response(
+            field=route.secure_cloned_response_field, response_content=build()
+        )
+        return JSONResponse(content, status_code=route.status_code)
+
+    return respond
+
+
+def after(route: APIRoute, build: Callable[[], Any]) -> Callable[[], Awaitable[Response]]:
+    """How a response is made now: the endpoint returns the response of a model built without
+    validation, encoded with orjson"""
+
+    async def respond() -> Response:
+        return utils.model_response(build(), route.status_code)
+
+    return respond
+
+
+async def us_per_response(respond: Callable[[], Awaitable[Response]], calls: int) -> float:
+    """Returns the time building one response takes, in microseconds"""
+
+    start = time.perf_counter()
+
+    for _ in range(calls):
+        await respond()
+
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+async def run(calls: int) -> None:
+    # Beanie models can only be built once their collection is initialized
+    database = AsyncMongoMockClient().greymintauth_benchmark
+    await beanie.init_beanie(database=database, document_models=[models.User])
+
+    user = models.User(
+        id=ObjectId(),
+        username="joejoejoe",
+        email="joe@example.com",
+        hashed_password="$2b$12$" + "x" * 53,
+        created_ts=time.time(),
+    )
+    details = models.UserDetailsRecord(
+        username="joejoejoe", email="joe@example.com", disabled=False, role="standard"
+    )
+    token = "x" * 220
+
+    # endpoint: what it built before, what it builds now
+    endpoints: dict[str, tuple[Callable[[], Any], Callable[[], Any]]] = {
+        "get_user_details": (
+            lambda: utils.UserDetails(
+                username=details.username,
+                email=details.email,
+                disabled=details.disabled,
+                role=details.role,
+            ),
+            lambda: utils.user_details_from(details),
+        ),
+        "update_user": (
+            lambda: utils.UserDetails(**user.dict()),
+            lambda: utils.user_details_from(user),
+        ),
+        "get_token": (
+            lambda: utils.Token(access_token=token, token_type="bearer"),
+            lambda: utils.Token.construct(access_token=token, token_type="bearer"),
+        ),
+    }
+
+    print(f"{'endpoint':<20}{'before us':>12}{'after us':>12}{'speedup':>10}")
+
+    for name, (build_before, build_after) in endpoints.items():
+        route = find_route(name)
+
+        # both have to send the same body
+        sent_before = await before(route, build_before)()
+        sent_after = await after(route, build_after)()
+        assert sent_before.body == sent_after.body
+
+        before_us = await us_per_response(before(route, build_before), calls)
+        after_us = await us_per_response(after(route, build_after), calls)
+        print(f"{name:<20}{before_us:>12.2f}{after_us:>12.2f}{before_us / after_us:>9.1f}x")
+
+
+def main() -> None:
+    """Prints the cost of building the response of the endpoints that return models"""
+
+    parser = argparse.ArgumentParser(description="Compares the cost of serializing responses")
+    parser.add_argument("--calls", type=int, default=20_000, help="responses built per measure")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# standard imports
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# the directory main.py lives in, the measured processes run from there
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MAIN = (
+    "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+)
+
+
+def measure_import() -> float:
+    """Returns the time importing main takes in a fresh interpreter, in ms"""
+
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN],
+        cwd=APP_DIR,
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    return float(output.stdout.strip().splitlines()[-1]) * 1000
+
+
+def measure_first_response(port: int, timeout: float) -> float:
+    """Starts the server and returns the time from launching it to its first answer, in ms. The
+    index sync is skipped so that no MongoDB is needed to get there"""
+
+    env = {**os.environ, "SYNC_INDEXES_ON_STARTUP": "false", "MONGO_WARM_CONNECTIONS": "0"}
+    url = f"http://127.0.0.1:{port}/"
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "error"],
+        cwd=APP_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return (time.perf_counter() - start) * 1000
+
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    raise RuntimeError("The server exited before answering")
+
+                time.sleep(0.01)
+
+        raise RuntimeError(f"The server didn't answer within {timeout} seconds")
+
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name: str, times: list[float]) -> None:
+    print(f"{name:<18}{min(times):>10.0f}{statistics.median(times):>10.0f}{max(times):>10.0f}")
+
+
+def main() -> None:
+    """Prints how long importing main and getting the first response of a fresh server take"""
+
+    parser = argparse.ArgumentParser(description="Measures the cold start of the application")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes for each measure")
+    parser.add_argument("--port", type=int, default=3999, help="port of the measured server")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for a server")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    first_responses = [measure_first_response(args.port, args.timeout) for _ in range(args.runs)]
+
+    print(f"{'cold start':<18}{'min ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    report("import main", imports)
+    report("first response", first_responses)
+
+
+if __name__ == "__main__":
+    main()
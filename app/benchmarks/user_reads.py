@@ -0,0 +1,128 @@
+# standard imports
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+# third party imports
+import beanie
+import motor.motor_asyncio
+from bson import ObjectId
+
+# user imports
+import env_vars
+import models
+import queries
+
+READS: dict[str, Callable[[str], Awaitable[Any]]] = {
+    "user": queries.get_user_by_email,
+    "details": queries.get_user_details_by_email,
+    "auth": queries.get_user_auth_by_email,
+}
+
+
+def cpu_us_per_call(func: Callable[[], Any], calls: int) -> float:
+    """Returns the CPU time one call of the function takes, in microseconds"""
+
+    start = time.process_time()
+
+    for _ in range(calls):
+        func()
+
+    return (time.process_time() - start) / calls * 1_000_000
+
+
+async def cpu_us_per_lookup(func: Callable[[], Awaitable[Any]], calls: int) -> float:
+    """Returns the CPU time one lookup takes, in microseconds. Waiting on the database isn't CPU
+    time so this is what the lookup costs the process, not its latency"""
+
+    start = time.process_time()
+
+    for _ in range(calls):
+        await func()
+
+    return (time.process_time() - start) / calls * 1_000_000
+
+
+def bench_mapping(calls: int) -> None:
+    """Compares turning a stored user document into a Beanie model and into a record"""
+
+    document = {
+        "_id": ObjectId(),
+        "username": "joejoejoe",
+        "email": "joe@example.com",
+        "disabled": False,
+        "role": "standard",
+        "hashed_password": "$2b$12$" + "x" * 53,
+        "created_ts": time.time(),
+        "token_version": 3,
+    }
+    pairs = [
+        ("user", models.User, models.UserRecord),
+        ("details", models.UserDetailsView, models.UserDetailsRecord),
+        ("auth", models.UserAuthView, models.UserAuthRecord),
+    ]
+
+    print(f"{'mapping':<12}{'beanie us':>12}{'raw us':>12}")
+
+    for name, model, record in pairs:
+        beanie_us = cpu_us_per_call(lambda: model.parse_obj(document), calls)
+        raw_us = cpu_us_per_call(lambda: record.from_document(document), calls)
+        print(f"{name:<12}{beanie_us:>12.2f}{raw_us:>12.2f}")
+
+
+async def bench_lookups(calls: int) -> None:
+    """Compares the CPU cost of the reads on the Beanie path and on the raw path"""
+
+    await queries.create_user_record("joejoejoe", "joe@example.com", "$2b$12$" + "x" * 53)
+
+    print(f"{'lookup':<12}{'beanie us':>12}{'raw us':>12}")
+
+    for name, read in READS.items():
+        results = []
+
+        for read_path in ("beanie", "raw"):
+            env_vars.USER_READ_PATH = read_path
+            results.append(await cpu_us_per_lookup(lambda: read("joe@example.com"), calls))
+
+        print(f"{name:<12}{results[0]:>12.2f}{results[1]:>12.2f}")
+
+
+async def run(mongo: str, use_mongomock: bool, calls: int, lookups: int) -> None:
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+
+    else:
+        client = motor.motor_asyncio.AsyncIOMotorClient(mongo)
+
+    # Beanie models can only be built once their collection is initialized
+    database = client.greymintauth_benchmark
+    await beanie.init_beanie(database=database, document_models=[models.User])
+
+    try:
+        bench_mapping(calls)
+        print()
+        await bench_lookups(lookups)
+
+    finally:
+        if not use_mongomock:
+            await client.drop_database(database.name)
+
+
+def main() -> None:
+    """Prints the CPU cost of reading users through Beanie and through the raw path"""
+
+    parser = argparse.ArgumentParser(description="Compares the CPU cost of the user read paths")
+    parser.add_argument("--calls", type=int, default=20_000, help="calls for the mapping")
+    parser.add_argument("--lookups", type=int, default=2_000, help="calls for the lookups")
+    parser.add_argument("--mongo", default=env_vars.MONGO_CONNECTION, help="MongoDB to measure")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory stand-in")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.mongo, args.mongomock, args.calls, args.lookups))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,4 @@ from controller.disable_user import router as disable_user_router
 from controller.forgot_password import router as forgot_password_router
 from controller.reset_password import router as reset_password_router
 from controller.update_password import router as update_password_router
+from controller.jwks import router as jwks_router
@@ -6,6 +6,7 @@ import fastapi
 import exceptions
 import utils
 import queries
+import tracing
 
 router = fastapi.APIRouter()
 
@@ -14,6 +15,7 @@ router = fastapi.APIRouter()
     path="/",
     status_code=fastapi.status.HTTP_201_CREATED,
 )
+@tracing.traced("controller")
 async def create_user(create_user_id: str, req_data: utils.UserCreateStepTwo) -> None:
     """Endpoint to complete the user creation process"""
 
@@ -28,14 +30,12 @@ async def create_user(create_user_id: str, req_data: utils.UserCreateStepTwo) ->
         )
     # ===
 
-    # delete Create User record ===
-    create_user_record = await queries.get_create_user_record_by_uuid(create_user_id)
+    # redeem the Create User record, only one request can get it ===
+    create_user_record = await queries.redeem_create_user_record(create_user_id)
     if create_user_record is None:
         raise exceptions.HTTPInvalidDataProvided
 
     user_email = create_user_record.user_email
-
-    await queries.delete_create_user_record_by_id(str(create_user_record.id))
     # ===
 
     # === hash the provided password and add the user to the User Table
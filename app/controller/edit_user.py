@@ -1,13 +1,14 @@
 # std
+from typing import Any
+
 # 3p
 import fastapi
-import jose
 
 # user
-import env_vars
 import exceptions
-import utils
 import queries
+import tracing
+import utils
 
 router = fastapi.APIRouter()
 
@@ -17,31 +18,12 @@ router = fastapi.APIRouter()
     status_code=fastapi.status.HTTP_202_ACCEPTED,
     response_model=utils.UserDetails,
 )
+@tracing.traced("controller")
 async def update_user(
-    to_update: utils.UserUpdate, token: str = fastapi.Depends(utils.oauth2_scheme)
-) -> utils.UserDetails:
+    to_update: utils.UserUpdate, claims: dict[str, Any] = fastapi.Depends(utils.get_token_claims)
+) -> fastapi.Response:
     """Endpoint used to update a users information"""
 
-    # get variables for creating the token: if don't exist, raise exception ===
-    secret = env_vars.SECRET_KEY
-    algorithm = env_vars.ALGORITHM
-    # ===
-
-    # get the email from JWT ===
-    try:
-        email = await utils.get_data_from_jwt(token, secret, algorithm)
-
-    except (jose.JWTError, jose.jwt.ExpiredSignatureError, jose.jwt.JWTClaimsError) as err:
-        raise exceptions.create_http_jwterror(err)
-    # ===
-
-    # get user from email: if no user found, raise exception ===
-    user = await queries.get_user_by_email(email)
-
-    if user is None:
-        raise exceptions.HTTPUserWasNotFound
-    # ===
-
     # create a dictionary with only the fields that should be updated ===
     set_command = {}
     for k, v in to_update.dict().items():
@@ -49,8 +31,13 @@ async def update_user(
             set_command[k] = v
     # ===
 
-    # update the user in the database and return the user with the new information ===
-    await user.update({"$set": set_command})
+    # update the user in the database and return the user as it was saved ===
+    user = await queries.update_user_by_email(claims["sub"], set_command)
+
+    if user is None:
+        raise exceptions.HTTPUserWasNotFound
+
+    utils.invalidate_user(claims["sub"], user.email)
 
-    return utils.UserDetails(**user.dict())
+    return utils.model_response(utils.user_details_from(user), fastapi.status.HTTP_202_ACCEPTED)
     # ===
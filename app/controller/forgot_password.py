@@ -8,7 +8,9 @@ import fastapi
 import env_vars
 import exceptions
 import email_handler
+import models
 import queries
+import tracing
 import utils
 
 router = fastapi.APIRouter()
@@ -18,6 +20,7 @@ router = fastapi.APIRouter()
     path="/",
     status_code=fastapi.status.HTTP_202_ACCEPTED,
 )
+@tracing.traced("controller")
 async def forgot_password(req: utils.UserForgotPasswordRequest) -> None:
     """Endpoint used to handle users that have forgotten their password"""
 
@@ -28,38 +31,23 @@ async def forgot_password(req: utils.UserForgotPasswordRequest) -> None:
         raise exceptions.HTTPUserWasNotFound
     # ===
 
-    # get forgot password record from database: if found, delete it ===
-    record = await queries.get_forgot_password_attempt_by_user_id(str(user.id))
-
-    if record is not None:
-        await queries.delete_forgot_password_attempt_by_id(str(record.id))
-    # ===
-
-    # get variables for checking the token: if env vars don't exist, raise exception ===
-    secret = env_vars.SECRET_KEY
-    algorithm = env_vars.ALGORITHM
+    # delete any previous forgot password record of the user ===
+    await queries.delete_forgot_password_attempts_by_user_id(str(user.id))
     # ===
 
     # create a uuid and jwt that will be saved in the forgot password db ===
     path_parameter = str(uuid.uuid5(uuid.uuid1(), user.email))
-    token = await utils.create_token(user.email, 30, secret, algorithm)
+    token = await utils.create_token(user.email, models.FORGOT_PASSWORD_EXPIRE_MINUTES)
     await queries.save_forgot_password_attempt(str(user.id), path_parameter, token)
     # ===
 
-    # send email to user with url and jwt as a path parameter and return ===
-    email_handler.SESClient.send_email(
-        FromEmailAddress="do-not-reply@greyminties.com",
-        Destination={
-            "ToAddresses": [
-                req.email,
-            ],
-        },
-        Content={
-            "Template": {
-                "TemplateName": "Test_ForgotPasswordTemplateV3",
-                "TemplateData": f'\
-                {{"name":"{user.username}","url":"{env_vars.FRONTEND_URL}/reset-password/{path_parameter}"}}',
-            }
+    # queue an email to the user with url and jwt as a path parameter and return ===
+    await email_handler.send_email(
+        to_address=req.email,
+        template_name="Test_ForgotPasswordTemplateV3",
+        template_data={
+            "name": user.username,
+            "url": f"{env_vars.FRONTEND_URL}/reset-password/{path_parameter}",
         },
     )
 
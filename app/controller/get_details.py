@@ -1,12 +1,12 @@
 # std
+from typing import Any
+
 # 3p
 import fastapi
-import jose
 
 # user
 import env_vars
-import exceptions
-import queries
+import tracing
 import utils
 
 router = fastapi.APIRouter()
@@ -17,29 +17,19 @@ router = fastapi.APIRouter()
     status_code=fastapi.status.HTTP_200_OK,
     response_model=utils.UserDetails,
 )
+@tracing.traced("controller")
 async def get_user_details(
-    token: str = fastapi.Depends(utils.oauth2_scheme),
-) -> utils.UserDetails:
+    claims: dict[str, Any] = fastapi.Depends(utils.get_token_claims),
+) -> fastapi.Response:
     """Endpoint to get user information"""
 
-    # get variables for creating the token: if doesn't exist, raise exception ===
-    secret = env_vars.SECRET_KEY
-    algorithm = env_vars.ALGORITHM
-    # ===
-
-    # get the email from JWT ===
-    try:
-        email = await utils.get_data_from_jwt(token, secret, algorithm)
-
-    except (jose.JWTError, jose.jwt.ExpiredSignatureError, jose.jwt.JWTClaimsError) as err:
-        raise exceptions.create_http_jwterror(err)
+    # claims-bearing tokens already carry the details: answer without going to the database. They
+    # are the details from when the token was issued, `ver` isn't checked, see the README ===
+    if env_vars.DETAILS_FROM_CLAIMS and "username" in claims:
+        details = utils.user_details_from_claims(claims)
+        return utils.model_response(details, fastapi.status.HTTP_200_OK)
     # ===
 
-    # get user from username: if the user is not found, raise exception ===
-    user = await queries.get_user_by_email(email)
-
-    if user is None:
-        raise exceptions.HTTPUserWasNotFound
+    details = await utils.get_current_user_details(claims)
 
-    return utils.UserDetails(**user.dict())
-    # ===
+    return utils.model_response(utils.user_details_from(details), fastapi.status.HTTP_200_OK)
@@ -6,6 +6,7 @@ import fastapi
 import env_vars
 import exceptions
 import queries
+import tracing
 import utils
 
 
@@ -17,9 +18,10 @@ router = fastapi.APIRouter()
     status_code=fastapi.status.HTTP_200_OK,
     response_model=utils.Token,
 )
+@tracing.traced("controller")
 async def get_token(
     form_data: fastapi.security.OAuth2PasswordRequestForm = fastapi.Depends(),
-) -> utils.Token:
+) -> fastapi.Response:
     """Endpoint to get a token for a user"""
 
     # extract the username and password from the form ===
@@ -29,21 +31,39 @@ async def get_token(
 
     # get variables for creating the token: if doesn't exist, raise exception ===
     expires_in = env_vars.ACCESS_TOKEN_EXPIRE_MINUTES
-    secret = env_vars.SECRET_KEY
-    algorithm = env_vars.ALGORITHM
     # ===
 
-    # check to see if the user exist in the database: if not raise exception ===
-    user = await queries.get_user_by_email(email)
+    # check to see if the user exist in the database: if not raise exception. Claims-bearing tokens
+    # need the whole user, otherwise only what is needed to check the password is read ===
+    if env_vars.TOKEN_FORMAT == "claims":
+        user = await queries.get_user_by_email(email)
+
+    else:
+        user = await queries.get_user_auth_by_email(email)
+
     if user is None:
         raise exceptions.HTTPInvalidCredentials
 
-    if not await utils.validate_password(user, password):
+    is_valid, new_hashed_password = await utils.validate_and_rehash_password(user, password)
+    if not is_valid:
         raise exceptions.HTTPInvalidCredentials
     # ===
 
-    # create and return a token
-    token = await utils.create_token(user.email, expires_in, secret, algorithm)
+    # the stored hash was made with outdated settings: upgrade it now that we know the password.
+    # If the password was changed while this one was verified, the login is refused ===
+    if new_hashed_password is not None:
+        if not await queries.set_user_hashed_password(
+            user.id, user.hashed_password, new_hashed_password
+        ):
+            raise exceptions.HTTPInvalidCredentials
+
+        utils.invalidate_user(user.email)
+    # ===
+
+    # create and return a token, carrying the user details when claims-bearing tokens are on ===
+    claims = utils.create_user_claims(user) if env_vars.TOKEN_FORMAT == "claims" else None
+    token = await utils.create_token(user.email, expires_in, claims=claims)
 
-    return utils.Token(access_token=token, token_type="bearer")
+    token_response = utils.Token.construct(access_token=token, token_type="bearer")
+    return utils.model_response(token_response, fastapi.status.HTTP_200_OK)
     # ===
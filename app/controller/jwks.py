@@ -0,0 +1,55 @@
+# std
+import hashlib
+import json
+
+# 3p
+import fastapi
+
+# user
+import env_vars
+import tokens
+import tracing
+
+router = fastapi.APIRouter()
+
+# the serialized key set and its etag by key ids, so that it is only rebuilt when the keys change
+_serialized_jwks: dict[tuple[str, ...], tuple[str, str]] = {}
+
+
+def serialize_jwks() -> tuple[str, str]:
+    """Returns the key set as JSON along with its etag"""
+
+    jwks = tokens.get_jwks()
+    kids = tuple(key["kid"] for key in jwks["keys"])
+
+    if kids not in _serialized_jwks:
+        body = json.dumps(jwks, separators=(",", ":"), sort_keys=True)
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+        _serialized_jwks.clear()
+        _serialized_jwks[kids] = (body, etag)
+
+    return _serialized_jwks[kids]
+
+
+@router.get(
+    path="/jwks.json",
+    status_code=fastapi.status.HTTP_200_OK,
+)
+@tracing.traced("controller")
+async def get_jwks(request: fastapi.Request) -> fastapi.Response:
+    """Endpoint that publishes the public keys other services can verify our tokens with"""
+
+    # the key set only changes when the keys do, so it can be cached for a long time ===
+    body, etag = serialize_jwks()
+    headers = {
+        "Cache-Control": f"public, max-age={env_vars.JWKS_MAX_AGE_SECONDS}",
+        "ETag": etag,
+    }
+    # ===
+
+    # the client already has this key set ===
+    if request.headers.get("if-none-match") == etag:
+        return fastapi.Response(status_code=fastapi.status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # ===
+
+    return fastapi.Response(content=body, media_type="application/json", headers=headers)
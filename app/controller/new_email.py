@@ -9,6 +9,7 @@ import fastapi
 import env_vars
 import queries
 import email_handler
+import tracing
 
 
 router = fastapi.APIRouter()
@@ -18,35 +19,24 @@ router = fastapi.APIRouter()
     path="/",
     status_code=fastapi.status.HTTP_202_ACCEPTED,
 )
+@tracing.traced("controller")
 async def new_user_email(provided_email: pydantic.EmailStr) -> None:
     """Endpoint used to begin the process of creating a user"""
 
     # check to see if the email already exist in the User Database: If it doesn't exist continue
     # else send an email to the user saying that they already have an existing account ===
-    user = await queries.get_user_by_email(provided_email)
-    if user is not None:
-        email_handler.SESClient.send_email(
-            FromEmailAddress="do-not-reply@greyminties.com",
-            Destination={
-                "ToAddresses": [
-                    provided_email,
-                ],
-            },
-            Content={
-                "Template": {
-                    "TemplateName": "Test_CreateUserExistingAccountV1",
-                    "TemplateData": '{"url":"greyminties.com/forgot-password"}',
-                }
-            },
+    if await queries.user_exists_with_email(provided_email):
+        await email_handler.send_email(
+            to_address=provided_email,
+            template_name="Test_CreateUserExistingAccountV1",
+            template_data={"url": "greyminties.com/forgot-password"},
         )
         return None
     # ===
 
     # check if user with this email has already tried to create an account already, delete
     # their previous create user record ===
-    record = await queries.get_create_user_record_by_user_email(provided_email)
-    if record is not None:
-        await record.delete()
+    await queries.delete_create_user_records_by_user_email(provided_email)
     # ===
 
     # save the user email and a uuid in the Create User Table ===
@@ -54,20 +44,11 @@ async def new_user_email(provided_email: pydantic.EmailStr) -> None:
     await queries.create_a_create_user_record(identifier, provided_email)
     # ===
 
-    # email the user with a link that will have the uuid as a path parameter ===
-    email_handler.SESClient.send_email(
-        FromEmailAddress="do-not-reply@greyminties.com",
-        Destination={
-            "ToAddresses": [
-                provided_email,
-            ],
-        },
-        Content={
-            "Template": {
-                "TemplateName": "Test_NewUserV1",
-                "TemplateData": f'{{"url":"{env_vars.FRONTEND_URL}/create-user/{identifier}"}}',
-            }
-        },
+    # queue an email to the user with a link that will have the uuid as a path parameter ===
+    await email_handler.send_email(
+        to_address=provided_email,
+        template_name="Test_NewUserV1",
+        template_data={"url": f"{env_vars.FRONTEND_URL}/create-user/{identifier}"},
     )
     return None
     # ===
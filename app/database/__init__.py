@@ -1 +1,7 @@
-from database.database import init_db
+from database.database import (
+    init_db,
+    warm_up,
+    ping,
+    pool_stats,
+    close_db,
+)
@@ -1,22 +1,232 @@
 # standard imports
-from typing import Any
+import asyncio
+import threading
+from typing import Any, Optional
 
 # third party imports
 import motor.motor_asyncio
 import beanie
+from beanie.odm.settings.document import DocumentSettings
+from pymongo import monitoring
 
 # user imports
 import env_vars
+import tracing
 
+# name of the database the application uses
+DATABASE_NAME = "greymintauth"
 
-async def init_db(models: list[Any]) -> None:
-    """Function that will initialize the MongoDB Database"""
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Keeps count of the connections of the driver pool, so we can see when requests are waiting
+    for a connection because the pool is saturated.
+
+    The driver calls these from its own threads, so the counters are guarded by a lock."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.checkouts = 0
+        self.failed_checkouts = 0
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        with self._lock:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_ready(self, event: Any) -> None:
+        pass
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: Any) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def stats(self) -> dict[str, int]:
+        """Returns a snapshot of the pool usage"""
+
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "waiting": self.waiting,
+                "peak_waiting": self.peak_waiting,
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+            }
+
+
+# the pool usage of the application client
+pool_monitor = PoolMonitor()
+
+# the client of the application, it is created on startup and closed on shutdown
+client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
+
+
+def _milliseconds_or_none(value: int) -> Optional[int]:
+    """The driver uses None for no limit, the env vars use 0"""
+
+    return value if value > 0 else None
+
+
+def client_options_from_env() -> dict[str, Any]:
+    """Returns the options of the client described by the env vars"""
+
+    options: dict[str, Any] = {
+        "maxPoolSize": env_vars.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": env_vars.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": _milliseconds_or_none(env_vars.MONGO_MAX_IDLE_TIME_MS),
+        "connectTimeoutMS": env_vars.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": env_vars.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "waitQueueTimeoutMS": _milliseconds_or_none(env_vars.MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        "readPreference": env_vars.MONGO_READ_PREFERENCE,
+    }
+
+    if env_vars.MONGO_COMPRESSORS:
+        options["compressors"] = env_vars.MONGO_COMPRESSORS
+
+    return options
+
+
+async def bind_models(
+    database: motor.motor_asyncio.AsyncIOMotorDatabase, models: list[Any]
+) -> None:
+    """Binds the models to their collections the way init_beanie does, without asking the server
+    anything: no version check, no index listing and no index creation. The indexes are expected
+    to have been synced by the migration command.
+
+    init_beanie has no option to skip the indexes, so this repeats what Document.init_model does.
+    Beanie is pinned to the exact version this follows, test_database checks both still agree"""
+
+    for model in models:
+        settings_class = getattr(model, "Settings", None)
+        settings_vars = {} if settings_class is None else dict(vars(settings_class))
+        settings = DocumentSettings.parse_obj(settings_vars)
+
+        if settings.timeseries is not None or settings.union_doc is not None:
+            raise ValueError(f"{model.__name__} can only be initialized with its indexes synced")
+
+        settings.motor_db = database
+        settings.name = settings.name or model.__name__
+        settings.motor_collection = database[settings.name]
+
+        model._document_settings = settings
+        model.init_fields()
+        model.init_cache()
+        model.init_actions()
+
+
+async def init_db(
+    models: list[Any], sync_indexes: bool = True, allow_index_dropping: bool = False
+) -> None:
+    """Function that will initialize the MongoDB Database.
+
+    With sync_indexes the indexes of every model are checked and created, otherwise the models are
+    only bound to their collections"""
+
+    global client
 
     # create the connection string for the database
     connection: str = env_vars.MONGO_CONNECTION
 
-    # create the a async client with the connection string
-    client = motor.motor_asyncio.AsyncIOMotorClient(connection)
+    # create the a async client with the connection string, the pool is sized by the env vars
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        connection,
+        event_listeners=[pool_monitor, *tracing.mongo_listeners()],
+        **client_options_from_env(),
+    )
+    database = client[DATABASE_NAME]
+
+    if not sync_indexes:
+        await bind_models(database, models)
+        return
 
     # initializes the connection to the database, database is called greymintauth
-    await beanie.init_beanie(database=client.greymintauth, document_models=models)
+    await beanie.init_beanie(
+        database=database, document_models=models, allow_index_dropping=allow_index_dropping
+    )
+
+
+async def warm_up(connections: int) -> None:
+    """Opens the given number of connections now, so that the first requests after startup don't
+    pay for the connection handshakes"""
+
+    if client is None or connections < 1:
+        return
+
+    # concurrent pings each need their own connection, so the pool opens as many as there are pings
+    database = client[DATABASE_NAME]
+    await asyncio.gather(*(database.command("ping") for _ in range(connections)))
+
+
+async def ping(timeout: float) -> bool:
+    """Returns True if the database answers within the timeout"""
+
+    if client is None:
+        return False
+
+    try:
+        await asyncio.wait_for(client[DATABASE_NAME].command("ping"), timeout)
+
+    except Exception:
+        return False
+
+    return True
+
+
+def pool_stats() -> dict[str, int]:
+    """Returns the usage of the connection pool along with its limits"""
+
+    return {
+        **pool_monitor.stats(),
+        "max_pool_size": env_vars.MONGO_MAX_POOL_SIZE,
+        "min_pool_size": env_vars.MONGO_MIN_POOL_SIZE,
+    }
+
+
+def close_db() -> None:
+    """Closes every connection of the client"""
+
+    global client
+
+    if client is not None:
+        client.close()
+        client = None
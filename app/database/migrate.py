@@ -0,0 +1,77 @@
+# standard imports
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+# user imports
+import models
+from database import database
+
+
+async def convert_forgot_password_dates() -> tuple[int, int]:
+    """Turns the creation dates of the forgot password records saved as strings, from before the
+    field was a date, into dates, otherwise the TTL index never deletes them. Records whose string
+    isn't a date are deleted. Returns how many records were converted and deleted"""
+
+    collection = models.ForgotPassword.get_motor_collection()
+    converted = deleted = 0
+
+    string_dates = {"datetime_created": {"$type": "string"}}
+    async for document in collection.find(string_dates, {"datetime_created": 1}):
+        # only touch the record if it still holds the string we read
+        record = {"_id": document["_id"], "datetime_created": document["datetime_created"]}
+
+        try:
+            # the strings were written as str(datetime.utcnow())
+            created = datetime.fromisoformat(document["datetime_created"])
+
+        except ValueError:
+            result = await collection.delete_one(record)
+            deleted += result.deleted_count
+            continue
+
+        result = await collection.update_one(record, {"$set": {"datetime_created": created}})
+        converted += result.modified_count
+
+    return converted, deleted
+
+
+async def migrate(allow_index_dropping: bool) -> None:
+    started = time.perf_counter()
+
+    await database.init_db(
+        models.DOCUMENT_MODELS, sync_indexes=True, allow_index_dropping=allow_index_dropping
+    )
+
+    try:
+        converted, deleted = await convert_forgot_password_dates()
+        print(f"ForgotPasswords: {converted} string dates converted, {deleted} deleted")
+
+        for model in models.DOCUMENT_MODELS:
+            indexes = await model.get_motor_collection().index_information()
+            print(f"{model.get_settings().name}: {', '.join(sorted(indexes))}")
+
+    finally:
+        database.close_db()
+
+    print(f"Indexes synced in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def main() -> None:
+    """Creates the indexes of every collection, for deployments that skip the index sync on
+    startup"""
+
+    parser = argparse.ArgumentParser(description="Creates the indexes of every collection")
+    parser.add_argument(
+        "--drop-unknown-indexes",
+        action="store_true",
+        help="drop the indexes that are no longer declared by the models",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.drop_unknown_indexes))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,14 @@
-from email_handler.email import SESClient
+from email_handler.email import get_ses_client
+from email_handler.transports import (
+    EmailTransport,
+    SESTransport,
+    FileTransport,
+    MemoryTransport,
+    create_transport,
+)
+from email_handler.dispatcher import (
+    EmailDispatcher,
+    start_dispatcher,
+    stop_dispatcher,
+    send_email,
+)
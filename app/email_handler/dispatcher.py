@@ -0,0 +1,209 @@
+# std
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Optional
+
+# user
+import env_vars
+import metrics
+import models
+import queries
+import tracing
+from email_handler import transports
+
+logger = logging.getLogger(__name__)
+
+# the address all of the emails are sent from
+FROM_EMAIL_ADDRESS = "do-not-reply@greyminties.com"
+
+
+class EmailDispatcher:
+    """Drains the email outbox in the background.
+
+    `concurrency` workers claim due emails and hand them to the transport. A failed send is retried
+    with exponential backoff and jitter, once `max_attempts` is reached the email is dead-lettered.
+
+    A claimed email is leased for `lease_seconds`, which has to outlast the longest send of the
+    transport. An email whose lease ran out is claimed again, unless that was its last attempt."""
+
+    def __init__(
+        self,
+        transport: transports.EmailTransport,
+        concurrency: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        poll_interval_seconds: float,
+        lease_seconds: float,
+    ) -> None:
+        if lease_seconds <= transport.max_send_seconds:
+            raise ValueError(
+                f"The email lease of {lease_seconds}s has to be longer than the "
+                f"{transport.max_send_seconds}s a send can take"
+            )
+
+        self.transport = transport
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.lease_seconds = lease_seconds
+
+        self._wake_up = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+        self._sent = 0
+        self._retried = 0
+        self._dead = 0
+
+    def start(self) -> None:
+        """Starts the workers on the running event loop"""
+
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"email-dispatcher-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Stops the workers, an email that was being sent is picked up again once its lease ends"""
+
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def notify(self) -> None:
+        """Wakes up the idle workers so a new email doesn't wait for the next poll"""
+
+        self._wake_up.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        """Returns how long to wait before the next attempt, doubling with every failed attempt"""
+
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+
+        return random.uniform(delay / 2, delay)
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                message = await queries.claim_next_email(self.lease_seconds)
+
+            except Exception:
+                logger.exception("Failed to claim an email from the outbox")
+                message = None
+
+            if message is None:
+                await self._wait_for_work()
+                continue
+
+            try:
+                # the lease of the last attempt ran out: the worker died or hung while sending it
+                if message.attempts > self.max_attempts:
+                    await self._dead_letter(message, message.last_error or "The last lease expired")
+
+                else:
+                    await self._deliver(message)
+
+            except Exception:
+                logger.exception("Failed to update email %s in the outbox", message.id)
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wake_up.wait(), self.poll_interval_seconds)
+
+        except asyncio.TimeoutError:
+            pass
+
+        self._wake_up.clear()
+
+    @tracing.traced("email", "deliver")
+    async def _deliver(self, message: models.EmailOutbox) -> None:
+        try:
+            with metrics.timer("email", "send"), tracing.span("email.send"):
+                await self.transport.send(message)
+
+        except Exception as err:
+            error = f"{type(err).__name__}: {err}"
+
+            if message.attempts >= self.max_attempts:
+                await self._dead_letter(message, error)
+
+            else:
+                logger.warning("Retrying email %s: %s", message.id, error)
+                self._retried += 1
+                await queries.reschedule_email(message, self.retry_delay(message.attempts), error)
+
+            return
+
+        self._sent += 1
+        await queries.delete_sent_email(message)
+
+    async def _dead_letter(self, message: models.EmailOutbox, error: str) -> None:
+        logger.error("Dead-lettering email %s: %s", message.id, error)
+        self._dead += 1
+        await queries.mark_email_dead(message, error)
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the counters of what the dispatcher did since it started"""
+
+        return {
+            "workers": len(self._workers),
+            "sent": self._sent,
+            "retried": self._retried,
+            "dead": self._dead,
+        }
+
+
+# the dispatcher used by the application, it only exists while the application is running
+dispatcher: Optional[EmailDispatcher] = None
+
+
+def start_dispatcher(transport: Optional[transports.EmailTransport] = None) -> EmailDispatcher:
+    """Starts the application dispatcher, using the transport from the env vars unless one is
+    provided"""
+
+    global dispatcher
+
+    if transport is None:
+        transport = transports.create_transport(env_vars.EMAIL_TRANSPORT, env_vars.EMAIL_FILE_PATH)
+
+    dispatcher = EmailDispatcher(
+        transport=transport,
+        concurrency=env_vars.EMAIL_DISPATCH_CONCURRENCY,
+        max_attempts=env_vars.EMAIL_MAX_ATTEMPTS,
+        retry_base_seconds=env_vars.EMAIL_RETRY_BASE_SECONDS,
+        retry_max_seconds=env_vars.EMAIL_RETRY_MAX_SECONDS,
+        poll_interval_seconds=env_vars.EMAIL_POLL_INTERVAL_SECONDS,
+        lease_seconds=env_vars.EMAIL_LEASE_SECONDS,
+    )
+    dispatcher.start()
+
+    return dispatcher
+
+
+async def stop_dispatcher() -> None:
+    """Stops the application dispatcher if it is running"""
+
+    global dispatcher
+
+    if dispatcher is not None:
+        await dispatcher.stop()
+        dispatcher = None
+
+
+async def send_email(to_address: str, template_name: str, template_data: dict[str, Any]) -> None:
+    """Saves a templated email in the outbox and returns without waiting for it to be sent"""
+
+    await queries.enqueue_email(
+        from_address=FROM_EMAIL_ADDRESS,
+        to_addresses=[to_address],
+        template_name=template_name,
+        template_data=json.dumps(template_data),
+    )
+
+    if dispatcher is not None:
+        dispatcher.notify()
@@ -1,14 +1,55 @@
 # std
-# 3p
-import boto3
+import threading
+from typing import Any, Optional
 
 # user
 import env_vars
 
 
-SESClient = boto3.client(
-    "sesv2",
-    region_name=env_vars.AWS_REGION,
-    aws_access_key_id=env_vars.AWS_SEND_EMAIL_ACCESS_KEY,
-    aws_secret_access_key=env_vars.AWS_SEND_EMAIL_SECRET_KEY,
-)
+# the SES client, it is created the first time an email is sent since importing boto3 and building
+# a client takes longer than the rest of the application startup
+_ses_client: Optional[Any] = None
+_ses_client_lock = threading.Lock()
+
+# botocore waits up to 2^n seconds before the nth retry, and never more than this
+MAX_RETRY_BACKOFF_SECONDS = 20
+
+
+def max_send_seconds() -> float:
+    """Returns the longest a send can take with the timeouts and retries of the client: every
+    attempt can time out connecting and then reading, with the retry backoff in between"""
+
+    attempts = env_vars.EMAIL_SEND_MAX_ATTEMPTS
+    connect = env_vars.EMAIL_SEND_CONNECT_TIMEOUT_SECONDS
+    timeouts = connect + env_vars.EMAIL_SEND_READ_TIMEOUT_SECONDS
+    backoff = sum(min(2**retry, MAX_RETRY_BACKOFF_SECONDS) for retry in range(1, attempts))
+
+    return attempts * timeouts + backoff
+
+
+def get_ses_client() -> Any:
+    """Returns the SES client, creating it on first use"""
+
+    global _ses_client
+
+    if _ses_client is None:
+        with _ses_client_lock:
+            if _ses_client is None:
+                import boto3
+                from botocore.config import Config
+
+                # the timeouts and retries bound how long a send takes, see max_send_seconds
+                config = Config(
+                    connect_timeout=env_vars.EMAIL_SEND_CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=env_vars.EMAIL_SEND_READ_TIMEOUT_SECONDS,
+                    retries={"mode": "standard", "max_attempts": env_vars.EMAIL_SEND_MAX_ATTEMPTS},
+                )
+                _ses_client = boto3.client(
+                    "sesv2",
+                    region_name=env_vars.AWS_REGION,
+                    aws_access_key_id=env_vars.AWS_SEND_EMAIL_ACCESS_KEY,
+                    aws_secret_access_key=env_vars.AWS_SEND_EMAIL_SECRET_KEY,
+                    config=config,
+                )
+
+    return _ses_client
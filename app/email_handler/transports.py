@@ -0,0 +1,95 @@
+# std
+import asyncio
+import json
+from typing import Protocol
+
+# user
+import models
+from email_handler.email import get_ses_client, max_send_seconds
+
+
+class EmailTransport(Protocol):
+    """Something the email dispatcher can hand emails to, raising an exception if sending failed.
+
+    `max_send_seconds` is the longest a send can take, the lease of a claimed email has to be
+    longer or another dispatcher could claim and send the email again while it is being sent."""
+
+    max_send_seconds: float
+
+    async def send(self, message: models.EmailOutbox) -> None:
+        ...
+
+
+class SESTransport:
+    """Sends emails with AWS SES, the blocking boto3 call runs on a worker thread"""
+
+    def __init__(self) -> None:
+        self.max_send_seconds = max_send_seconds()
+
+    async def send(self, message: models.EmailOutbox) -> None:
+        await asyncio.to_thread(self._send, message)
+
+    def _send(self, message: models.EmailOutbox) -> None:
+        # the client is created here on first use, so building it doesn't block the event loop
+        get_ses_client().send_email(
+            FromEmailAddress=message.from_address,
+            Destination={"ToAddresses": message.to_addresses},
+            Content={
+                "Template": {
+                    "TemplateName": message.template_name,
+                    "TemplateData": message.template_data,
+                }
+            },
+        )
+
+
+class FileTransport:
+    """Appends emails to a JSON lines file instead of sending them, used for local runs"""
+
+    max_send_seconds = 0.0
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    async def send(self, message: models.EmailOutbox) -> None:
+        line = json.dumps(
+            {
+                "from_address": message.from_address,
+                "to_addresses": message.to_addresses,
+                "template_name": message.template_name,
+                "template_data": message.template_data,
+            }
+        )
+
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a") as file:
+            file.write(f"{line}\n")
+
+
+class MemoryTransport:
+    """Keeps emails in a list instead of sending them, used for tests and benchmarks"""
+
+    max_send_seconds = 0.0
+
+    def __init__(self) -> None:
+        self.sent: list[models.EmailOutbox] = []
+
+    async def send(self, message: models.EmailOutbox) -> None:
+        self.sent.append(message)
+
+
+def create_transport(name: str, file_path: str) -> EmailTransport:
+    """Returns the transport with the given name"""
+
+    if name == "ses":
+        return SESTransport()
+
+    if name == "file":
+        return FileTransport(file_path)
+
+    if name == "memory":
+        return MemoryTransport()
+
+    raise ValueError(f"Unknown email transport: {name}")
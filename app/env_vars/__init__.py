@@ -1,4 +1,9 @@
+import math
 import os
+import threading
+from typing import Any, Callable, Optional
+
+import pydantic
 
 import exceptions
 
@@ -54,15 +59,209 @@ def verify_single_env_var(env_string: str) -> bool:
     return False
 
 
-init_env_vars()
+def _without_empty_values(source: Callable[[Any], dict[str, Any]]) -> Callable[[Any], dict]:
+    """Wraps a settings source so that empty variables fall back to their default, compose passes
+    the variables that aren't set as empty strings"""
+
+    def read(settings: Any) -> dict[str, Any]:
+        return {name: value for name, value in source(settings).items() if value != ""}
+
+    return read
+
+
+# the CPU quota of the container, cgroup v2 and v1
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path) as file:
+            return file.read().strip()
+
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """Returns how many CPUs the cgroup quota of the container allows, None if it has no quota"""
+
+    cpu_max = _read_file(CGROUP_CPU_MAX)
+
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota = _read_file(CGROUP_V1_CPU_QUOTA)
+        period = _read_file(CGROUP_V1_CPU_PERIOD)
+
+    # no quota is "max" on v2 and -1 on v1
+    try:
+        quota_us, period_us = int(quota), int(period)
+
+    except (TypeError, ValueError):
+        return None
+
+    if quota_us <= 0 or period_us <= 0:
+        return None
+
+    return quota_us / period_us
+
+
+def available_cpus() -> int:
+    """Returns how many CPUs the process can use: the ones it may run on, lowered to the cgroup
+    quota of the container. os.cpu_count counts every CPU of the host"""
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+
+    except AttributeError:
+        # sched_getaffinity is not available on every platform
+        cpus = os.cpu_count() or 1
+
+    quota = cgroup_cpu_quota()
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+
+    return max(cpus, 1)
+
+
+class Settings(pydantic.BaseSettings):
+    """The settings of the application, read from the environment variables"""
+
+    ENV: str
+    FRONTEND_URL: str
+    ALGORITHM: str
+    SECRET_KEY: str
+    ACCESS_TOKEN_EXPIRE_MINUTES: str
+    MONGO_CONNECTION: str
+    AWS_REGION: str
+    AWS_SEND_EMAIL_ACCESS_KEY: str
+    AWS_SEND_EMAIL_SECRET_KEY: str
+
+    # optional settings: these fall back to a default when they aren't provided
+    PASSWORD_POOL_KIND: str = "thread"
+    PASSWORD_POOL_SIZE: int = pydantic.Field(default_factory=available_cpus)
+    PASSWORD_POOL_MAX_QUEUE: int = 256
+    ADMISSION_HASHING_MAX_CONCURRENT: Optional[int] = None
+    ADMISSION_HASHING_MAX_QUEUE: int = 64
+    ADMISSION_DEFAULT_MAX_CONCURRENT: int = 256
+    ADMISSION_DEFAULT_MAX_QUEUE: int = 512
+    ADMISSION_MAX_WAIT_SECONDS: float = 5
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    PASSWORD_SCHEME: str = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_MEMORY_COST: int = 19456
+    ARGON2_TIME_COST: int = 2
+    ARGON2_PARALLELISM: int = 1
+    PASSWORD_HASH_TARGET_MS: float = 0
+    EMAIL_TRANSPORT: str = "ses"
+    EMAIL_FILE_PATH: str = "emails.jsonl"
+    EMAIL_DISPATCH_CONCURRENCY: int = 4
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 2
+    EMAIL_RETRY_MAX_SECONDS: float = 300
+    EMAIL_POLL_INTERVAL_SECONDS: float = 5
+    EMAIL_LEASE_SECONDS: float = 120
+    EMAIL_SEND_CONNECT_TIMEOUT_SECONDS: float = 5
+    EMAIL_SEND_READ_TIMEOUT_SECONDS: float = 10
+    EMAIL_SEND_MAX_ATTEMPTS: int = 3
+    TOKEN_CACHE_SIZE: int = 10000
+    USER_CACHE_SIZE: int = 10000
+    # the user details are cached per worker, a change made through one worker reaches the
+    # others once their entry expires, after at most this long
+    USER_CACHE_TTL_SECONDS: float = 5
+    TOKEN_FORMAT: str = "minimal"
+    DETAILS_FROM_CLAIMS: bool = False
+    JWT_PRIVATE_KEY_PATH: str = ""
+    JWT_KEY_ID: str = ""
+    JWKS_MAX_AGE_SECONDS: int = 3600
+    JWT_KEYS_DIR: str = ""
+    JWT_KEYS_RELOAD_SECONDS: float = 30
+    JWT_PREVIOUS_SECRET_KEYS: str = ""
+    JWT_BACKEND: str = "jose"
+    USER_READ_PATH: str = "beanie"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 0
+    MONGO_COMPRESSORS: str = ""
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_WARM_CONNECTIONS: Optional[int] = None
+    READY_TIMEOUT_SECONDS: float = 1
+    SYNC_INDEXES_ON_STARTUP: bool = True
+    SERVER_BIND: str = "0.0.0.0:3000"
+    SERVER_WORKERS: int = pydantic.Field(default_factory=available_cpus)
+    SERVER_PRELOAD: bool = True
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    METRICS_ENABLED: bool = False
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.1
+    TRACING_EXPORTER: str = "console"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "greymint-auth"
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MODE: str = "sample"
+    PROFILING_MAX_CONCURRENT: int = 1
+    PROFILING_SAMPLE_INTERVAL_MS: float = 1
+    PROFILING_MAX_PROFILES: int = 100
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100
+    LOOP_MONITOR_THRESHOLD_MS: float = 100
+
+    @pydantic.validator("ADMISSION_HASHING_MAX_CONCURRENT", always=True)
+    def default_to_twice_the_pool(cls, value: Optional[int], values: dict[str, Any]) -> int:
+        return value if value is not None else values.get("PASSWORD_POOL_SIZE", 1) * 2
+
+    @pydantic.validator("MONGO_WARM_CONNECTIONS", always=True)
+    def default_to_the_min_pool(cls, value: Optional[int], values: dict[str, Any]) -> int:
+        return value if value is not None else values.get("MONGO_MIN_POOL_SIZE", 0)
+
+    class Config:
+        case_sensitive = True
+
+        @classmethod
+        def customise_sources(
+            cls, init_settings: Any, env_settings: Any, file_secret_settings: Any
+        ) -> tuple:
+            return init_settings, _without_empty_values(env_settings)
+
+
+# the settings of the application, they are loaded on first use
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Returns the settings, loading them the first time they are needed"""
+
+    global _settings
+
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                init_env_vars()
+                _settings = Settings()
+
+    return _settings
+
+
+def __getattr__(name: str) -> Any:
+    """Lets the settings be read as attributes of this module, `env_vars.ALGORITHM`. A setting is
+    stored on the module once read, so later reads are plain attribute lookups"""
+
+    if name not in Settings.__fields__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+    value = getattr(get_settings(), name)
+    globals()[name] = value
 
-ENV = os.environ.get("ENV")
-FRONTEND_URL = os.environ.get("FRONTEND_URL")
-ALGORITHM = os.environ.get("ALGORITHM")
-SECRET_KEY = os.environ.get("SECRET_KEY")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES")
-MONGO_CONNECTION = os.environ.get("MONGO_CONNECTION")
-AWS_REGION = os.environ.get("AWS_REGION")
-AWS_SEND_EMAIL_ACCESS_KEY = os.environ.get("AWS_SEND_EMAIL_ACCESS_KEY")
-AWS_SEND_EMAIL_SECRET_KEY = os.environ.get("AWS_SEND_EMAIL_SECRET_KEY")
+    return value
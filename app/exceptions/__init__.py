@@ -21,6 +21,10 @@ class EmailInUseError(Exception):
     pass
 
 
+class PasswordPoolSaturatedError(Exception):
+    pass
+
+
 # Common HTTPExceptions
 MissingEnvironmentVariables = fastapi.HTTPException(
     status_code=fastapi.status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,3 +52,11 @@ def create_http_jwterror(error: str) -> None:
         status_code=fastapi.status.HTTP_401_UNAUTHORIZED,
         detail=f"{error}",
     )
+
+
+def create_http_service_overloaded(retry_after: int) -> fastapi.HTTPException:
+    return fastapi.HTTPException(
+        status_code=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service is Overloaded, Try Again Later",
+        headers={"Retry-After": f"{retry_after}"},
+    )
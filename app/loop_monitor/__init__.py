@@ -0,0 +1,6 @@
+from loop_monitor.loop_monitor import (
+    LoopMonitor,
+    start_loop_monitor,
+    stop_loop_monitor,
+    loop_stats,
+)
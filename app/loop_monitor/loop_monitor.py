@@ -0,0 +1,156 @@
+# std
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Optional
+
+# user
+import env_vars
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures how late the event loop runs its callbacks, a loop that is late is one that some
+    code blocked.
+
+    A heartbeat task sleeps for `interval` seconds at a time and records by how much it overslept,
+    that is the lag. A watchdog thread checks on the heartbeat, once it is overdue by more than
+    `threshold` seconds the stack of the event loop thread is logged: it shows the code that is
+    blocking the loop while it still is. Each block is logged once."""
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        if interval <= 0 or threshold <= 0:
+            raise ValueError("The loop monitor interval and threshold must be positive")
+
+        self.interval = interval
+        self.threshold = threshold
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id = 0
+
+        # written by the heartbeat, read by the watchdog
+        self._beats = 0
+        self._last_beat = time.perf_counter()
+
+        self._reported_beat = -1
+        self._lag = 0.0
+        self._max_lag = 0.0
+        self._blocks = 0
+
+    def start(self) -> None:
+        """Starts the heartbeat on the running event loop and the watchdog next to it"""
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._beat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stops the heartbeat and the watchdog"""
+
+        self._stopping.set()
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(now - expected, 0.0)
+
+            # a block the watchdog didn't catch, the code that blocked has returned since
+            if lag > self.threshold and self._reported_beat != self._beats:
+                self._blocks += 1
+                logger.warning("Event loop was blocked for %.0f ms", lag * 1000)
+
+            self._lag = lag
+            self._max_lag = max(self._max_lag, lag)
+            self._beats += 1
+            self._last_beat = now
+            metrics.observe_loop_lag(lag)
+
+    def _watch(self) -> None:
+        # checked often enough to catch a block soon after it passes the threshold
+        check_every = min(self.interval, self.threshold) / 2
+
+        while not self._stopping.wait(check_every):
+            beats = self._beats
+            overdue = time.perf_counter() - self._last_beat - self.interval
+
+            if overdue <= self.threshold or self._reported_beat == beats:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+
+            if frame is None:
+                continue
+
+            self._reported_beat = beats
+            self._blocks += 1
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                "Event loop blocked for over %.0f ms, it is running:\n%s", overdue * 1000, stack
+            )
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the last and the highest lag in ms, and the number of blocks seen"""
+
+        return {
+            "lag_ms": round(self._lag * 1000, 3),
+            "max_lag_ms": round(self._max_lag * 1000, 3),
+            "blocks": self._blocks,
+        }
+
+
+# the monitor of the application, it only exists while the application is running
+monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """Starts the application monitor, unless LOOP_MONITOR_ENABLED is off"""
+
+    global monitor
+
+    if not env_vars.LOOP_MONITOR_ENABLED:
+        return None
+
+    monitor = LoopMonitor(
+        interval=env_vars.LOOP_MONITOR_INTERVAL_MS / 1000,
+        threshold=env_vars.LOOP_MONITOR_THRESHOLD_MS / 1000,
+    )
+    monitor.start()
+
+    return monitor
+
+
+async def stop_loop_monitor() -> None:
+    """Stops the application monitor if it is running"""
+
+    global monitor
+
+    if monitor is not None:
+        await monitor.stop()
+        monitor = None
+
+
+def loop_stats() -> Optional[dict[str, Any]]:
+    """Returns the stats of the application monitor, None when it isn't running"""
+
+    return monitor.stats() if monitor is not None else None
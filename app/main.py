@@ -1,15 +1,30 @@
 # standard imports
+import time
+from typing import Any
 
 # third party imports
 import fastapi
+from fastapi.exception_handlers import http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp
 import uvicorn
 
 # user imports
+import admission
 import database
+import email_handler
 import env_vars
+import exceptions
+import loop_monitor
+import metrics
+import middleware
 import models
+import profiling
 import router
+import tokens
+import tracing
+import utils
 
 # creates a FastAPI instance
 app = fastapi.FastAPI(
@@ -22,17 +37,27 @@ app = fastapi.FastAPI(
         },
     ],
     docs_url=None,
+    default_response_class=ORJSONResponse,
 )
 
-origins = [env_vars.FRONTEND_URL]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def add_cors(inner: ASGIApp) -> ASGIApp:
+    """Lets the frontend call the API, its origin is read from the settings on startup"""
+
+    return CORSMiddleware(
+        inner,
+        allow_origins=[env_vars.FRONTEND_URL],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+
+app.add_middleware(middleware.DeferredMiddleware, build=add_cors)
+
+profiling.add_profiling(app)
+tracing.add_tracing(app)
+metrics.add_metrics(app)
 
 
 @app.get(
@@ -44,14 +69,74 @@ def index() -> str:
     return f"Application Verison {app.version} running in the {env_vars.ENV} environment"
 
 
+@app.get(
+    path="/ready",
+    status_code=fastapi.status.HTTP_200_OK,
+    tags=["Index"],
+)
+async def ready(response: fastapi.Response) -> dict[str, Any]:
+    """Readiness probe: fails while the database doesn't answer, and reports the pool usage so we
+    can see when requests are waiting for a connection, a password worker or an admission gate,
+    along with the event loop lag"""
+
+    database_ready = await database.ping(env_vars.READY_TIMEOUT_SECONDS)
+
+    if not database_ready:
+        response.status_code = fastapi.status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "ready": database_ready,
+        "mongo_pool": database.pool_stats(),
+        "password_pool": utils.password_pool_stats(),
+        "admission": admission.gate_stats(),
+        "event_loop": loop_monitor.loop_stats(),
+    }
+
+
 router.add_routers(app, "/api")
+router.add_well_known_routers(app)
+
+
+@app.exception_handler(exceptions.PasswordPoolSaturatedError)
+async def password_pool_saturated(
+    request: fastapi.Request, exc: exceptions.PasswordPoolSaturatedError
+) -> fastapi.Response:
+    """Sheds the request when there is no room left in the password pool"""
+
+    overloaded = exceptions.create_http_service_overloaded(env_vars.ADMISSION_RETRY_AFTER_SECONDS)
+
+    return await http_exception_handler(request, overloaded)
 
 
 @app.on_event("startup")
 async def server_startup() -> None:
     print("Server start up")
-    mongo_models = [models.User, models.ForgotPassword, models.CreateUser]
-    await database.init_db(mongo_models)
+    started = time.perf_counter()
+    tracing.start_tracing()
+    signing_key = tokens.get_signing_key()
+    print(f"Signing tokens with {signing_key.algorithm}, key id {signing_key.kid}")
+    settings = await utils.configure_password_hashing()
+    print(f"Hashing passwords using {utils.describe_context_settings(settings)}")
+    database_started = time.perf_counter()
+    await database.init_db(models.DOCUMENT_MODELS, sync_indexes=env_vars.SYNC_INDEXES_ON_STARTUP)
+    index_mode = "synced" if env_vars.SYNC_INDEXES_ON_STARTUP else "skipped"
+    database_ms = (time.perf_counter() - database_started) * 1000
+    print(f"Database initialized in {database_ms:.0f} ms, index sync {index_mode}")
+    await database.warm_up(env_vars.MONGO_WARM_CONNECTIONS)
+    print(f"Mongo pool ready with {database.pool_stats()['open']} connections")
+    email_handler.start_dispatcher()
+    loop_monitor.start_loop_monitor()
+    print(f"Server started in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+@app.on_event("shutdown")
+async def server_shutdown() -> None:
+    print("Server shut down")
+    await loop_monitor.stop_loop_monitor()
+    await email_handler.stop_dispatcher()
+    utils.shutdown_password_pool()
+    database.close_db()
+    tracing.stop_tracing()
 
 
 if __name__ == "__main__":
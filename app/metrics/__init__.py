@@ -0,0 +1,10 @@
+from metrics.metrics import (
+    timed,
+    timer,
+    observe_loop_lag,
+    observe_password_pool,
+    observe_admission,
+    count_shed,
+    MetricsMiddleware,
+    add_metrics,
+)
@@ -0,0 +1,342 @@
+# std
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+# 3p
+import fastapi
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# user
+import env_vars
+import middleware
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+
+except ImportError:
+    prometheus_client = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# latency buckets in seconds, from the cached reads up to the password hashing
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# route the current request was matched to, so that the time spent in a dependency can be broken
+# down by route. Work done outside of a request, like sending the emails, is labelled background
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_route", default="background"
+)
+
+
+class _Metrics:
+    """The Prometheus metrics of the application, created once metrics are enabled"""
+
+    def __init__(self) -> None:
+        if prometheus_client is None:
+            raise ValueError("Metrics need prometheus-client, install the metrics extra")
+
+        self.requests = prometheus_client.Counter(
+            "auth_http_requests_total",
+            "Requests served, by route and status",
+            ["method", "route", "status"],
+        )
+        self.request_seconds = prometheus_client.Histogram(
+            "auth_http_request_duration_seconds",
+            "Time taken to serve a request, by route",
+            ["method", "route"],
+            buckets=BUCKETS,
+        )
+        self.in_flight = prometheus_client.Gauge(
+            "auth_http_requests_in_flight",
+            "Requests being served, by route",
+            ["method", "route"],
+            multiprocess_mode="livesum",
+        )
+        self.dependency_seconds = prometheus_client.Histogram(
+            "auth_dependency_duration_seconds",
+            "Time spent in a dependency of a request: password hashing, MongoDB, JWT or email",
+            ["route", "dependency", "operation"],
+            buckets=BUCKETS,
+        )
+        self.loop_lag_seconds = prometheus_client.Histogram(
+            "auth_event_loop_lag_seconds",
+            "How late the event loop ran a callback, code blocking the loop makes it late",
+            buckets=BUCKETS,
+        )
+        self.password_pool_jobs = prometheus_client.Gauge(
+            "auth_password_pool_jobs",
+            "Password jobs running on a worker or queued for one",
+            ["state"],
+            multiprocess_mode="livesum",
+        )
+        self.admission_requests = prometheus_client.Gauge(
+            "auth_admission_requests",
+            "Requests admitted by an admission gate or queued at it, by gate",
+            ["gate", "state"],
+            multiprocess_mode="livesum",
+        )
+        self.requests_shed = prometheus_client.Counter(
+            "auth_requests_shed_total",
+            "Requests shed with a 503, by the admission gate or the password pool that shed them",
+            ["shed_by"],
+        )
+
+        # looking up a labelled child costs more than observing it, so they are kept here
+        self._children: dict[tuple, Any] = {}
+
+    def child(self, metric: Any, *labels: str) -> Any:
+        key = (id(metric), labels)
+        child = self._children.get(key)
+
+        if child is None:
+            child = self._children[key] = metric.labels(*labels)
+
+        return child
+
+    def observe_dependency(self, dependency: str, operation: str, seconds: float) -> None:
+        route = current_route.get()
+        self.child(self.dependency_seconds, route, dependency, operation).observe(seconds)
+
+
+# the metrics of the application, created on first use when metrics are enabled
+_metrics: Optional[_Metrics] = None
+_metrics_loaded = False
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Optional[_Metrics]:
+    """Returns the metrics, or None when they are disabled. The settings are read on first use
+    rather than on import"""
+
+    global _metrics, _metrics_loaded
+
+    if not _metrics_loaded:
+        with _metrics_lock:
+            if not _metrics_loaded:
+                _metrics = _Metrics() if env_vars.METRICS_ENABLED else None
+                _metrics_loaded = True
+
+    return _metrics
+
+
+def timed(dependency: str, operation: Optional[str] = None) -> Callable[[F], F]:
+    """Decorator that records the time spent in the function as the given dependency, the
+    operation defaults to the name of the function. When metrics are disabled the wrapper only
+    calls the function"""
+
+    def decorator(func: F) -> F:
+        name = operation or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                metrics = get_metrics()
+
+                if metrics is None:
+                    return await func(*args, **kwargs)
+
+                start = time.perf_counter()
+
+                try:
+                    return await func(*args, **kwargs)
+
+                finally:
+                    metrics.observe_dependency(dependency, name, time.perf_counter() - start)
+
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            metrics = get_metrics()
+
+            if metrics is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+
+            try:
+                return func(*args, **kwargs)
+
+            finally:
+                metrics.observe_dependency(dependency, name, time.perf_counter() - start)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+@contextlib.contextmanager
+def _timer(metrics: _Metrics, dependency: str, operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        metrics.observe_dependency(dependency, operation, time.perf_counter() - start)
+
+
+_disabled_timer = contextlib.nullcontext()
+
+
+def timer(dependency: str, operation: str) -> contextlib.AbstractContextManager:
+    """Context manager that records the time spent in its block as the given dependency"""
+
+    metrics = get_metrics()
+
+    if metrics is None:
+        return _disabled_timer
+
+    return _timer(metrics, dependency, operation)
+
+
+def observe_loop_lag(seconds: float) -> None:
+    """Records a measure of the event loop lag"""
+
+    metrics = get_metrics()
+
+    if metrics is not None:
+        metrics.loop_lag_seconds.observe(seconds)
+
+
+def observe_password_pool(running: int, queued: int) -> None:
+    """Records the number of password jobs running and queued"""
+
+    metrics = get_metrics()
+
+    if metrics is not None:
+        metrics.child(metrics.password_pool_jobs, "running").set(running)
+        metrics.child(metrics.password_pool_jobs, "queued").set(queued)
+
+
+def observe_admission(gate: str, active: int, queued: int) -> None:
+    """Records the number of requests active and queued at an admission gate"""
+
+    metrics = get_metrics()
+
+    if metrics is not None:
+        metrics.child(metrics.admission_requests, gate, "active").set(active)
+        metrics.child(metrics.admission_requests, gate, "queued").set(queued)
+
+
+def count_shed(shed_by: str) -> None:
+    """Counts a request shed by an admission gate or the password pool"""
+
+    metrics = get_metrics()
+
+    if metrics is not None:
+        metrics.child(metrics.requests_shed, shed_by).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that counts the requests and times them by route.
+
+    Routes are labelled with their path template rather than the requested path, so that ids in
+    the path don't make a new series per request"""
+
+    def __init__(self, app: ASGIApp, router: fastapi.routing.APIRouter) -> None:
+        self.app = app
+        self.router = router
+
+        metrics = get_metrics()
+
+        if metrics is None:
+            raise ValueError("The metrics middleware needs METRICS_ENABLED")
+
+        self.metrics = metrics
+
+        # routes without parameters are matched once per path, the others on every request
+        self._static_routes: dict[str, str] = {}
+
+    def route_of(self, scope: Scope) -> str:
+        path = scope["path"]
+        static_route = self._static_routes.get(path)
+
+        if static_route is not None:
+            return static_route
+
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+
+            if match != Match.NONE:
+                route_path = getattr(route, "path", "unmatched")
+
+                if "{" not in route_path:
+                    self._static_routes[path] = route_path
+
+                return route_path
+
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        method = scope["method"]
+        route = self.route_of(scope)
+        status = 500
+
+        async def send_and_record_status(message: Message) -> None:
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        in_flight = metrics.child(metrics.in_flight, method, route)
+        in_flight.inc()
+        token = current_route.set(route)
+        start = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+
+        finally:
+            elapsed = time.perf_counter() - start
+            current_route.reset(token)
+            in_flight.dec()
+            metrics.child(metrics.requests, method, route, str(status)).inc()
+            metrics.child(metrics.request_seconds, method, route).observe(elapsed)
+
+
+def render_metrics() -> fastapi.Response:
+    """Returns the metrics in the Prometheus text format. When the workers of serve.py share
+    PROMETHEUS_MULTIPROC_DIR, the metrics of every worker are added up"""
+
+    registry = prometheus_client.REGISTRY
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    return fastapi.Response(
+        prometheus_client.generate_latest(registry),
+        media_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+def add_metrics(app: fastapi.FastAPI) -> None:
+    """Times every request and serves the metrics at /metrics, when metrics are enabled. That is
+    decided once the server starts"""
+
+    def build(inner: ASGIApp) -> ASGIApp:
+        if get_metrics() is None:
+            return inner
+
+        app.add_api_route("/metrics", render_metrics, methods=["GET"], include_in_schema=False)
+
+        return MetricsMiddleware(inner, router=app.router)
+
+    app.add_middleware(middleware.DeferredMiddleware, build=build)
@@ -0,0 +1 @@
+from middleware.middleware import DeferredMiddleware
@@ -0,0 +1,25 @@
+# std
+from typing import Callable, Optional
+
+# 3p
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class DeferredMiddleware:
+    """ASGI middleware that is built on its first call rather than when it is added.
+
+    The first call is the lifespan startup of the server, or the first request when there is none,
+    so the settings a middleware is configured from are read then instead of when main is
+    imported. `build` gets the app to wrap and returns the middleware, or the app itself to add
+    nothing."""
+
+    def __init__(self, app: ASGIApp, build: Callable[[ASGIApp], ASGIApp]) -> None:
+        self.app = app
+        self.build = build
+        self._built: Optional[ASGIApp] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._built is None:
+            self._built = self.build(self.app)
+
+        await self._built(scope, receive, send)
@@ -1,3 +1,8 @@
-from models.user import User
-from models.forgot_password import ForgotPassword
+from models.user import User, UserDetailsView, UserAuthView, UserExistsView
+from models.forgot_password import ForgotPassword, FORGOT_PASSWORD_EXPIRE_MINUTES
 from models.create_user import CreateUser
+from models.email_outbox import EmailOutbox
+from models.user_records import UserRecord, UserDetailsRecord, UserAuthRecord
+
+# every collection of the application, in the order they are initialized
+DOCUMENT_MODELS = [User, ForgotPassword, CreateUser, EmailOutbox]
@@ -1,14 +1,25 @@
+# standard imports
+from datetime import datetime
+from typing import Optional
+
 # third party imports
 import beanie
+import pymongo
 
 
 class CreateUser(beanie.Document):
     """The model the represents the User that is trying to create an account"""
 
-    uuid: str
-    user_email: str
+    uuid: beanie.Indexed(str, unique=True)
+    user_email: beanie.Indexed(str)
     creation_ts: float
     expiration_ts: float
+    # the same moment as expiration_ts as a date, which Mongo uses to delete the record once it's
+    # expired, records made before it was added don't have it
+    expires_at: Optional[datetime] = None
 
     class Settings:
         name = "CreateUser"
+        indexes = [
+            pymongo.IndexModel([("expires_at", pymongo.ASCENDING)], expireAfterSeconds=0),
+        ]
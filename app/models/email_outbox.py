@@ -0,0 +1,29 @@
+# std
+from datetime import datetime
+from typing import Literal, Optional
+
+# 3p
+import beanie
+import pymongo
+
+
+class EmailOutbox(beanie.Document):
+    """The model that represents an email waiting to be sent by the email dispatcher"""
+
+    from_address: str
+    to_addresses: list[str]
+    template_name: str
+    template_data: str
+    status: Literal["pending", "sending", "dead"] = "pending"
+    attempts: int = 0
+    next_attempt_at: datetime
+    created_at: datetime
+    last_error: Optional[str] = None
+
+    class Settings:
+        name = "EmailOutbox"
+        indexes = [
+            pymongo.IndexModel(
+                [("status", pymongo.ASCENDING), ("next_attempt_at", pymongo.ASCENDING)]
+            ),
+        ]
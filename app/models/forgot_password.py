@@ -1,14 +1,27 @@
+# std
+from datetime import datetime
+
 # 3p
 import beanie
+import pymongo
+
+# how long a user has to reset their password, Mongo deletes the record once this has passed
+FORGOT_PASSWORD_EXPIRE_MINUTES = 30
 
 
 class ForgotPassword(beanie.Document):
     """The model that represents the users that are attempting to reset their password"""
 
-    user_id: str
-    uuid: str
+    user_id: beanie.Indexed(str)
+    uuid: beanie.Indexed(str, unique=True)
     token: str
-    datetime_created: str
+    datetime_created: datetime
 
     class Settings:
         name = "ForgotPasswords"
+        indexes = [
+            pymongo.IndexModel(
+                [("datetime_created", pymongo.ASCENDING)],
+                expireAfterSeconds=FORGOT_PASSWORD_EXPIRE_MINUTES * 60,
+            ),
+        ]
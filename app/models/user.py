@@ -3,6 +3,7 @@ from typing import Literal
 
 # third party imports
 import pydantic
+import pymongo
 
 # user imports
 import beanie
@@ -17,6 +18,56 @@ class User(beanie.Document):
     role: Literal["standard", "admin"] | None = "standard"
     hashed_password: str
     created_ts: float
+    token_version: int = 0
 
     class Settings:
         name = "Users"
+        # index that holds every field of the details view, so that looking the details up by
+        # email can be answered from the index alone without reading the document. The planner
+        # may prefer the unique email index, the raw read path hints this one to make sure. The
+        # auth view is served by the unique email index, password hashes are kept out of
+        # secondary indexes
+        indexes = [
+            pymongo.IndexModel(
+                [
+                    ("email", pymongo.ASCENDING),
+                    ("username", pymongo.ASCENDING),
+                    ("disabled", pymongo.ASCENDING),
+                    ("role", pymongo.ASCENDING),
+                ],
+                name="email_details",
+            ),
+        ]
+
+
+class UserDetailsView(pydantic.BaseModel):
+    """The fields of a User that make up its details"""
+
+    username: str
+    email: str
+    disabled: bool | None = False
+    role: Literal["standard", "admin"] | None = "standard"
+
+    class Settings:
+        projection = {"_id": 0, "username": 1, "email": 1, "disabled": 1, "role": 1}
+
+
+class UserAuthView(pydantic.BaseModel):
+    """The fields of a User needed to check its password"""
+
+    id: beanie.PydanticObjectId = pydantic.Field(alias="_id")
+    email: str
+    disabled: bool | None = False
+    hashed_password: str
+
+    class Settings:
+        projection = {"_id": 1, "email": 1, "disabled": 1, "hashed_password": 1}
+
+
+class UserExistsView(pydantic.BaseModel):
+    """Only the email of a User, used to check that one exists, the unique email index covers it"""
+
+    email: str
+
+    class Settings:
+        projection = {"_id": 0, "email": 1}
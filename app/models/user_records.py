@@ -0,0 +1,72 @@
+# standard imports
+import dataclasses
+from typing import Any, Optional
+
+# third party imports
+from bson import ObjectId
+
+
+@dataclasses.dataclass(slots=True)
+class UserRecord:
+    """A User as stored in the database, built straight from the document without validation since
+    the application is the only one writing users"""
+
+    id: ObjectId
+    username: str
+    email: str
+    disabled: Optional[bool]
+    role: Optional[str]
+    hashed_password: str
+    created_ts: float
+    token_version: int
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any]) -> "UserRecord":
+        return cls(
+            id=document["_id"],
+            username=document["username"],
+            email=document["email"],
+            disabled=document.get("disabled", False),
+            role=document.get("role", "standard"),
+            hashed_password=document["hashed_password"],
+            created_ts=document["created_ts"],
+            token_version=document.get("token_version", 0),
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class UserDetailsRecord:
+    """The fields of a stored User that make up its details"""
+
+    username: str
+    email: str
+    disabled: Optional[bool]
+    role: Optional[str]
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any]) -> "UserDetailsRecord":
+        return cls(
+            username=document["username"],
+            email=document["email"],
+            disabled=document.get("disabled", False),
+            role=document.get("role", "standard"),
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class UserAuthRecord:
+    """The fields of a stored User needed to check its password"""
+
+    id: ObjectId
+    email: str
+    disabled: Optional[bool]
+    hashed_password: str
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any]) -> "UserAuthRecord":
+        return cls(
+            id=document["_id"],
+            email=document["email"],
+            disabled=document.get("disabled", False),
+            hashed_password=document["hashed_password"],
+        )
@@ -0,0 +1,5 @@
+from profiling.profiling import (
+    StackSampler,
+    ProfilingMiddleware,
+    add_profiling,
+)
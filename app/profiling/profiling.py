@@ -0,0 +1,334 @@
+# std
+import asyncio
+import collections
+import cProfile
+import fcntl
+import hmac
+import os
+import re
+import sys
+import threading
+import uuid
+from types import FrameType
+from typing import Optional
+
+# 3p
+import fastapi
+from fastapi.responses import FileResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# user
+import env_vars
+import middleware
+
+TOKEN_HEADER = b"x-profile-token"
+MODE_HEADER = b"x-profile-mode"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# the file extension of the profiles of each mode
+MODES = {"sample": ".collapsed", "cprofile": ".pstats"}
+
+# profile ids are used as file names, so the request ids that are anything else are replaced
+PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# the lock files of the profiling slots, shared by every worker profiling into the same directory
+SLOT_LOCK_FILE = ".slot-{}.lock"
+
+
+class StackSampler:
+    """Samples the stack of the event loop thread while the task of the request is running on it.
+
+    The loop runs the other requests in between, their stacks are left out. The stacks are counted
+    in the collapsed format flame graph tools read, root first and separated by semicolons"""
+
+    def __init__(self, task: asyncio.Task, interval: float) -> None:
+        self.task = task
+        self.loop = task.get_loop()
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            # the task can switch right after the frame was taken, a sample is off now and then
+            if frame is None or asyncio.current_task(self.loop) is not self.task:
+                continue
+
+            self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        names = []
+
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            frame = frame.f_back
+
+        return ";".join(reversed(names))
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles the requests carrying the profiling token in X-Profile-Token.
+
+    The profile is saved in the directory under the id of the request, taken from X-Request-ID or
+    generated, and the id is returned in the X-Profile-Id header. A request whose id already has a
+    profile is served without one and gets `X-Profile-Status: exists`. Only the newest
+    `max_profiles` profiles are kept.
+
+    The limit of concurrent profiles holds for every worker using the directory: a profile holds
+    the lock of one of `max_concurrent` slot files, and the requests finding none free are served
+    without one and get `X-Profile-Status: busy`. The lock goes away with the worker holding it.
+
+    `sample` samples the stack of the request, `cprofile` traces every call the event loop makes
+    while the request runs, including those of the other requests. Both hook into the event loop
+    thread, so only one cprofile runs at a time whatever the limit"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        token: str,
+        directory: str,
+        mode: str = "sample",
+        max_concurrent: int = 1,
+        sample_interval: float = 0.001,
+        max_profiles: int = 100,
+    ) -> None:
+        if not token:
+            raise ValueError("Profiling needs PROFILING_TOKEN")
+
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        self.mode = mode
+        self.max_concurrent = max_concurrent
+        self.sample_interval = sample_interval
+        self.max_profiles = max_profiles
+        self.cprofile_active = False
+
+        os.makedirs(directory, exist_ok=True)
+
+    def requested_profile(self, scope: Scope) -> Optional[tuple[str, str]]:
+        """Returns the id and the mode of the profile the request asks for, if it is authorized"""
+
+        token = mode = request_id = None
+
+        for key, value in scope["headers"]:
+            if key == TOKEN_HEADER:
+                token = value
+            elif key == MODE_HEADER:
+                mode = value.decode("latin-1")
+            elif key == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")
+
+        if token is None or not hmac.compare_digest(token, self.token):
+            return None
+
+        if request_id is None or not PROFILE_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        return request_id, mode if mode in MODES else self.mode
+
+    def acquire(self, mode: str) -> Optional[int]:
+        """Locks a free slot and returns its file descriptor, None when every slot is taken"""
+
+        if mode == "cprofile" and self.cprofile_active:
+            return None
+
+        for slot in range(self.max_concurrent):
+            path = os.path.join(self.directory, SLOT_LOCK_FILE.format(slot))
+            slot_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+            try:
+                fcntl.flock(slot_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            except BlockingIOError:
+                os.close(slot_fd)
+                continue
+
+            self.cprofile_active = self.cprofile_active or mode == "cprofile"
+
+            return slot_fd
+
+        return None
+
+    def release(self, slot_fd: int, mode: str) -> None:
+        fcntl.flock(slot_fd, fcntl.LOCK_UN)
+        os.close(slot_fd)
+
+        if mode == "cprofile":
+            self.cprofile_active = False
+
+    def reserve(self, profile_id: str, mode: str) -> Optional[str]:
+        """Creates the file of the profile and returns its path, None when the id already has a
+        profile"""
+
+        for extension in MODES.values():
+            if os.path.exists(os.path.join(self.directory, profile_id + extension)):
+                return None
+
+        path = os.path.join(self.directory, profile_id + MODES[mode])
+
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+
+        except FileExistsError:
+            return None
+
+        return path
+
+    def prune(self) -> None:
+        """Deletes the oldest profiles past `max_profiles`"""
+
+        with os.scandir(self.directory) as entries:
+            profiles = [
+                (entry.stat().st_mtime_ns, entry.path)
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(tuple(MODES.values()))
+            ]
+
+        profiles.sort()
+
+        for _, path in profiles[: max(len(profiles) - self.max_profiles, 0)]:
+            try:
+                os.remove(path)
+
+            # another worker pruned it first
+            except FileNotFoundError:
+                pass
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self.requested_profile(scope)
+
+        if requested is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id, mode = requested
+        path = self.reserve(profile_id, mode)
+
+        if path is None:
+            exists = [(b"x-profile-status", b"exists"), (b"x-profile-id", profile_id.encode())]
+            await self.app(scope, receive, self.send_with_headers(send, exists))
+            return
+
+        slot_fd = self.acquire(mode)
+
+        if slot_fd is None:
+            os.remove(path)
+            busy = [(b"x-profile-status", b"busy")]
+            await self.app(scope, receive, self.send_with_headers(send, busy))
+            return
+
+        headers = [(b"x-profile-status", b"profiled"), (b"x-profile-id", profile_id.encode())]
+
+        try:
+            if mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+
+                try:
+                    await self.app(scope, receive, self.send_with_headers(send, headers))
+
+                finally:
+                    profile.disable()
+
+                await asyncio.to_thread(profile.dump_stats, path)
+
+            else:
+                sampler = StackSampler(asyncio.current_task(), self.sample_interval)
+                sampler.start()
+
+                try:
+                    await self.app(scope, receive, self.send_with_headers(send, headers))
+
+                finally:
+                    sampler.stop()
+
+                await asyncio.to_thread(sampler.dump, path)
+
+            await asyncio.to_thread(self.prune)
+
+        finally:
+            self.release(slot_fd, mode)
+
+    @staticmethod
+    def send_with_headers(send: Send, headers: list[tuple[bytes, bytes]]) -> Send:
+        async def send_and_add_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+
+            await send(message)
+
+        return send_and_add_headers
+
+
+def add_profiling(app: fastapi.FastAPI) -> None:
+    """Profiles the requests that ask for it and serves the saved profiles at /profiles/{id}, when
+    profiling is enabled. That is decided once the server starts, and the requests that don't ask
+    only pay for a look at their headers"""
+
+    def build(inner: ASGIApp) -> ASGIApp:
+        if not env_vars.PROFILING_ENABLED:
+            return inner
+
+        token = env_vars.PROFILING_TOKEN
+        directory = env_vars.PROFILING_DIR
+
+        profiling_middleware = ProfilingMiddleware(
+            inner,
+            token=token,
+            directory=directory,
+            mode=env_vars.PROFILING_MODE,
+            max_concurrent=env_vars.PROFILING_MAX_CONCURRENT,
+            sample_interval=env_vars.PROFILING_SAMPLE_INTERVAL_MS / 1000,
+            max_profiles=env_vars.PROFILING_MAX_PROFILES,
+        )
+
+        async def get_profile(
+            profile_id: str, x_profile_token: str = fastapi.Header("")
+        ) -> fastapi.Response:
+            """Returns a saved profile, to the holders of the profiling token"""
+
+            if not hmac.compare_digest(x_profile_token.encode(), token.encode()):
+                raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN)
+
+            if PROFILE_ID.match(profile_id):
+                for extension in MODES.values():
+                    path = os.path.join(directory, profile_id + extension)
+
+                    if os.path.exists(path):
+                        return FileResponse(path, filename=profile_id + extension)
+
+            raise fastapi.HTTPException(status_code=fastapi.status.HTTP_404_NOT_FOUND)
+
+        app.add_api_route(
+            "/profiles/{profile_id}", get_profile, methods=["GET"], include_in_schema=False
+        )
+
+        return profiling_middleware
+
+    app.add_middleware(middleware.DeferredMiddleware, build=build)
@@ -3,6 +3,8 @@ from queries.create_user import (
     get_create_user_record_by_uuid,
     get_create_user_record_by_id,
     get_create_user_record_by_user_email,
+    redeem_create_user_record,
+    delete_create_user_records_by_user_email,
     delete_create_user_record_by_id,
     delete_create_user_record_by_uuid,
 )
@@ -11,10 +13,24 @@ from queries.forgot_password import (
     get_forgot_password_attempt_by_user_id,
     get_forgot_password_attempt_by_uuid,
     save_forgot_password_attempt,
+    redeem_forgot_password_attempt,
+    delete_forgot_password_attempts_by_user_id,
     delete_forgot_password_attempt_by_id,
 )
 from queries.user import (
     create_user_record,
     get_user_from_username,
     get_user_by_email,
+    get_user_details_by_email,
+    get_user_auth_by_email,
+    user_exists_with_email,
+    set_user_hashed_password,
+    update_user_by_email,
+)
+from queries.email_outbox import (
+    enqueue_email,
+    claim_next_email,
+    delete_sent_email,
+    reschedule_email,
+    mark_email_dead,
 )
@@ -2,11 +2,18 @@
 from typing import Optional
 from datetime import datetime
 
+# 3p
+import beanie
+
 # user
 import env_vars
+import metrics
 import models
+import tracing
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def create_a_create_user_record(unique_id: str, user_email: str) -> models.CreateUser:
     """Creates a create user record and then returns it"""
 
@@ -18,23 +25,30 @@ async def create_a_create_user_record(unique_id: str, user_email: str) -> models
         user_email=user_email,
         creation_ts=current_ts,
         expiration_ts=current_ts + delta_in_seconds,
+        expires_at=datetime.utcfromtimestamp(current_ts + delta_in_seconds),
     )
 
     await instance.insert()
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_create_user_record_by_uuid(uuid: str) -> Optional[models.CreateUser]:
     """returns a create user record if one is found when searching by uuid, otherwise return None"""
 
     return await models.CreateUser.find_one(models.CreateUser.uuid == uuid)
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_create_user_record_by_id(record_id: str) -> Optional[models.CreateUser]:
     """returns a create user record if one is found when searching by id, otherwise return None"""
 
     return await models.CreateUser.get(record_id)
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_create_user_record_by_user_email(user_email: str) -> Optional[models.CreateUser]:
     """returns a create user record if one is found when searching by user email,
     otherwise return None"""
@@ -42,15 +56,41 @@ async def get_create_user_record_by_user_email(user_email: str) -> Optional[mode
     return await models.CreateUser.find_one(models.CreateUser.user_email == user_email)
 
 
-async def delete_create_user_record_by_id(record_id: str) -> None:
-    """Attempts to find the record by id and then deleting it if found"""
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def redeem_create_user_record(uuid: str) -> Optional[models.CreateUser]:
+    """Atomically finds and deletes the create user record with the uuid, returns None if there is
+    no such record. Only one of several concurrent calls for the same uuid gets the record back."""
 
-    record = await get_create_user_record_by_id(record_id)
+    collection = models.CreateUser.get_motor_collection()
+    document = await collection.find_one_and_delete({"uuid": uuid})
 
-    if record is not None:
-        await record.delete()
+    if document is None:
+        return None
+
+    return models.CreateUser.parse_obj(document)
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def delete_create_user_records_by_user_email(user_email: str) -> None:
+    """Deletes every create user record for the user email"""
+
+    await models.CreateUser.find(models.CreateUser.user_email == user_email).delete()
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def delete_create_user_record_by_id(record_id: str) -> None:
+    """Deletes the record by id if it exists"""
+
+    await models.CreateUser.find_one(
+        models.CreateUser.id == beanie.PydanticObjectId(record_id)
+    ).delete()
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def delete_create_user_record_by_uuid(uuid: str) -> None:
     """Attempts to find the record by id and then deleting it if found"""
 
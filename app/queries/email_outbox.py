@@ -0,0 +1,97 @@
+# std
+from datetime import datetime, timedelta
+from typing import Optional
+
+# 3p
+import pymongo
+
+# user
+import metrics
+import models
+import tracing
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def enqueue_email(
+    from_address: str, to_addresses: list[str], template_name: str, template_data: str
+) -> models.EmailOutbox:
+    """Saves an email in the outbox so that the email dispatcher sends it"""
+
+    now = datetime.utcnow()
+    instance = models.EmailOutbox(
+        from_address=from_address,
+        to_addresses=to_addresses,
+        template_name=template_name,
+        template_data=template_data,
+        next_attempt_at=now,
+        created_at=now,
+    )
+
+    await instance.insert()
+
+    return instance
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def claim_next_email(lease_seconds: float) -> Optional[models.EmailOutbox]:
+    """Atomically claims the next email that is due, returns None if there is nothing to send.
+
+    The claimed email is leased for `lease_seconds`, if it isn't sent or rescheduled by then (the
+    process died while sending it) it becomes due again and can be claimed by another dispatcher."""
+
+    now = datetime.utcnow()
+    collection = models.EmailOutbox.get_motor_collection()
+
+    document = await collection.find_one_and_update(
+        {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "sending",
+                "next_attempt_at": now + timedelta(seconds=lease_seconds),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", pymongo.ASCENDING)],
+        return_document=pymongo.ReturnDocument.AFTER,
+    )
+
+    if document is None:
+        return None
+
+    return models.EmailOutbox.parse_obj(document)
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def delete_sent_email(record: models.EmailOutbox) -> None:
+    """Removes an email that was sent from the outbox"""
+
+    await record.delete()
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def reschedule_email(record: models.EmailOutbox, delay_seconds: float, error: str) -> None:
+    """Puts an email that failed to send back in the outbox to be retried after the delay"""
+
+    await models.EmailOutbox.find_one(models.EmailOutbox.id == record.id).update(
+        {
+            "$set": {
+                "status": "pending",
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay_seconds),
+                "last_error": error,
+            }
+        }
+    )
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def mark_email_dead(record: models.EmailOutbox, error: str) -> None:
+    """Dead-letters an email that ran out of attempts, it stays in the outbox to be inspected"""
+
+    await models.EmailOutbox.find_one(models.EmailOutbox.id == record.id).update(
+        {"$set": {"status": "dead", "last_error": error}}
+    )
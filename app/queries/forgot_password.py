@@ -1,42 +1,80 @@
 # std
 from datetime import datetime
+from typing import Optional
+
+# 3p
+import beanie
 
 # user
+import metrics
 import models
+import tracing
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_forgot_password_attempt_by_user_id(user_id: str) -> models.ForgotPassword:
     """Returns a forgot password record after searching by id"""
 
     return await models.ForgotPassword.find_one(models.ForgotPassword.user_id == user_id)
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_forgot_password_attempt_by_id(record_id: str) -> models.ForgotPassword:
     """Returns a forgot password record after searching by id"""
 
     return await models.ForgotPassword.get(record_id)
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_forgot_password_attempt_by_uuid(uuid: str) -> models.ForgotPassword:
     """Returns a forgot password record after searching by uuid"""
 
     return await models.ForgotPassword.find_one(models.ForgotPassword.uuid == uuid)
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def save_forgot_password_attempt(user_id: str, uuid: str, token: str) -> None:
     """Creates a forgot password record"""
 
-    datetime_created = str(datetime.utcnow())
     new_record = models.ForgotPassword(
-        user_id=user_id, uuid=uuid, token=token, datetime_created=datetime_created
+        user_id=user_id, uuid=uuid, token=token, datetime_created=datetime.utcnow()
     )
 
     await new_record.insert()
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def redeem_forgot_password_attempt(uuid: str) -> Optional[models.ForgotPassword]:
+    """Atomically finds and deletes the forgot password record with the uuid, returns None if there
+    is no such record. Only one of several concurrent calls for the same uuid gets the record."""
+
+    collection = models.ForgotPassword.get_motor_collection()
+    document = await collection.find_one_and_delete({"uuid": uuid})
+
+    if document is None:
+        return None
+
+    return models.ForgotPassword.parse_obj(document)
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def delete_forgot_password_attempts_by_user_id(user_id: str) -> None:
+    """Deletes every forgot password record of the user"""
+
+    await models.ForgotPassword.find(models.ForgotPassword.user_id == user_id).delete()
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def delete_forgot_password_attempt_by_id(record_id: str) -> None:
     """Deletes the forgot password record by id"""
 
-    record = await get_forgot_password_attempt_by_id(record_id)
-
-    await record.delete()
+    await models.ForgotPassword.find_one(
+        models.ForgotPassword.id == beanie.PydanticObjectId(record_id)
+    ).delete()
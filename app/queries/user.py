@@ -1,13 +1,21 @@
 # standard imports
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 # third party imports
+import beanie
+import pymongo
 
 # user imports
+import env_vars
+import metrics
 import models
+import tracing
+from queries import user_raw
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def create_user_record(username: str, email: str, hashed_password: str) -> models.User:
     """create a new user"""
 
@@ -19,13 +27,103 @@ async def create_user_record(username: str, email: str, hashed_password: str) ->
     await instance.insert()
 
 
+@metrics.timed("mongo")
+@tracing.traced("queries")
 async def get_user_from_username(username: str) -> Optional[models.User]:
     """returns a user if one is found, otherwise return None"""
 
     return await models.User.find_one(models.User.username == username)
 
 
-async def get_user_by_email(email: str) -> models.User | None:
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def get_user_by_email(email: str) -> models.User | models.UserRecord | None:
     """Returns a user if one is found when seaching using email, otherwise return None"""
 
+    if env_vars.USER_READ_PATH == "raw":
+        return await user_raw.get_user_by_email(email)
+
     return await models.User.find_one(models.User.email == email)
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def get_user_details_by_email(
+    email: str,
+) -> models.UserDetailsView | models.UserDetailsRecord | None:
+    """Returns the details of the user with the email if one is found, otherwise return None"""
+
+    if env_vars.USER_READ_PATH == "raw":
+        return await user_raw.get_user_details_by_email(email)
+
+    return await models.User.find_one(
+        models.User.email == email, projection_model=models.UserDetailsView
+    )
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def get_user_auth_by_email(
+    email: str,
+) -> models.UserAuthView | models.UserAuthRecord | None:
+    """Returns what is needed to check the password of the user with the email if one is found,
+    otherwise return None"""
+
+    if env_vars.USER_READ_PATH == "raw":
+        return await user_raw.get_user_auth_by_email(email)
+
+    return await models.User.find_one(
+        models.User.email == email, projection_model=models.UserAuthView
+    )
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def user_exists_with_email(email: str) -> bool:
+    """Returns True if there is a user with the email"""
+
+    if env_vars.USER_READ_PATH == "raw":
+        return await user_raw.user_exists_with_email(email)
+
+    user = await models.User.find_one(
+        models.User.email == email, projection_model=models.UserExistsView
+    )
+
+    return user is not None
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def set_user_hashed_password(
+    user_id: beanie.PydanticObjectId, verified_hashed_password: str, hashed_password: str
+) -> bool:
+    """Replaces the hashed password of the user without changing anything else, as long as it is
+    still the one that was verified. Returns False when the password was changed in the meantime,
+    the new password is then kept"""
+
+    collection = models.User.get_motor_collection()
+    result = await collection.update_one(
+        {"_id": user_id, "hashed_password": verified_hashed_password},
+        {"$set": {"hashed_password": hashed_password}},
+    )
+
+    return result.matched_count == 1
+
+
+@metrics.timed("mongo")
+@tracing.traced("queries")
+async def update_user_by_email(email: str, set_fields: dict[str, Any]) -> Optional[models.User]:
+    """Sets the fields of the user with the email in a single round trip and returns the user as it
+    was saved, otherwise return None. Every change bumps the token version of the user"""
+
+    collection = models.User.get_motor_collection()
+    document = await collection.find_one_and_update(
+        {"email": email},
+        {"$set": set_fields, "$inc": {"token_version": 1}},
+        return_document=pymongo.ReturnDocument.AFTER,
+    )
+
+    if document is None:
+        return None
+
+    return models.User.parse_obj(document)
@@ -0,0 +1,63 @@
+# standard imports
+from typing import Optional
+
+# user imports
+import models
+
+# the raw read path goes straight to Motor and maps the documents onto the slotted records in
+# models.user_records, skipping the pydantic validation Beanie runs on every document. It uses the
+# projections of the Beanie views, and the details lookup hints the index holding every field of
+# the view, so it is answered from the index alone. Writes always go through Beanie.
+
+# the index of models.User that covers the details view
+DETAILS_INDEX = "email_details"
+
+
+async def get_user_by_email(email: str) -> Optional[models.UserRecord]:
+    """Returns a user if one is found when seaching using email, otherwise return None"""
+
+    document = await models.User.get_motor_collection().find_one({"email": email})
+
+    if document is None:
+        return None
+
+    return models.UserRecord.from_document(document)
+
+
+async def get_user_details_by_email(email: str) -> Optional[models.UserDetailsRecord]:
+    """Returns the details of the user with the email if one is found, otherwise return None"""
+
+    # left to itself the planner may pick the unique email index, which has to read the document
+    cursor = models.User.get_motor_collection().find(
+        {"email": email}, models.UserDetailsView.Settings.projection
+    )
+    documents = await cursor.hint(DETAILS_INDEX).limit(1).to_list(1)
+
+    if not documents:
+        return None
+
+    return models.UserDetailsRecord.from_document(documents[0])
+
+
+async def get_user_auth_by_email(email: str) -> Optional[models.UserAuthRecord]:
+    """Returns what is needed to check the password of the user with the email if one is found,
+    otherwise return None"""
+
+    document = await models.User.get_motor_collection().find_one(
+        {"email": email}, models.UserAuthView.Settings.projection
+    )
+
+    if document is None:
+        return None
+
+    return models.UserAuthRecord.from_document(document)
+
+
+async def user_exists_with_email(email: str) -> bool:
+    """Returns True if there is a user with the email"""
+
+    document = await models.User.get_motor_collection().find_one(
+        {"email": email}, models.UserExistsView.Settings.projection
+    )
+
+    return document is not None
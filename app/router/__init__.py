@@ -1 +1 @@
-from router.router import add_routers
+from router.router import add_routers, add_well_known_routers
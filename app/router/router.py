@@ -3,52 +3,72 @@
 import fastapi
 
 # user
+import admission
 import controller
 
 
 def add_routers(app: fastapi.FastAPI, base_url: str) -> None:
+    # every route gets its own admission gate, the routes that hash passwords get a smaller budget
     app.include_router(
         controller.get_details_router,
         prefix=f"{base_url}/v1/user/details",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.default_gate("get_user_details"))],
     )
     app.include_router(
         controller.get_token_router,
         prefix=f"{base_url}/v1/user/token",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.hashing_gate("get_token"))],
     )
     app.include_router(
         controller.new_email_router,
         prefix=f"{base_url}/v1/user/new-email",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.default_gate("new_user_email"))],
     )
     app.include_router(
         controller.create_user_router,
         prefix=f"{base_url}/v1/user/new-user/{{create_user_id}}",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.hashing_gate("create_user"))],
     )
     app.include_router(
         controller.forgot_password_router,
         prefix=f"{base_url}/v1/user/forgot-password",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.default_gate("forgot_password"))],
     )
     app.include_router(
         controller.reset_password_router,
         prefix=f"{base_url}/v1/user/reset-password/{{forgot_password_uuid}}",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.hashing_gate("reset_password"))],
     )
     app.include_router(
         controller.disable_user_router,
         prefix=f"{base_url}/v1/user/disable",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.default_gate("disable_user"))],
     )
     app.include_router(
         controller.edit_user_router,
         prefix=f"{base_url}/v1/user/edit",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.default_gate("edit_user"))],
     )
     app.include_router(
         controller.update_password_router,
         prefix=f"{base_url}/v1/user/update-password",
         tags=["User"],
+        dependencies=[fastapi.Depends(admission.hashing_gate("update_password"))],
+    )
+
+
+def add_well_known_routers(app: fastapi.FastAPI) -> None:
+    app.include_router(
+        controller.jwks_router,
+        prefix="/.well-known",
+        tags=["Keys"],
+        dependencies=[fastapi.Depends(admission.default_gate("get_jwks"))],
     )
@@ -0,0 +1,69 @@
+# standard imports
+import os
+from typing import Any
+
+# third party imports
+from gunicorn.app.base import BaseApplication
+
+# user imports
+import env_vars
+import utils
+
+try:
+    from prometheus_client import multiprocess
+
+except ImportError:
+    multiprocess = None
+
+
+class Server(BaseApplication):
+    """Runs the application on gunicorn, which forks the uvicorn workers, restarts them when they
+    die and recycles them after `SERVER_MAX_REQUESTS` requests. The uvicorn worker uses uvloop and
+    httptools when they are installed and falls back to asyncio and h11 otherwise"""
+
+    def __init__(self, options: dict[str, Any]) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self) -> Any:
+        # imported here so that, with preload, the master imports the application once before
+        # forking and the workers share its memory
+        from main import app
+
+        return app
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    """Drops the live gauges of a worker that exited, when the workers share their metrics. It
+    runs in the master, which has no metrics of its own"""
+
+    if multiprocess is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def server_options_from_env() -> dict[str, Any]:
+    """Returns the gunicorn settings described by the env vars"""
+
+    return {
+        "bind": env_vars.SERVER_BIND,
+        "workers": env_vars.SERVER_WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": env_vars.SERVER_PRELOAD,
+        "max_requests": env_vars.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": env_vars.SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": env_vars.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        "keepalive": env_vars.SERVER_KEEPALIVE_SECONDS,
+        "loglevel": "info",
+        "child_exit": child_exit,
+    }
+
+
+if __name__ == "__main__":
+    # calibrated once here rather than in every worker, the workers inherit the settings
+    settings = utils.pin_password_hashing()
+    print(f"Hashing passwords using {utils.describe_context_settings(settings)}")
+    Server(server_options_from_env()).run()
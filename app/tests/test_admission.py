@@ -0,0 +1,115 @@
+# standard imports
+import asyncio
+
+# third party imports
+import fastapi
+from httpx import AsyncClient
+import pytest
+
+# user imports
+import admission
+
+
+async def enter(gate: admission.AdmissionGate, release: asyncio.Event) -> None:
+    """Holds a slot on the gate until the release event is set"""
+
+    async for _ in gate():
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admission_gate_queues_then_sheds() -> None:
+    """Tests that the gate queues requests past its budget and sheds them once the queue is full"""
+
+    gate = admission.AdmissionGate(
+        name="test", max_concurrent=1, max_queue=1, max_wait=5, retry_after=3
+    )
+    release = asyncio.Event()
+
+    # === fill the only slot and the only queue entry ===
+    running = asyncio.ensure_future(enter(gate, release))
+    queued = asyncio.ensure_future(enter(gate, release))
+    await asyncio.sleep(0)
+
+    assert gate.stats()["active"] == 1
+    assert gate.stats()["queued"] == 1
+    # ===
+
+    # === check that the next request fails fast with a 503 and a Retry-After header ===
+    with pytest.raises(fastapi.HTTPException) as err:
+        await enter(gate, release)
+
+    assert err.value.status_code == 503
+    assert err.value.headers == {"Retry-After": "3"}
+    # ===
+
+    # === check that the queued request is admitted once the slot is released ===
+    release.set()
+    await asyncio.gather(running, queued)
+
+    stats = gate.stats()
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    # ===
+
+
+@pytest.mark.asyncio
+async def test_admission_gate_sheds_after_max_wait() -> None:
+    """Tests that a queued request gives up once it has waited longer than the gate allows"""
+
+    gate = admission.AdmissionGate(
+        name="test", max_concurrent=1, max_queue=1, max_wait=0.01, retry_after=1
+    )
+    release = asyncio.Event()
+
+    running = asyncio.ensure_future(enter(gate, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(fastapi.HTTPException) as err:
+        await enter(gate, release)
+
+    assert err.value.status_code == 503
+    assert gate.stats()["queued"] == 0
+
+    release.set()
+    await running
+    assert gate.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_gate_sheds_a_route_with_503() -> None:
+    """Tests that a route behind a full gate answers 503 with a Retry-After header"""
+
+    gate = admission.AdmissionGate(
+        name="slow", max_concurrent=1, max_queue=0, max_wait=5, retry_after=7
+    )
+    release = asyncio.Event()
+
+    app = fastapi.FastAPI()
+
+    @app.get("/slow", dependencies=[fastapi.Depends(gate)])
+    async def slow() -> dict:
+        await release.wait()
+
+        return {"ok": True}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        running = asyncio.ensure_future(ac.get("/slow"))
+
+        while gate.stats()["active"] == 0:
+            await asyncio.sleep(0.001)
+
+        shed = await ac.get("/slow")
+        release.set()
+        admitted = await running
+
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "7"
+    assert admitted.status_code == 200
+
+    stats = gate.stats()
+    assert stats["admitted"] == 1
+    assert stats["rejected"] == 1
+    assert stats["active"] == 0
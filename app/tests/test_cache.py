@@ -0,0 +1,39 @@
+# standard imports
+import time
+
+# user imports
+from utils.cache import TTLCache
+
+
+def test_cache_expires_entries() -> None:
+    """Tests that an entry is only returned until its expiry time"""
+
+    cache = TTLCache(max_size=10)
+
+    cache.set("fresh", 1, expires_at=time.time() + 60)
+    cache.set("expired", 2, expires_at=time.time() - 1)
+
+    assert cache.get("fresh") == 1
+    assert cache.get("expired") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Tests that the cache never grows past its size and drops the least recently used entry"""
+
+    cache = TTLCache(max_size=2)
+    expires_at = time.time() + 60
+
+    cache.set("a", 1, expires_at)
+    cache.set("b", 2, expires_at)
+
+    # using "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3, expires_at)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache.delete("a")
+    assert cache.get("a") is None
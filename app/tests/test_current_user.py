@@ -0,0 +1,98 @@
+# standard imports
+import types
+from typing import Any
+
+# third party imports
+import beanie
+import fastapi
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import models
+import queries
+import utils
+from utils import current_user
+
+
+@pytest_asyncio.fixture
+async def init_user() -> None:
+    """Saves a user on an in-memory stand-in for MongoDB, with empty caches"""
+
+    client = AsyncMongoMockClient()
+    await beanie.init_beanie(database=client.greymintauth, document_models=[models.User])
+    current_user.token_cache.clear()
+    current_user.details_cache.clear()
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "hashed")
+
+
+def count_calls(monkeypatch: pytest.MonkeyPatch, module: Any, name: str) -> list[tuple]:
+    """Replaces the coroutine function of the module with one that records its calls"""
+
+    calls: list[tuple] = []
+    func = getattr(module, name)
+
+    async def counted(*args: Any) -> Any:
+        calls.append(args)
+        return await func(*args)
+
+    monkeypatch.setattr(module, name, counted)
+
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_token_claims_are_cached_until_the_token_expires(
+    init_user: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that a token is only verified once, until the expiry in its claims, and that a bad
+    token is rejected"""
+
+    decodes = count_calls(monkeypatch, current_user.utils, "get_claims_from_jwt")
+    token = await utils.create_token("joe@x.com", 5)
+
+    # === the second use of the token is answered from the cache ===
+    claims = await current_user.get_token_claims(token)
+    assert claims["sub"] == "joe@x.com"
+    assert await current_user.get_token_claims(token) == claims
+    assert len(decodes) == 1
+    # ===
+
+    # === past the expiry of the token the cache drops it, so the token is verified again ===
+    expired = types.SimpleNamespace(time=lambda: claims["exp"] + 1)
+    monkeypatch.setattr("utils.cache.time", expired)
+
+    await current_user.get_token_claims(token)
+    assert len(decodes) == 2
+    # ===
+
+    # === a token that doesn't verify is rejected ===
+    with pytest.raises(fastapi.HTTPException) as err:
+        await current_user.get_token_claims(token[:-4] + "AAAA")
+
+    assert err.value.status_code == 401
+    # ===
+
+
+@pytest.mark.asyncio
+async def test_user_details_are_cached_until_invalidated(
+    init_user: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that the details of a user are read once, and read again after invalidate_user"""
+
+    reads = count_calls(monkeypatch, queries, "get_user_details_by_email")
+    claims = {"sub": "joe@x.com"}
+
+    details = await current_user.get_current_user_details(claims)
+    assert details.username == "joejoejoe"
+    assert await current_user.get_current_user_details(claims) is details
+    assert len(reads) == 1
+
+    current_user.invalidate_user("joe@x.com")
+    await current_user.get_current_user_details(claims)
+    assert len(reads) == 2
+
+    with pytest.raises(fastapi.HTTPException):
+        await current_user.get_current_user_details({"sub": "nobody@x.com"})
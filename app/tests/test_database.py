@@ -0,0 +1,170 @@
+# standard imports
+from datetime import datetime
+from typing import Any
+
+# third party imports
+import beanie
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import monitoring
+
+# user imports
+import models
+import queries
+from database.database import PoolMonitor, bind_models
+from database.migrate import convert_forgot_password_dates
+
+ADDRESS = ("localhost", 27017)
+
+# the version of beanie whose init_model bind_models repeats, see bind_models
+BEANIE_VERSION = "1.11.9"
+
+
+def test_pool_monitor_tracks_usage_and_peaks() -> None:
+    monitor = PoolMonitor()
+
+    for connection_id in (1, 2):
+        monitor.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, connection_id))
+        monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+
+    for connection_id in (1, 2):
+        monitor.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, connection_id))
+
+    monitor.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+
+    stats = monitor.stats()
+    assert stats["open"] == 2
+    assert stats["in_use"] == 1
+    assert stats["peak_in_use"] == 2
+    assert stats["waiting"] == 0
+    assert stats["peak_waiting"] == 2
+    assert stats["checkouts"] == 2
+
+
+def test_pool_monitor_counts_failed_checkouts() -> None:
+    monitor = PoolMonitor()
+
+    monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    reason = monitoring.ConnectionCheckOutFailedReason.TIMEOUT
+    monitor.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, reason))
+
+    stats = monitor.stats()
+    assert stats["waiting"] == 0
+    assert stats["failed_checkouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bound_models_work_without_creating_indexes() -> None:
+    """Tests that binding the models skips the index sync and still lets them be used"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await bind_models(database, [models.CreateUser])
+
+    await queries.create_a_create_user_record("some-uuid", "joe@x.com")
+
+    record = await queries.get_create_user_record_by_uuid("some-uuid")
+    assert record is not None and record.user_email == "joe@x.com"
+    assert list(await database.CreateUser.index_information()) == ["_id_"]
+
+
+def bound_state(model: Any) -> dict[str, Any]:
+    """Returns what initializing a model sets up, without the database objects"""
+
+    settings = model.get_settings()
+    state = settings.dict(exclude={"motor_db", "motor_collection", "indexes"})
+    state["indexes"] = [index.document for index in settings.indexes]
+    state["collection"] = settings.motor_collection.full_name
+    state["fields"] = {
+        name: getattr(model, name, None) for name in ("_link_fields", "_hidden_fields")
+    }
+
+    return state
+
+
+@pytest.mark.asyncio
+async def test_bind_models_matches_init_beanie() -> None:
+    """Tests that bind_models still sets the models up like init_beanie. It repeats beanie
+    internals, so this fails when beanie is upgraded until bind_models is checked against it"""
+
+    assert beanie.__version__ == BEANIE_VERSION
+
+    database = AsyncMongoMockClient().greymintauth
+
+    await beanie.init_beanie(database=database, document_models=models.DOCUMENT_MODELS)
+    initialized = {model.__name__: bound_state(model) for model in models.DOCUMENT_MODELS}
+
+    await bind_models(database, models.DOCUMENT_MODELS)
+    bound = {model.__name__: bound_state(model) for model in models.DOCUMENT_MODELS}
+
+    assert bound == initialized
+
+
+@pytest.mark.asyncio
+async def test_synced_indexes() -> None:
+    """Tests the indexes created by syncing the models, the ones bind_models expects migrate to
+    have created, including the TTL indexes that expire the create user and forgot password
+    records"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await beanie.init_beanie(database=database, document_models=models.DOCUMENT_MODELS)
+
+    def specs(indexes: dict[str, Any]) -> dict[str, tuple]:
+        return {
+            name: (list(index["key"]), index.get("unique", False), index.get("expireAfterSeconds"))
+            for name, index in indexes.items()
+        }
+
+    # username has no index, its length constraints turn the type into a constrained string that
+    # beanie doesn't see as Indexed
+    assert specs(await database.Users.index_information()) == {
+        "_id_": ([("_id", 1)], False, None),
+        "email_1": ([("email", 1)], True, None),
+        "email_details": (
+            [("email", 1), ("username", 1), ("disabled", 1), ("role", 1)],
+            False,
+            None,
+        ),
+    }
+    assert specs(await database.CreateUser.index_information()) == {
+        "_id_": ([("_id", 1)], False, None),
+        "uuid_1": ([("uuid", 1)], True, None),
+        "user_email_1": ([("user_email", 1)], False, None),
+        "expires_at_1": ([("expires_at", 1)], False, 0),
+    }
+
+    forgot_password_ttl = models.forgot_password.FORGOT_PASSWORD_EXPIRE_MINUTES * 60
+    assert specs(await database.ForgotPasswords.index_information()) == {
+        "_id_": ([("_id", 1)], False, None),
+        "user_id_1": ([("user_id", 1)], False, None),
+        "uuid_1": ([("uuid", 1)], True, None),
+        "datetime_created_1": ([("datetime_created", 1)], False, forgot_password_ttl),
+    }
+
+
+@pytest.mark.asyncio
+async def test_migrate_converts_forgot_password_string_dates() -> None:
+    """Tests that the forgot password records saved with a string date get a date the TTL index
+    can expire, and that the ones whose string isn't a date are deleted"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await bind_models(database, [models.ForgotPassword])
+
+    created = datetime(2022, 10, 1, 12, 30, 15, 123000)
+    await database.ForgotPasswords.insert_many(
+        [
+            {"user_id": "1", "uuid": "a", "token": "t", "datetime_created": str(created)},
+            {"user_id": "2", "uuid": "b", "token": "t", "datetime_created": "yesterday"},
+            {"user_id": "3", "uuid": "c", "token": "t", "datetime_created": created},
+        ]
+    )
+
+    assert await convert_forgot_password_dates() == (1, 1)
+
+    records = await database.ForgotPasswords.find().sort("uuid").to_list(None)
+    assert [(record["uuid"], record["datetime_created"]) for record in records] == [
+        ("a", created),
+        ("c", created),
+    ]
+
+    # nothing is left to convert
+    assert await convert_forgot_password_dates() == (0, 0)
@@ -0,0 +1,147 @@
+# standard imports
+import asyncio
+
+# third party imports
+import beanie
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import email_handler
+import models
+import queries
+
+
+class FailingTransport:
+    """Transport that fails every send, used to check the retries and the dead-lettering"""
+
+    max_send_seconds = 0.0
+
+    def __init__(self) -> None:
+        self.attempts = 0
+
+    async def send(self, message: models.EmailOutbox) -> None:
+        self.attempts += 1
+        raise ConnectionError("SES is unavailable")
+
+
+@pytest_asyncio.fixture
+async def init_outbox() -> None:
+    """Initializes the outbox collection on an in-memory stand-in for MongoDB"""
+
+    client = AsyncMongoMockClient()
+    await beanie.init_beanie(database=client.greymintauth, document_models=[models.EmailOutbox])
+
+
+def create_dispatcher(
+    transport: email_handler.EmailTransport, lease_seconds: float = 60
+) -> email_handler.EmailDispatcher:
+    return email_handler.EmailDispatcher(
+        transport=transport,
+        concurrency=2,
+        max_attempts=3,
+        retry_base_seconds=0,
+        retry_max_seconds=0,
+        poll_interval_seconds=0.01,
+        lease_seconds=lease_seconds,
+    )
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_sends_and_clears_the_outbox(init_outbox) -> None:
+    """Tests that queued emails are handed to the transport and then removed from the outbox"""
+
+    transport = email_handler.MemoryTransport()
+    dispatcher = create_dispatcher(transport)
+    dispatcher.start()
+
+    await queries.enqueue_email("from@greymint.com", ["to@greymint.com"], "Template", "{}")
+    await asyncio.sleep(0.1)
+    await dispatcher.stop()
+
+    assert [message.to_addresses for message in transport.sent] == [["to@greymint.com"]]
+    assert await models.EmailOutbox.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_dead_letters_after_max_attempts(init_outbox) -> None:
+    """Tests that a failing email is retried and then kept in the outbox as dead"""
+
+    transport = FailingTransport()
+    dispatcher = create_dispatcher(transport)
+    dispatcher.start()
+
+    await queries.enqueue_email("from@greymint.com", ["to@greymint.com"], "Template", "{}")
+    await asyncio.sleep(0.2)
+    await dispatcher.stop()
+
+    message = await models.EmailOutbox.find_one()
+    assert transport.attempts == 3
+    assert message.status == "dead"
+    assert message.last_error == "ConnectionError: SES is unavailable"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_waits_for_the_lease_then_reclaims(init_outbox) -> None:
+    """Tests that an email claimed by a worker that died is only sent again once its lease ran
+    out"""
+
+    await queries.enqueue_email("from@greymint.com", ["to@greymint.com"], "Template", "{}")
+
+    # === a worker claims the email and dies without sending it ===
+    claimed = await queries.claim_next_email(lease_seconds=0.3)
+    assert claimed.status == "sending"
+    assert claimed.attempts == 1
+    # ===
+
+    transport = email_handler.MemoryTransport()
+    dispatcher = create_dispatcher(transport)
+    dispatcher.start()
+
+    # === check that the email isn't sent while it is leased, then that it is once it ran out ===
+    await asyncio.sleep(0.1)
+    assert transport.sent == []
+
+    await asyncio.sleep(0.4)
+    await dispatcher.stop()
+
+    assert [message.attempts for message in transport.sent] == [2]
+    assert await models.EmailOutbox.count() == 0
+    # ===
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_dead_letters_an_expired_last_attempt(init_outbox) -> None:
+    """Tests that an email whose lease ran out on its last attempt is dead-lettered when it is
+    claimed again instead of being sent"""
+
+    await queries.enqueue_email("from@greymint.com", ["to@greymint.com"], "Template", "{}")
+
+    # every attempt was claimed by a worker that died while sending it
+    for _ in range(3):
+        await queries.claim_next_email(lease_seconds=0)
+
+    transport = email_handler.MemoryTransport()
+    dispatcher = create_dispatcher(transport)
+    dispatcher.start()
+    await asyncio.sleep(0.1)
+    await dispatcher.stop()
+
+    message = await models.EmailOutbox.find_one()
+    assert transport.sent == []
+    assert message.status == "dead"
+    assert message.attempts == 4
+    assert dispatcher.stats()["dead"] == 1
+
+
+def test_dispatcher_lease_has_to_outlast_a_send() -> None:
+    """Tests that a lease shorter than the longest send of the transport is refused"""
+
+    transport = email_handler.MemoryTransport()
+    transport.max_send_seconds = 51
+
+    with pytest.raises(ValueError):
+        create_dispatcher(transport, lease_seconds=30)
+
+    assert create_dispatcher(transport, lease_seconds=120).lease_seconds == 120
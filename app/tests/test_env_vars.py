@@ -0,0 +1,89 @@
+# standard imports
+import os
+import pathlib
+import subprocess
+import sys
+
+# third party imports
+import pytest
+
+# user imports
+import env_vars
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_main_does_not_load_the_settings() -> None:
+    """Tests that main can be imported without any settings, they are only loaded on first use"""
+
+    # a fresh interpreter with none of the env vars, so nothing loaded them before the import
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": APP_DIR}
+    script = "import main, env_vars; assert env_vars._settings is None, env_vars._settings"
+
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def limit_cpus(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path, affinity: int, cpu_max: str
+) -> None:
+    """Makes the process look like it may run on `affinity` CPUs with the cgroup v2 cpu.max"""
+
+    (tmp_path / "cpu.max").write_text(f"{cpu_max}\n")
+    monkeypatch.setattr(env_vars, "CGROUP_CPU_MAX", str(tmp_path / "cpu.max"))
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(affinity)))
+
+
+@pytest.mark.parametrize(
+    "affinity, cpu_max, cpus",
+    [
+        (8, "max 100000", 8),
+        (8, "200000 100000", 2),
+        (8, "150000 100000", 2),
+        (8, "50000 100000", 1),
+        (2, "400000 100000", 2),
+    ],
+)
+def test_available_cpus_follow_the_affinity_and_the_cgroup_quota(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path, affinity: int, cpu_max: str, cpus: int
+) -> None:
+    """Tests that the CPUs available are the ones the process may run on, capped by the quota"""
+
+    limit_cpus(monkeypatch, tmp_path, affinity, cpu_max)
+
+    assert env_vars.available_cpus() == cpus
+
+
+def test_available_cpus_read_the_cgroup_v1_quota(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    """Tests that without cgroup v2 the quota is read from cgroup v1, where -1 is no quota"""
+
+    limit_cpus(monkeypatch, tmp_path, 8, "")
+    monkeypatch.setattr(env_vars, "CGROUP_CPU_MAX", str(tmp_path / "missing"))
+    monkeypatch.setattr(env_vars, "CGROUP_V1_CPU_QUOTA", str(tmp_path / "cpu.cfs_quota_us"))
+    monkeypatch.setattr(env_vars, "CGROUP_V1_CPU_PERIOD", str(tmp_path / "cpu.cfs_period_us"))
+
+    (tmp_path / "cpu.cfs_period_us").write_text("100000\n")
+    (tmp_path / "cpu.cfs_quota_us").write_text("300000\n")
+    assert env_vars.available_cpus() == 3
+
+    (tmp_path / "cpu.cfs_quota_us").write_text("-1\n")
+    assert env_vars.available_cpus() == 8
+
+
+def test_workers_and_password_pool_default_to_the_available_cpus(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    """Tests that the workers and the password pool are sized by the CPUs available, not by the
+    CPUs of the host"""
+
+    limit_cpus(monkeypatch, tmp_path, 8, "200000 100000")
+    monkeypatch.delenv("SERVER_WORKERS", raising=False)
+    monkeypatch.delenv("PASSWORD_POOL_SIZE", raising=False)
+
+    settings = env_vars.Settings()
+    assert (settings.SERVER_WORKERS, settings.PASSWORD_POOL_SIZE) == (2, 2)
@@ -0,0 +1,55 @@
+# standard imports
+import asyncio
+import logging
+import time
+
+# third party imports
+import pytest
+
+# user imports
+import loop_monitor
+
+
+def block_the_loop(seconds: float) -> None:
+    """Stands in for a blocking call made on the event loop"""
+
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_logs_the_stack_of_a_block(caplog) -> None:
+    """Tests that a blocking call is logged with its stack while it blocks, and counted once"""
+
+    monitor = loop_monitor.LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+
+    with caplog.at_level(logging.WARNING, logger="loop_monitor.loop_monitor"):
+        await asyncio.sleep(0.05)
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+
+    await monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["blocks"] == 1
+    assert stats["max_lag_ms"] >= 250
+
+    assert len(caplog.records) == 1
+    assert "block_the_loop" in caplog.records[0].getMessage()
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_is_quiet_when_nothing_blocks(caplog) -> None:
+    """Tests that a loop that only awaits is never reported as blocked"""
+
+    monitor = loop_monitor.LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+
+    with caplog.at_level(logging.WARNING, logger="loop_monitor.loop_monitor"):
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+
+    await monitor.stop()
+
+    assert monitor.stats()["blocks"] == 0
+    assert not caplog.records
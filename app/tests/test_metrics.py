@@ -0,0 +1,139 @@
+# standard imports
+import asyncio
+import threading
+from typing import Iterator, Optional
+
+# third party imports
+import beanie
+import fastapi
+from httpx import AsyncClient
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import admission
+import exceptions
+import models
+import queries
+from metrics import metrics
+from utils import passwords
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+# the metrics register on the global Prometheus registry, which takes each name once
+_enabled_metrics: Optional[metrics._Metrics] = None
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch: pytest.MonkeyPatch) -> Iterator[metrics._Metrics]:
+    """Enables metrics, the same metrics are used by every test"""
+
+    global _enabled_metrics
+
+    if _enabled_metrics is None:
+        _enabled_metrics = metrics._Metrics()
+
+    monkeypatch.setattr(metrics, "_metrics", _enabled_metrics)
+    monkeypatch.setattr(metrics, "_metrics_loaded", True)
+
+    yield _enabled_metrics
+
+
+def sample(name: str, **labels: str) -> float:
+    """Returns the value of the sample, 0 if it hasn't been recorded"""
+
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_requests_are_recorded_by_route_template(enabled_metrics: metrics._Metrics) -> None:
+    """Tests that a request is counted and timed under the template of its route rather than
+    its path, and that the metrics are served at /metrics"""
+
+    app = fastapi.FastAPI()
+
+    @app.get("/users/{user_id}")
+    async def read_user(user_id: str) -> dict:
+        return {"user_id": user_id}
+
+    metrics.add_metrics(app)
+
+    labels = {"method": "GET", "route": "/users/{user_id}"}
+    requests = sample("auth_http_requests_total", status="200", **labels)
+    timed_requests = sample("auth_http_request_duration_seconds_count", **labels)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.get("/users/1")
+        await ac.get("/users/2")
+        exposition = (await ac.get("/metrics")).text
+
+    assert sample("auth_http_requests_total", status="200", **labels) == requests + 2
+    assert sample("auth_http_request_duration_seconds_count", **labels) == timed_requests + 2
+
+    assert 'route="/users/{user_id}"' in exposition
+    assert 'route="/users/1"' not in exposition
+
+
+@pytest.mark.asyncio
+async def test_queries_are_timed_as_mongo(enabled_metrics: metrics._Metrics) -> None:
+    """Tests that a query timed as mongo records its time under its name"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await beanie.init_beanie(database=database, document_models=[models.User])
+
+    labels = {"route": "background", "dependency": "mongo", "operation": "user_exists_with_email"}
+    queries_timed = sample("auth_dependency_duration_seconds_count", **labels)
+
+    await queries.user_exists_with_email("joe@x.com")
+
+    assert sample("auth_dependency_duration_seconds_count", **labels) == queries_timed + 1
+
+
+@pytest.mark.asyncio
+async def test_password_pool_and_admission_usage_are_exported(
+    enabled_metrics: metrics._Metrics,
+) -> None:
+    """Tests that the jobs of the password pool and the requests at an admission gate are
+    exported as they are running and queued, and that the ones shed are counted"""
+
+    # === a pool with one job running and one queued ===
+    pool = passwords.PasswordWorkerPool("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    shed = sample("auth_requests_shed_total", shed_by="password_pool")
+
+    jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert sample("auth_password_pool_jobs", state="running") == 1
+    assert sample("auth_password_pool_jobs", state="queued") == 1
+
+    with pytest.raises(exceptions.PasswordPoolSaturatedError):
+        await pool.run(release.wait)
+
+    assert sample("auth_requests_shed_total", shed_by="password_pool") == shed + 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+    assert sample("auth_password_pool_jobs", state="running") == 0
+    # ===
+
+    # === a gate with one request active ===
+    gate = admission.AdmissionGate(
+        name="metrics-test", max_concurrent=1, max_queue=1, max_wait=5, retry_after=1
+    )
+    gate_release = asyncio.Event()
+
+    async def enter() -> None:
+        async for _ in gate():
+            await gate_release.wait()
+
+    running = asyncio.ensure_future(enter())
+    await asyncio.sleep(0)
+
+    assert sample("auth_admission_requests", gate="metrics-test", state="active") == 1
+    assert sample("auth_admission_requests", gate="metrics-test", state="queued") == 0
+
+    gate_release.set()
+    await running
+    assert sample("auth_admission_requests", gate="metrics-test", state="active") == 0
+    # ===
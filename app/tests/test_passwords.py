@@ -0,0 +1,121 @@
+# standard imports
+import asyncio
+import threading
+
+# third party imports
+import pytest
+
+# user imports
+import env_vars
+import exceptions
+from utils import passwords
+
+
+@pytest.mark.asyncio
+async def test_password_pool_hashes_off_the_event_loop() -> None:
+    """Tests that hashing and verifying run on a worker thread and give the expected results"""
+
+    pool = passwords.PasswordWorkerPool(kind="thread", max_workers=2, max_queue=2)
+
+    # === check that the work isn't done on the thread running the event loop ===
+    worker_thread = await pool.run(threading.get_ident)
+    assert worker_thread != threading.get_ident()
+    # ===
+
+    # === check that a hash made on the pool can be verified on the pool ===
+    hashed_password = await pool.run(passwords.hash_password_sync, "p@ssword")
+    assert await pool.run(passwords.verify_password_sync, "p@ssword", hashed_password)
+    assert not await pool.run(passwords.verify_password_sync, "notthepassword", hashed_password)
+    # ===
+
+    stats = pool.stats()
+    assert stats["submitted"] == 4
+    assert stats["completed"] == 4
+    assert stats["queued"] == 0
+
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_pool_rejects_when_queue_is_full() -> None:
+    """Tests that the pool refuses work once both the workers and the queue are in use"""
+
+    pool = passwords.PasswordWorkerPool(kind="thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    # === fill the only worker and the only queue slot ===
+    running = asyncio.ensure_future(pool.run(release.wait))
+    queued = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0)
+
+    stats = pool.stats()
+    assert stats["running"] == 1
+    assert stats["queued"] == 1
+    # ===
+
+    # === check that the next job is rejected instead of queued ===
+    with pytest.raises(exceptions.PasswordPoolSaturatedError):
+        await pool.run(release.wait)
+
+    assert pool.stats()["rejected"] == 1
+    # ===
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert pool.stats()["completed"] == 2
+
+    pool.shutdown()
+
+
+def test_outdated_hashes_are_upgraded() -> None:
+    """Tests that hashes made with a lower cost are rehashed when they are verified"""
+
+    settings_in_use = passwords._context_settings
+    old_settings = passwords.build_context_settings("bcrypt", 4, 19456, 2, 1)
+    new_settings = passwords.build_context_settings("bcrypt", 5, 19456, 2, 1)
+
+    # === check that a hash made with fewer rounds is upgraded ===
+    passwords.configure_password_context(old_settings)
+    old_hash = passwords.hash_password_sync("p@ssword")
+
+    passwords.configure_password_context(new_settings)
+    is_valid, new_hash = passwords.verify_and_update_password_sync("p@ssword", old_hash)
+
+    assert is_valid
+    assert new_hash is not None and new_hash.startswith("$2b$05$")
+    # ===
+
+    # === check that an up to date hash isn't touched and a wrong password isn't upgraded ===
+    assert passwords.verify_and_update_password_sync("p@ssword", new_hash) == (True, None)
+    assert passwords.verify_and_update_password_sync("notthepassword", old_hash) == (False, None)
+    # ===
+
+    passwords.configure_password_context(settings_in_use)
+
+
+@pytest.mark.asyncio
+async def test_pinned_password_hashing_is_not_calibrated_again(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that the settings pinned before forking are used as they are by the workers"""
+
+    calibrations = []
+
+    def calibrate_bcrypt_rounds(target_ms: float) -> int:
+        calibrations.append(target_ms)
+        return 5
+
+    settings_in_use = passwords._context_settings
+    monkeypatch.setattr(passwords, "calibrate_bcrypt_rounds", calibrate_bcrypt_rounds)
+    monkeypatch.setattr(passwords, "_pinned_settings", None)
+    monkeypatch.setattr(env_vars, "PASSWORD_SCHEME", "bcrypt", raising=False)
+    monkeypatch.setattr(env_vars, "PASSWORD_HASH_TARGET_MS", 250, raising=False)
+
+    pinned = passwords.pin_password_hashing()
+    assert pinned["bcrypt__default_rounds"] == 5
+
+    # a worker configuring its hashing on startup takes the pinned settings
+    assert await passwords.configure_password_hashing() == pinned
+    assert calibrations == [250]
+
+    passwords.configure_password_context(settings_in_use)
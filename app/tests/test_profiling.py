@@ -0,0 +1,158 @@
+# standard imports
+import asyncio
+import os
+import pathlib
+import pstats
+import time
+
+# third party imports
+import fastapi
+from httpx import AsyncClient
+import pytest
+
+# user imports
+import profiling
+
+TOKEN = "profiling-token"
+
+
+def create_app(directory: str, mode: str = "sample", max_profiles: int = 100) -> fastapi.FastAPI:
+    """Returns an app with a busy endpoint behind the profiling middleware"""
+
+    app = fastapi.FastAPI()
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        token=TOKEN,
+        directory=directory,
+        mode=mode,
+        sample_interval=0.0005,
+        max_profiles=max_profiles,
+    )
+
+    @app.get("/busy")
+    async def busy(wait: float = 0) -> dict:
+        await asyncio.sleep(wait)
+        deadline = time.perf_counter() + 0.05
+
+        while time.perf_counter() < deadline:
+            pass
+
+        return {"ok": True}
+
+    return app
+
+
+def saved_profiles(directory: pathlib.Path) -> list[str]:
+    """Returns the names of the profiles in the directory, leaving out the slot lock files"""
+
+    return sorted(name for name in os.listdir(directory) if not name.startswith("."))
+
+
+@pytest.mark.asyncio
+async def test_profiling_only_profiles_authorized_requests(tmp_path) -> None:
+    """Tests that only the requests with the profiling token are profiled, under their request id"""
+
+    app = create_app(str(tmp_path))
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        unprofiled = await ac.get("/busy", headers={"X-Profile-Token": "wrong"})
+        profiled = await ac.get(
+            "/busy", headers={"X-Profile-Token": TOKEN, "X-Request-ID": "request-1"}
+        )
+
+    assert unprofiled.status_code == 200
+    assert "x-profile-id" not in unprofiled.headers
+
+    assert profiled.status_code == 200
+    assert profiled.headers["x-profile-id"] == "request-1"
+    assert saved_profiles(tmp_path) == ["request-1.collapsed"]
+
+    # the endpoint spends its time spinning, so that is where the samples are
+    stacks = (tmp_path / "request-1.collapsed").read_text()
+    assert "busy (test_profiling.py) " in stacks
+
+
+@pytest.mark.asyncio
+async def test_profiling_cprofile_writes_pstats(tmp_path) -> None:
+    """Tests that the cprofile mode saves stats that pstats can load"""
+
+    app = create_app(str(tmp_path))
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(
+            "/busy", headers={"X-Profile-Token": TOKEN, "X-Profile-Mode": "cprofile"}
+        )
+
+    profile_id = response.headers["x-profile-id"]
+    stats = pstats.Stats(str(tmp_path / f"{profile_id}.pstats"))
+
+    assert any(name == "busy" for _, _, name in stats.stats)
+
+
+@pytest.mark.asyncio
+async def test_profiling_limits_concurrent_profiles(tmp_path) -> None:
+    """Tests that a request past the limit of concurrent profiles is served without a profile"""
+
+    app = create_app(str(tmp_path))
+    headers = {"X-Profile-Token": TOKEN}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first, second = await asyncio.gather(
+            ac.get("/busy", params={"wait": 0.05}, headers=headers),
+            ac.get("/busy", headers=headers),
+        )
+
+    assert first.headers["x-profile-status"] == "profiled"
+    assert second.status_code == 200
+    assert second.headers["x-profile-status"] == "busy"
+    assert len(saved_profiles(tmp_path)) == 1
+
+
+@pytest.mark.asyncio
+async def test_profiling_limit_is_shared_by_the_workers(tmp_path) -> None:
+    """Tests that the limit holds across workers profiling into the same directory"""
+
+    headers = {"X-Profile-Token": TOKEN}
+
+    async with AsyncClient(app=create_app(str(tmp_path)), base_url="http://test") as worker_1:
+        async with AsyncClient(app=create_app(str(tmp_path)), base_url="http://test") as worker_2:
+            first, second = await asyncio.gather(
+                worker_1.get("/busy", params={"wait": 0.05}, headers=headers),
+                worker_2.get("/busy", headers=headers),
+            )
+
+    assert first.headers["x-profile-status"] == "profiled"
+    assert second.headers["x-profile-status"] == "busy"
+    assert len(saved_profiles(tmp_path)) == 1
+
+
+@pytest.mark.asyncio
+async def test_profiling_keeps_existing_profiles(tmp_path) -> None:
+    """Tests that a request id that already has a profile doesn't overwrite it"""
+
+    app = create_app(str(tmp_path))
+    headers = {"X-Profile-Token": TOKEN, "X-Request-ID": "request-1"}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.get("/busy", headers=headers)
+        stacks = (tmp_path / "request-1.collapsed").read_text()
+
+        again = await ac.get("/busy", headers={**headers, "X-Profile-Mode": "cprofile"})
+
+    assert again.status_code == 200
+    assert again.headers["x-profile-status"] == "exists"
+    assert saved_profiles(tmp_path) == ["request-1.collapsed"]
+    assert (tmp_path / "request-1.collapsed").read_text() == stacks
+
+
+@pytest.mark.asyncio
+async def test_profiling_keeps_the_newest_profiles(tmp_path) -> None:
+    """Tests that the oldest profiles are deleted past the limit of saved profiles"""
+
+    app = create_app(str(tmp_path), max_profiles=2)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for request_id in ("request-1", "request-2", "request-3"):
+            await ac.get("/busy", headers={"X-Profile-Token": TOKEN, "X-Request-ID": request_id})
+
+    assert saved_profiles(tmp_path) == ["request-2.collapsed", "request-3.collapsed"]
@@ -0,0 +1,174 @@
+# standard imports
+import asyncio
+from typing import Any
+
+# third party imports
+import beanie
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import models
+import queries
+
+
+@pytest_asyncio.fixture
+async def init_records() -> None:
+    """Initializes the collections on an in-memory stand-in for MongoDB"""
+
+    client = AsyncMongoMockClient()
+    await beanie.init_beanie(
+        database=client.greymintauth,
+        document_models=[models.CreateUser, models.ForgotPassword, models.User],
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_user_record_is_redeemed_once(init_records: None) -> None:
+    """Tests that concurrent redemptions of the same link only give the record to one of them"""
+
+    await queries.create_a_create_user_record("some-uuid", "joe@x.com")
+
+    results = await asyncio.gather(
+        *(queries.redeem_create_user_record("some-uuid") for _ in range(5))
+    )
+    redeemed = [record for record in results if record is not None]
+
+    assert len(redeemed) == 1
+    assert redeemed[0].user_email == "joe@x.com"
+    assert await queries.get_create_user_record_by_uuid("some-uuid") is None
+
+
+@pytest.mark.asyncio
+async def test_forgot_password_attempt_is_redeemed_once(init_records: None) -> None:
+    """Tests that a forgot password record can only be redeemed once and is then gone"""
+
+    await queries.save_forgot_password_attempt("user-id", "some-uuid", "some-token")
+
+    record = await queries.redeem_forgot_password_attempt("some-uuid")
+    assert record is not None and record.token == "some-token"
+
+    assert await queries.redeem_forgot_password_attempt("some-uuid") is None
+    assert await queries.get_forgot_password_attempt_by_user_id("user-id") is None
+
+
+@pytest.mark.asyncio
+async def test_update_user_returns_the_saved_user(init_records: None) -> None:
+    """Tests that updating a user returns the user as saved, with its token version bumped"""
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "hashed")
+
+    user = await queries.update_user_by_email("joe@x.com", {"disabled": True})
+    assert user is not None
+    assert user.disabled
+    assert user.token_version == 1
+
+    saved_user = await queries.get_user_by_email("joe@x.com")
+    assert saved_user.disabled and saved_user.token_version == 1
+
+    assert await queries.update_user_by_email("nobody@x.com", {"disabled": True}) is None
+
+
+@pytest.mark.asyncio
+async def test_rehash_keeps_a_password_changed_meanwhile(init_records: None) -> None:
+    """Tests that upgrading the hash verified at login doesn't undo a password change made while
+    it was being verified"""
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "old-hash")
+    user = await queries.get_user_auth_by_email("joe@x.com")
+
+    # the password is changed while the login verifies the old one
+    await queries.update_user_by_email("joe@x.com", {"hashed_password": "new-hash"})
+
+    assert not await queries.set_user_hashed_password(user.id, "old-hash", "rehashed-old")
+    assert (await queries.get_user_by_email("joe@x.com")).hashed_password == "new-hash"
+
+    # without a change in between the hash is upgraded
+    assert await queries.set_user_hashed_password(user.id, "new-hash", "rehashed-new")
+    assert (await queries.get_user_by_email("joe@x.com")).hashed_password == "rehashed-new"
+
+
+@pytest.mark.asyncio
+async def test_user_views_only_read_their_fields(init_records: None) -> None:
+    """Tests that the user views return their fields and leave the rest of the user out"""
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "hashed")
+
+    details = await queries.get_user_details_by_email("joe@x.com")
+    assert details.dict() == {
+        "username": "joejoejoe",
+        "email": "joe@x.com",
+        "disabled": False,
+        "role": "standard",
+    }
+
+    auth = await queries.get_user_auth_by_email("joe@x.com")
+    assert auth.hashed_password == "hashed"
+    assert auth.id == (await queries.get_user_by_email("joe@x.com")).id
+
+    assert await queries.user_exists_with_email("joe@x.com")
+    assert not await queries.user_exists_with_email("nobody@x.com")
+    assert await queries.get_user_details_by_email("nobody@x.com") is None
+
+
+@pytest.mark.asyncio
+async def test_raw_user_reads_match_beanie(init_records: None) -> None:
+    """Tests that the raw read path returns the same user data as the Beanie one"""
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "hashed")
+    user = await queries.get_user_by_email("joe@x.com")
+
+    record = await queries.user_raw.get_user_by_email("joe@x.com")
+    assert record.id == user.id
+    assert (record.username, record.email, record.role) == (user.username, user.email, user.role)
+    assert record.token_version == user.token_version
+
+    details = await queries.user_raw.get_user_details_by_email("joe@x.com")
+    assert details == models.UserDetailsRecord("joejoejoe", "joe@x.com", False, "standard")
+
+    auth = await queries.user_raw.get_user_auth_by_email("joe@x.com")
+    assert auth.id == user.id and auth.hashed_password == "hashed"
+
+    assert await queries.user_raw.user_exists_with_email("joe@x.com")
+    assert await queries.user_raw.get_user_by_email("nobody@x.com") is None
+
+
+@pytest.mark.asyncio
+async def test_raw_details_lookup_reads_only_the_indexed_fields(
+    init_records: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that the raw details lookup asks for the covering index and projects the document
+    down to the fields the index holds"""
+
+    await queries.create_user_record("joejoejoe", "joe@x.com", "hashed")
+
+    hints = []
+    documents = []
+    find = models.User.get_motor_collection().find
+
+    def find_hinted(*args: Any, **kwargs: Any) -> Any:
+        cursor = find(*args, **kwargs)
+        hint = cursor.hint
+        monkeypatch.setattr(cursor, "hint", lambda index: hints.append(index) or hint(index))
+        return cursor
+
+    from_document = models.UserDetailsRecord.from_document
+    monkeypatch.setattr(models.User.get_motor_collection(), "find", find_hinted)
+    monkeypatch.setattr(
+        models.UserDetailsRecord,
+        "from_document",
+        lambda document: documents.append(document) or from_document(document),
+    )
+
+    details = await queries.user_raw.get_user_details_by_email("joe@x.com")
+    assert details == models.UserDetailsRecord("joejoejoe", "joe@x.com", False, "standard")
+
+    # === the hinted index holds every field of the document that was read, and nothing else ===
+    (details_index,) = models.User.get_settings().indexes
+    assert hints == [details_index.document["name"]]
+
+    (document,) = documents
+    assert sorted(document) == sorted(details_index.document["key"])
+    assert sorted(document) == ["disabled", "email", "role", "username"]
+    # ===
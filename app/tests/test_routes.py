@@ -0,0 +1,199 @@
+# standard imports
+from typing import Any, AsyncIterator, Optional
+
+# third party imports
+import beanie
+from httpx import AsyncClient, Response
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+# user imports
+import env_vars
+import main
+import models
+import queries
+import utils
+from utils import current_user, passwords
+
+
+@pytest_asyncio.fixture
+async def client() -> AsyncIterator[AsyncClient]:
+    """Returns a client of the application, backed by an in-memory stand-in for MongoDB"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await beanie.init_beanie(database=database, document_models=models.DOCUMENT_MODELS)
+    current_user.token_cache.clear()
+    current_user.details_cache.clear()
+
+    # the cheapest hashes, the tests don't need them to be slow
+    settings_in_use = passwords._context_settings
+    passwords.configure_password_context(passwords.build_context_settings("bcrypt", 4, 19456, 2, 1))
+
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        yield ac
+
+    passwords.configure_password_context(settings_in_use)
+
+
+async def sign_up(email: str, password: str) -> None:
+    """Saves a user with the email and password"""
+
+    await queries.create_user_record("joejoejoe", email, await utils.hash_password(password))
+
+
+async def log_in(client: AsyncClient, email: str, password: str) -> Response:
+    """Asks for a token with the email and password"""
+
+    return await client.post("/api/v1/user/token/", data={"username": email, "password": password})
+
+
+@pytest.mark.asyncio
+async def test_login_rehash_keeps_a_password_changed_meanwhile(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that a login upgrading an outdated hash is refused, and doesn't undo the change, when
+    the password is changed while the login verifies the old one"""
+
+    settings_in_use = passwords._context_settings
+    old_settings = passwords.build_context_settings("bcrypt", 4, 19456, 2, 1)
+    new_settings = passwords.build_context_settings("bcrypt", 5, 19456, 2, 1)
+
+    # the user was saved with a hash that the login will find outdated
+    passwords.configure_password_context(old_settings)
+    old_hash = await utils.hash_password("old-pass")
+    await queries.create_user_record("joejoejoe", "joe@x.com", old_hash)
+    passwords.configure_password_context(new_settings)
+
+    validate_and_rehash_password = utils.validate_and_rehash_password
+    new_hash = await utils.hash_password("new-pass")
+
+    async def change_password_while_verifying(*args: Any) -> tuple[bool, Optional[str]]:
+        result = await validate_and_rehash_password(*args)
+        await queries.update_user_by_email("joe@x.com", {"hashed_password": new_hash})
+        return result
+
+    monkeypatch.setattr(utils, "validate_and_rehash_password", change_password_while_verifying)
+
+    try:
+        response = await log_in(client, "joe@x.com", "old-pass")
+
+    finally:
+        passwords.configure_password_context(settings_in_use)
+
+    assert response.status_code == 401
+    assert (await queries.get_user_by_email("joe@x.com")).hashed_password == new_hash
+
+
+@pytest.mark.asyncio
+async def test_user_changes_drop_the_cached_details(client: AsyncClient) -> None:
+    """Tests that editing, changing the password of and disabling a user are seen straight away
+    by the worker that made the change"""
+
+    await sign_up("joe@x.com", "p@ssword1")
+    token = (await log_in(client, "joe@x.com", "p@ssword1")).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    details = await client.get("/api/v1/user/details/", headers=headers)
+    assert details.json()["role"] == "standard"
+
+    # === edit ===
+    edited = await client.put("/api/v1/user/edit/", headers=headers, json={"role": "admin"})
+    assert edited.status_code == 202
+
+    details = await client.get("/api/v1/user/details/", headers=headers)
+    assert details.json()["role"] == "admin"
+    # ===
+
+    # === update password ===
+    assert current_user.details_cache.get("joe@x.com") is not None
+
+    updated = await client.put(
+        "/api/v1/user/update-password/", headers=headers, json={"password": "newp@ssword"}
+    )
+    assert updated.status_code == 202
+    assert current_user.details_cache.get("joe@x.com") is None
+    # ===
+
+    # === disable ===
+    await client.get("/api/v1/user/details/", headers=headers)
+
+    disabled = await client.put("/api/v1/user/disable/", headers=headers)
+    assert disabled.status_code == 202
+
+    details = await client.get("/api/v1/user/details/", headers=headers)
+    assert details.json()["disabled"] is True
+    # ===
+
+
+@pytest.mark.asyncio
+async def test_claims_tokens_serve_the_details_without_reading_the_user(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that with DETAILS_FROM_CLAIMS the details come from a claims-bearing token, without
+    a read of the user"""
+
+    monkeypatch.setattr(env_vars, "TOKEN_FORMAT", "claims", raising=False)
+    monkeypatch.setattr(env_vars, "DETAILS_FROM_CLAIMS", True, raising=False)
+
+    await sign_up("joe@x.com", "p@ssword1")
+    token = (await log_in(client, "joe@x.com", "p@ssword1")).json()["access_token"]
+
+    claims = await utils.get_claims_from_jwt(token)
+    assert claims["username"] == "joejoejoe"
+    assert (claims["role"], claims["disabled"], claims["ver"]) == ("standard", False, 0)
+
+    reads = []
+    monkeypatch.setattr(queries, "get_user_details_by_email", lambda *args: reads.append(args))
+
+    headers = {"Authorization": f"Bearer {token}"}
+    details = await client.get("/api/v1/user/details/", headers=headers)
+    assert details.status_code == 200
+    assert details.json() == {
+        "username": "joejoejoe",
+        "email": "joe@x.com",
+        "disabled": False,
+        "role": "standard",
+    }
+    assert reads == []
+
+
+@pytest.mark.asyncio
+async def test_user_changes_bump_the_token_version(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that every change of a user bumps its token version, and that the details served from
+    an older token are the ones it was issued with, the accepted risk of DETAILS_FROM_CLAIMS"""
+
+    monkeypatch.setattr(env_vars, "TOKEN_FORMAT", "claims", raising=False)
+    monkeypatch.setattr(env_vars, "DETAILS_FROM_CLAIMS", True, raising=False)
+
+    await sign_up("joe@x.com", "p@ssword1")
+    token = (await log_in(client, "joe@x.com", "p@ssword1")).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # === edit, update password and disable each bump the version ===
+    await client.put("/api/v1/user/edit/", headers=headers, json={"role": "admin"})
+    assert (await queries.get_user_by_email("joe@x.com")).token_version == 1
+
+    await client.put(
+        "/api/v1/user/update-password/", headers=headers, json={"password": "newp@ssword"}
+    )
+    assert (await queries.get_user_by_email("joe@x.com")).token_version == 2
+
+    await client.put("/api/v1/user/disable/", headers=headers)
+    assert (await queries.get_user_by_email("joe@x.com")).token_version == 3
+    # ===
+
+    # === the old token still carries version 0 and the details it was issued with ===
+    assert (await utils.get_claims_from_jwt(token))["ver"] == 0
+
+    details = (await client.get("/api/v1/user/details/", headers=headers)).json()
+    assert (details["role"], details["disabled"]) == ("standard", False)
+    # ===
+
+    # === a new token carries the current version and details ===
+    token = (await log_in(client, "joe@x.com", "newp@ssword")).json()["access_token"]
+    claims = await utils.get_claims_from_jwt(token)
+    assert (claims["ver"], claims["role"], claims["disabled"]) == (3, "admin", True)
+    # ===
@@ -0,0 +1,55 @@
+# standard imports
+import pathlib
+import types
+
+# third party imports
+import pytest
+
+# user imports
+import env_vars
+import serve
+
+
+def test_server_options_follow_the_env_vars(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that gunicorn runs the configured number of uvicorn workers, recycled after the
+    configured number of requests plus the jitter"""
+
+    settings = {
+        "SERVER_BIND": "127.0.0.1:8000",
+        "SERVER_WORKERS": 3,
+        "SERVER_PRELOAD": True,
+        "SERVER_MAX_REQUESTS": 1000,
+        "SERVER_MAX_REQUESTS_JITTER": 50,
+        "SERVER_GRACEFUL_TIMEOUT_SECONDS": 10,
+        "SERVER_KEEPALIVE_SECONDS": 5,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(env_vars, name, value, raising=False)
+
+    server = serve.Server(serve.server_options_from_env())
+
+    assert server.cfg.bind == ["127.0.0.1:8000"]
+    assert server.cfg.workers == 3
+    assert server.cfg.worker_class_str == "uvicorn.workers.UvicornWorker"
+    assert server.cfg.preload_app is True
+    assert (server.cfg.max_requests, server.cfg.max_requests_jitter) == (1000, 50)
+    assert (server.cfg.graceful_timeout, server.cfg.keepalive) == (10, 5)
+    assert server.cfg.child_exit is serve.child_exit
+
+
+def test_child_exit_drops_the_gauges_of_the_worker(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    """Tests that the master marks an exited worker dead only when the workers share metrics"""
+
+    dead = []
+    monkeypatch.setattr(serve, "multiprocess", types.SimpleNamespace(mark_process_dead=dead.append))
+    worker = types.SimpleNamespace(pid=1234)
+
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    serve.child_exit(None, worker)
+    assert dead == []
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    serve.child_exit(None, worker)
+    assert dead == [1234]
@@ -0,0 +1,285 @@
+# standard imports
+import asyncio
+import os
+import pathlib
+from datetime import datetime, timedelta
+from typing import Any
+
+# third party imports
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from httpx import AsyncClient
+import pytest
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+# user imports
+import env_vars
+import main
+import tokens
+from controller import jwks
+
+# the example key of RFC 7638 section 3.1 and the thumbprint the RFC gives for it
+RFC_7638_KEY = {
+    "kty": "RSA",
+    "n": (
+        "0vx7agoebGcQSuuPiLJXZptN9nndrQmbXEps2aiAFbWhM78LhWx4cbbfAAtVT86zwu1RK7aPFFxuhDR1"
+        "L6tSoc_BJECPebWKRXjBZCiFV4n3oknjhMstn64tZ_2W-5JsGY4Hc5n9yBXArwl93lqt7_RN5w6Cf0h4"
+        "QyQ5v-65YGjQR0_FDW2QvzqY368QQMicAtaSqzs8KJZgnYb9c7d0zgdAZHzu6qMQvRL5hajrn1n91CbO"
+        "pbISD08qNLyrdkt-bFTWhAI4vMQFh6WeZu0fM4lFd2NcRwr3XPksINHaQ-G_xBniIqbw0Ls1jF44-csF"
+        "Cur-kEgU8awapJzKnqDKgw"
+    ),
+    "e": "AQAB",
+    "alg": "RS256",
+    "kid": "2011-04-29",
+}
+RFC_7638_THUMBPRINT = "NzbLsXh8uDCcd-6MNwXF4W_7noWXFZAfHkxZsRGC9Xs"
+
+
+def private_key_pem(algorithm: str) -> str:
+    """Returns a new PEM private key for the algorithm"""
+
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def write_key(keys_dir: pathlib.Path, kid: str, secret: str, mtime: int) -> None:
+    """Writes a shared secret to the key directory with a given modification time"""
+
+    path = keys_dir / f"{kid}.key"
+    path.write_text(secret)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.asyncio
+async def test_key_ring_rotates_without_invalidating_tokens(tmp_path: pathlib.Path) -> None:
+    """Tests that a new key is picked up from the directory and old tokens still verify"""
+
+    write_key(tmp_path, "first", "first-secret", mtime=1_000)
+    loader = tokens.KeyRingLoader(algorithm="HS256", keys_dir=str(tmp_path), reload_seconds=3600)
+
+    # === sign a token with the only key in the directory ===
+    signing_key = loader.ring().signing_key
+    assert signing_key.kid == "first"
+
+    token = signing_key.encode({"sub": "joe@x.com"})
+    # ===
+
+    # === add a newer key, it's picked up as soon as a token names it ===
+    write_key(tmp_path, "second", "second-secret", mtime=2_000)
+    assert loader.ring().signing_key.kid == "first"
+
+    assert await loader.find("second") is not None
+    assert loader.ring().signing_key.kid == "second"
+    # ===
+
+    # === the token signed with the first key still verifies ===
+    key = await loader.find(tokens.get_backend().get_unverified_header(token)["kid"])
+    assert key.decode(token)["sub"] == "joe@x.com"
+    # ===
+
+    assert await loader.find("unknown") is None
+
+
+@pytest.mark.asyncio
+async def test_key_ring_reloads_in_the_background(tmp_path: pathlib.Path) -> None:
+    """Tests that on an event loop a due check serves the current keys while the directory is read
+    on a worker thread"""
+
+    write_key(tmp_path, "first", "first-secret", mtime=1_000)
+    loader = tokens.KeyRingLoader(algorithm="HS256", keys_dir=str(tmp_path), reload_seconds=0)
+    assert loader.ring().signing_key.kid == "first"
+
+    write_key(tmp_path, "second", "second-secret", mtime=2_000)
+
+    # the check is due, the ring in use is returned and the new one is loaded off the loop
+    assert loader.ring().signing_key.kid == "first"
+    await loader._reloading
+
+    assert loader.ring().signing_key.kid == "second"
+
+
+@pytest.mark.asyncio
+async def test_key_ring_forced_reloads_are_shared_and_limited(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that the tokens naming a new key wait for one reload between them, and that unknown
+    key ids can't force a reload more than once a second"""
+
+    loads = []
+    load_key_ring_from_dir = tokens.ring.load_key_ring_from_dir
+
+    def counted_load(*args: Any) -> tokens.KeyRing:
+        loads.append(args)
+        return load_key_ring_from_dir(*args)
+
+    monkeypatch.setattr(tokens.ring, "load_key_ring_from_dir", counted_load)
+
+    write_key(tmp_path, "first", "first-secret", mtime=1_000)
+    loader = tokens.KeyRingLoader(algorithm="HS256", keys_dir=str(tmp_path), reload_seconds=3600)
+    loader.ring()
+
+    # === the requests naming the new key all find it with a single load ===
+    write_key(tmp_path, "second", "second-secret", mtime=2_000)
+    keys = await asyncio.gather(*(loader.find("second") for _ in range(5)))
+
+    assert all(key is not None and key.kid == "second" for key in keys)
+    assert len(loads) == 2
+    # ===
+
+    # === made up key ids are turned away without reading the directory again ===
+    write_key(tmp_path, "third", "third-secret", mtime=3_000)
+
+    assert await loader.find("made-up") is None
+    assert await loader.find("third") is None
+    assert len(loads) == 2
+    # ===
+
+
+def test_key_ring_signs_with_the_chosen_key(tmp_path: pathlib.Path) -> None:
+    """Tests that the signing_kid file picks the signing key and a bad reload keeps the old keys"""
+
+    write_key(tmp_path, "first", "first-secret", mtime=1_000)
+    write_key(tmp_path, "second", "second-secret", mtime=2_000)
+    (tmp_path / "signing_kid").write_text("first\n")
+
+    loader = tokens.KeyRingLoader(algorithm="HS256", keys_dir=str(tmp_path), reload_seconds=0)
+    assert loader.ring().signing_key.kid == "first"
+    assert sorted(loader.ring().kids()) == ["first", "second"]
+
+    # naming a key that isn't there keeps the keys that were loaded
+    (tmp_path / "signing_kid").write_text("missing")
+    assert loader.ring().signing_key.kid == "first"
+
+
+@pytest.mark.parametrize("backend_name", ["jose", "pyjwt"])
+def test_backends_share_tokens_and_errors(backend_name: str) -> None:
+    """Tests that every backend can read the tokens of the others and raises the jose errors"""
+
+    if backend_name == "pyjwt":
+        pytest.importorskip("jwt")
+
+    backend = tokens.create_backend(backend_name)
+    other_backend = tokens.create_backend("jose")
+
+    key_secret = "a-secret-that-is-long-enough-for-hs256"
+    key = tokens.load_key("HS256", key_secret, backend=backend)
+    other_key = tokens.load_key("HS256", key_secret, backend=other_backend)
+
+    # === the same secret gets the same key id and the tokens are interchangeable ===
+    assert key.kid == other_key.kid
+
+    expires = datetime.utcnow() + timedelta(minutes=5)
+    token = key.encode({"sub": "joe@x.com", "exp": expires})
+    assert other_key.decode(token)["sub"] == "joe@x.com"
+    assert backend.get_unverified_header(token)["kid"] == key.kid
+    # ===
+
+    # === errors are the python-jose ones ===
+    expired = key.encode({"sub": "joe@x.com", "exp": datetime.utcnow() - timedelta(minutes=5)})
+
+    with pytest.raises(ExpiredSignatureError):
+        key.decode(expired)
+
+    with pytest.raises(JWTError):
+        key.decode(token[:-4] + "AAAA")
+
+    with pytest.raises(JWTError):
+        backend.get_unverified_header("not-a-token")
+    # ===
+
+
+def test_key_ids_are_rfc_7638_thumbprints() -> None:
+    """Tests that the default key id is the thumbprint RFC 7638 gives for its example key"""
+
+    assert tokens.keys.thumbprint(RFC_7638_KEY) == RFC_7638_THUMBPRINT
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "ES256"])
+@pytest.mark.parametrize("backend_name", ["jose", "pyjwt"])
+def test_asymmetric_keys_sign_and_publish_their_public_key(
+    backend_name: str, algorithm: str
+) -> None:
+    """Tests that tokens signed with a private key verify with the key and with its published JWK,
+    which PyJWT can load, and that the key id is the thumbprint of that JWK"""
+
+    pyjwt = pytest.importorskip("jwt")
+    backend = tokens.create_backend(backend_name)
+    key = tokens.load_key(algorithm, private_key_pem(algorithm), backend=backend)
+
+    expires = datetime.utcnow() + timedelta(minutes=5)
+    token = key.encode({"sub": "joe@x.com", "exp": expires})
+    assert key.decode(token)["sub"] == "joe@x.com"
+
+    # === the published key verifies the token and names it ===
+    public_jwk = key.public_jwk
+    assert (public_jwk["alg"], public_jwk["kid"], public_jwk["use"]) == (algorithm, key.kid, "sig")
+    assert "d" not in public_jwk
+    assert key.kid == tokens.keys.thumbprint(public_jwk)
+
+    published = pyjwt.PyJWK(public_jwk)
+    assert pyjwt.decode(token, published.key, algorithms=[algorithm])["sub"] == "joe@x.com"
+    assert pyjwt.get_unverified_header(token)["kid"] == key.kid
+    # ===
+
+
+def use_key_ring(
+    monkeypatch: pytest.MonkeyPatch, keys_dir: pathlib.Path, algorithm: str
+) -> tokens.KeyRingLoader:
+    """Makes the application use the keys in the directory"""
+
+    loader = tokens.KeyRingLoader(algorithm=algorithm, keys_dir=str(keys_dir), reload_seconds=3600)
+    monkeypatch.setattr(tokens.ring, "_key_ring_loader", loader)
+    monkeypatch.setattr(jwks, "_serialized_jwks", {})
+
+    return loader
+
+
+@pytest.mark.asyncio
+async def test_jwks_publishes_the_public_keys_with_caching_headers(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that the JWKS endpoint serves the public keys, with an ETag that turns a request for
+    the same key set into a 304, and lets clients cache it for JWKS_MAX_AGE_SECONDS"""
+
+    (tmp_path / "first.pem").write_text(private_key_pem("RS256"))
+    loader = use_key_ring(monkeypatch, tmp_path, "RS256")
+
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        response = await ac.get("/.well-known/jwks.json")
+
+        etag = response.headers["etag"]
+        not_modified = await ac.get("/.well-known/jwks.json", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json() == {"keys": [loader.ring().signing_key.public_jwk]}
+    assert response.headers["cache-control"] == f"public, max-age={env_vars.JWKS_MAX_AGE_SECONDS}"
+
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_jwks_never_publishes_shared_secrets(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that the key set of an application signing with a shared secret is empty"""
+
+    write_key(tmp_path, "first", "first-secret", mtime=1_000)
+    use_key_ring(monkeypatch, tmp_path, "HS256")
+
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        response = await ac.get("/.well-known/jwks.json")
+
+    assert response.status_code == 200
+    assert response.json() == {"keys": []}
+    assert "first-secret" not in response.text
@@ -0,0 +1,146 @@
+# standard imports
+import datetime
+from typing import Any, Iterator
+
+# third party imports
+import beanie
+import fastapi
+from httpx import AsyncClient
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import monitoring
+
+# user imports
+import models
+import queries
+import tracing
+from tracing import tracing as tracing_module
+
+trace = pytest.importorskip("opentelemetry.trace")
+export = pytest.importorskip("opentelemetry.sdk.trace.export")
+in_memory_span_exporter = pytest.importorskip(
+    "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+)
+
+# a trace started and sampled by the caller of a request
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+PARENT_SPAN_ID = "b7ad6b7169203331"
+
+
+def use_tracer(monkeypatch: pytest.MonkeyPatch, sample_ratio: float) -> Any:
+    """Enables tracing with the provider start_tracing creates, keeping the spans in memory"""
+
+    exporter = in_memory_span_exporter.InMemorySpanExporter()
+    provider = tracing_module.create_provider(sample_ratio, "greymint-auth-test")
+    provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+
+    monkeypatch.setattr(tracing_module, "_tracer", provider.get_tracer("greymint-auth"))
+    monkeypatch.setattr(tracing_module, "_tracer_loaded", True)
+
+    return exporter
+
+
+@pytest.fixture
+def traced_app() -> Iterator[fastapi.FastAPI]:
+    """Returns an application that looks a user up, with tracing added"""
+
+    app = fastapi.FastAPI()
+
+    @app.get("/users/{email}")
+    async def user_exists(email: str) -> dict:
+        return {"exists": await queries.user_exists_with_email(email)}
+
+    tracing.add_tracing(app)
+
+    yield app
+
+
+@pytest_asyncio.fixture
+async def init_user() -> None:
+    """Initializes the users on an in-memory stand-in for MongoDB"""
+
+    database = AsyncMongoMockClient().greymintauth
+    await beanie.init_beanie(database=database, document_models=[models.User])
+
+
+@pytest.mark.asyncio
+async def test_requests_are_traced_with_their_queries(
+    traced_app: fastapi.FastAPI, init_user: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that a request opens a server span named after the template of its route, with the
+    spans of its queries as children"""
+
+    exporter = use_tracer(monkeypatch, sample_ratio=1)
+
+    async with AsyncClient(app=traced_app, base_url="http://test") as ac:
+        response = await ac.get("/users/joe@x.com")
+
+    assert response.json() == {"exists": False}
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert sorted(spans) == ["GET /users/{email}", "queries.user_exists_with_email"]
+
+    request_span = spans["GET /users/{email}"]
+    assert request_span.kind == trace.SpanKind.SERVER
+    assert request_span.parent is None
+    assert request_span.attributes["http.route"] == "/users/{email}"
+    assert request_span.attributes["http.target"] == "/users/joe@x.com"
+    assert request_span.attributes["http.status_code"] == 200
+
+    query_span = spans["queries.user_exists_with_email"]
+    assert query_span.context.trace_id == request_span.context.trace_id
+    assert query_span.parent.span_id == request_span.context.span_id
+
+
+@pytest.mark.asyncio
+async def test_sampling_follows_the_caller(
+    traced_app: fastapi.FastAPI, init_user: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests that with nothing sampled locally, a request is only traced when the caller sent a
+    traceparent that sampled it, and that the trace of the caller is continued"""
+
+    exporter = use_tracer(monkeypatch, sample_ratio=0)
+
+    async with AsyncClient(app=traced_app, base_url="http://test") as ac:
+        await ac.get("/users/joe@x.com")
+        assert exporter.get_finished_spans() == ()
+
+        not_sampled = {"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-00"}
+        await ac.get("/users/joe@x.com", headers=not_sampled)
+        assert exporter.get_finished_spans() == ()
+
+        sampled = {"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"}
+        await ac.get("/users/joe@x.com", headers=sampled)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert sorted(spans) == ["GET /users/{email}", "queries.user_exists_with_email"]
+
+    request_span = spans["GET /users/{email}"]
+    assert trace.format_trace_id(request_span.context.trace_id) == TRACE_ID
+    assert trace.format_span_id(request_span.parent.span_id) == PARENT_SPAN_ID
+    assert request_span.parent.is_remote
+
+
+def test_mongo_commands_are_traced_under_the_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that the commands the driver reports are spans of the query that sent them"""
+
+    exporter = use_tracer(monkeypatch, sample_ratio=1)
+    (listener,) = tracing.mongo_listeners()
+    connection_id: Any = ("localhost", 27017)
+
+    with tracing.span("queries.get_user_by_email"):
+        command = {"find": "Users", "filter": {"email": "joe@x.com"}}
+        started = monitoring.CommandStartedEvent(command, "greymintauth", 1, connection_id, 1)
+        listener.started(started)
+        listener.succeeded(
+            monitoring.CommandSucceededEvent(
+                datetime.timedelta(milliseconds=1), {"ok": 1}, "find", 1, connection_id, 1
+            )
+        )
+
+    command_span, query_span = exporter.get_finished_spans()
+    assert command_span.name == "mongo.find"
+    assert command_span.kind == trace.SpanKind.CLIENT
+    assert command_span.attributes["db.mongodb.collection"] == "Users"
+    assert command_span.parent.span_id == query_span.context.span_id
@@ -0,0 +1,20 @@
+from tokens.backends import (
+    JWTBackend,
+    JoseBackend,
+    PyJWTBackend,
+    create_backend,
+    get_backend,
+)
+from tokens.keys import (
+    SigningKey,
+    load_key,
+    load_secret_key,
+)
+from tokens.ring import (
+    KeyRing,
+    KeyRingLoader,
+    get_key_ring_loader,
+    get_signing_key,
+    get_verification_key,
+    get_jwks,
+)
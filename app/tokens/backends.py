@@ -0,0 +1,165 @@
+# std
+import threading
+from typing import Any, Optional, Protocol
+
+# 3p
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+# user
+import env_vars
+
+
+class JWTBackend(Protocol):
+    """The library that parses keys and encodes and decodes tokens.
+
+    Keys are prepared once with `load_private_key` and `public_key`, and the prepared objects are
+    what `encode` and `decode` take, so no key parsing happens per token. Every backend raises the
+    python-jose exceptions so that callers handle errors the same way whichever one is in use."""
+
+    name: str
+    algorithms: set[str]
+
+    def load_private_key(self, algorithm: str, material: str) -> Any:
+        """Parses a shared secret or a PEM private key"""
+
+    def public_key(self, algorithm: str, private_key: Any) -> Any:
+        """Returns the key that verifies what the private key signs"""
+
+    def to_jwk(self, algorithm: str, key: Any) -> dict[str, Any]:
+        """Returns the key as a JSON Web Key"""
+
+    def encode(
+        self, claims: dict[str, Any], key: Any, algorithm: str, headers: Optional[dict]
+    ) -> str:
+        """Returns the signed token"""
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict[str, Any]:
+        """Returns the claims of the token after checking its signature and expiry"""
+
+    def get_unverified_header(self, token: str) -> dict[str, Any]:
+        """Returns the header of the token without checking its signature"""
+
+
+class JoseBackend:
+    """Backend on top of python-jose, the keys are prepared jose Key objects"""
+
+    name = "jose"
+    algorithms = {"HS256", "HS384", "HS512", "RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+    def load_private_key(self, algorithm: str, material: str) -> Any:
+        return jwk.construct(material, algorithm)
+
+    def public_key(self, algorithm: str, private_key: Any) -> Any:
+        if algorithm.startswith("HS"):
+            return private_key
+
+        return private_key.public_key()
+
+    def to_jwk(self, algorithm: str, key: Any) -> dict[str, Any]:
+        return key.to_dict()
+
+    def encode(
+        self, claims: dict[str, Any], key: Any, algorithm: str, headers: Optional[dict]
+    ) -> str:
+        return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict[str, Any]:
+        return jwt.decode(token, key, algorithms=algorithm)
+
+    def get_unverified_header(self, token: str) -> dict[str, Any]:
+        return jwt.get_unverified_header(token)
+
+
+class PyJWTBackend:
+    """Backend on top of PyJWT, the keys are `cryptography` key objects or the secret as bytes.
+
+    PyJWT takes those objects as they are, so signing and verifying skip the key construction and
+    algorithm lookups python-jose redoes for every token. It also supports EdDSA."""
+
+    name = "pyjwt"
+    algorithms = JoseBackend.algorithms | {"EdDSA"}
+
+    def __init__(self) -> None:
+        try:
+            import jwt as pyjwt
+            from jwt.algorithms import get_default_algorithms
+
+        except ImportError:
+            raise ValueError("The pyjwt JWT backend needs PyJWT, install the pyjwt extra")
+
+        self._pyjwt = pyjwt
+        self._algorithms = get_default_algorithms()
+
+    def load_private_key(self, algorithm: str, material: str) -> Any:
+        return self._algorithms[algorithm].prepare_key(material)
+
+    def public_key(self, algorithm: str, private_key: Any) -> Any:
+        if algorithm.startswith("HS"):
+            return private_key
+
+        return private_key.public_key()
+
+    def to_jwk(self, algorithm: str, key: Any) -> dict[str, Any]:
+        return self._algorithms[algorithm].to_jwk(key, as_dict=True)
+
+    def encode(
+        self, claims: dict[str, Any], key: Any, algorithm: str, headers: Optional[dict]
+    ) -> str:
+        try:
+            return self._pyjwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+        except self._pyjwt.PyJWTError as err:
+            raise JWTError(str(err))
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict[str, Any]:
+        pyjwt = self._pyjwt
+
+        try:
+            return pyjwt.decode(token, key, algorithms=[algorithm])
+
+        except pyjwt.ExpiredSignatureError as err:
+            raise ExpiredSignatureError(str(err))
+
+        except (pyjwt.ImmatureSignatureError, pyjwt.MissingRequiredClaimError) as err:
+            raise JWTClaimsError(str(err))
+
+        except pyjwt.PyJWTError as err:
+            raise JWTError(str(err))
+
+    def get_unverified_header(self, token: str) -> dict[str, Any]:
+        try:
+            return self._pyjwt.get_unverified_header(token)
+
+        except self._pyjwt.PyJWTError as err:
+            raise JWTError(str(err))
+
+
+def create_backend(name: str) -> JWTBackend:
+    """Creates the backend with the given name"""
+
+    if name == "jose":
+        return JoseBackend()
+
+    if name == "pyjwt":
+        return PyJWTBackend()
+
+    raise ValueError(f"Unknown JWT backend: {name}")
+
+
+# the backend used by the application, it is created on first use
+_backend: Optional[JWTBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> JWTBackend:
+    """Returns the backend chosen by the env vars"""
+
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(env_vars.JWT_BACKEND)
+
+    return _backend
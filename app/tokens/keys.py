@@ -0,0 +1,139 @@
+# std
+import base64
+import dataclasses
+import functools
+import hashlib
+import json
+from typing import Any, Optional
+
+# user
+import env_vars
+import metrics
+from tokens.backends import JWTBackend, get_backend
+
+# algorithms that sign with a shared secret, their keys are never published
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+# algorithms that sign with a private key and are verified with the public key
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"}
+
+# members of each key type that make up its RFC 7638 thumbprint
+THUMBPRINT_MEMBERS = {
+    "oct": ("k", "kty"),
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class SigningKey:
+    """A key that has been parsed once and is ready to sign and verify tokens"""
+
+    kid: str
+    algorithm: str
+    # the keys as prepared by the backend, they only work with the backend that prepared them
+    backend: JWTBackend
+    private_key: Any
+    public_key: Any
+    # the key as published in the JWKS, None for shared secrets
+    public_jwk: Optional[dict[str, Any]]
+
+    @metrics.timed("jwt", "encode")
+    def encode(self, claims: dict[str, Any]) -> str:
+        """Returns a token with the claims signed by this key, with the key id in its header"""
+
+        return self.backend.encode(claims, self.private_key, self.algorithm, {"kid": self.kid})
+
+    @metrics.timed("jwt", "decode")
+    def decode(self, token: str) -> dict[str, Any]:
+        """Returns the claims of a token signed by this key"""
+
+        return self.backend.decode(token, self.public_key, self.algorithm)
+
+
+def thumbprint(key_dict: dict[str, Any]) -> str:
+    """Returns the RFC 7638 thumbprint of a JWK, used as the key id when none is configured"""
+
+    members = {name: key_dict[name] for name in THUMBPRINT_MEMBERS[key_dict["kty"]]}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    digest = hashlib.sha256(canonical).digest()
+
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def load_key(
+    algorithm: str,
+    material: str,
+    kid: Optional[str] = None,
+    backend: Optional[JWTBackend] = None,
+) -> SigningKey:
+    """Parses a shared secret or a PEM private key into a SigningKey for the backend in use"""
+
+    backend = backend or get_backend()
+
+    if algorithm not in HMAC_ALGORITHMS | ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported signing algorithm: {algorithm}")
+
+    if algorithm not in backend.algorithms:
+        raise ValueError(f"{algorithm} is not supported by the {backend.name} JWT backend")
+
+    private_key = backend.load_private_key(algorithm, material)
+    public_key = backend.public_key(algorithm, private_key)
+
+    if algorithm in HMAC_ALGORITHMS:
+        return SigningKey(
+            kid=kid or thumbprint(backend.to_jwk(algorithm, private_key)),
+            algorithm=algorithm,
+            backend=backend,
+            private_key=private_key,
+            public_key=public_key,
+            public_jwk=None,
+        )
+
+    public_jwk = backend.to_jwk(algorithm, public_key)
+    kid = kid or thumbprint(public_jwk)
+
+    return SigningKey(
+        kid=kid,
+        algorithm=algorithm,
+        backend=backend,
+        private_key=private_key,
+        public_key=public_key,
+        public_jwk={**public_jwk, "alg": algorithm, "kid": kid, "use": "sig"},
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def load_secret_key(algorithm: str, secret: str) -> SigningKey:
+    """Returns the key for a secret passed in by the caller, parsed once per secret"""
+
+    return load_key(algorithm, secret)
+
+
+def load_key_from_env() -> SigningKey:
+    """Loads the signing key described by the env vars, used when there is no key directory"""
+
+    algorithm = env_vars.ALGORITHM
+
+    if algorithm in HMAC_ALGORITHMS:
+        return load_key(algorithm, env_vars.SECRET_KEY, env_vars.JWT_KEY_ID or None)
+
+    if not env_vars.JWT_PRIVATE_KEY_PATH:
+        raise ValueError(f"JWT_PRIVATE_KEY_PATH has to be set to sign tokens with {algorithm}")
+
+    with open(env_vars.JWT_PRIVATE_KEY_PATH) as file:
+        material = file.read()
+
+    return load_key(algorithm, material, env_vars.JWT_KEY_ID or None)
+
+
+def load_previous_keys_from_env() -> list[SigningKey]:
+    """Loads the retired shared secrets that tokens signed before a rotation are verified with"""
+
+    if env_vars.ALGORITHM not in HMAC_ALGORITHMS:
+        return []
+
+    secrets = [secret.strip() for secret in env_vars.JWT_PREVIOUS_SECRET_KEYS.split(",")]
+
+    return [load_key(env_vars.ALGORITHM, secret) for secret in secrets if secret]
@@ -0,0 +1,285 @@
+# std
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+# user
+import env_vars
+from tokens.keys import (
+    HMAC_ALGORITHMS,
+    SigningKey,
+    load_key,
+    load_key_from_env,
+    load_previous_keys_from_env,
+)
+
+logger = logging.getLogger(__name__)
+
+# name of the file in the key directory that holds the id of the key new tokens are signed with
+SIGNING_KID_FILE = "signing_kid"
+
+# extension of the key files in the key directory, shared secrets or PEM private keys
+SECRET_KEY_EXTENSION = ".key"
+PRIVATE_KEY_EXTENSION = ".pem"
+
+# least time between two reloads forced by a token with an unknown key id, so that a flood of
+# tokens with made up key ids can't turn into a flood of directory scans
+MIN_FORCED_RELOAD_SECONDS = 1.0
+
+
+class KeyRing:
+    """The keys tokens are verified with, indexed by key id, and the key tokens are signed with"""
+
+    def __init__(self, signing_key: SigningKey, verification_keys: list[SigningKey]) -> None:
+        self.signing_key = signing_key
+        self._keys = {key.kid: key for key in verification_keys}
+        self._keys[signing_key.kid] = signing_key
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        """Returns the key with the given id, or None if it isn't in the ring"""
+
+        return self._keys.get(kid)
+
+    def kids(self) -> list[str]:
+        """Returns the ids of every key in the ring"""
+
+        return list(self._keys)
+
+    def jwks(self) -> dict[str, Any]:
+        """Returns the JSON Web Key Set with the public keys of the ring, secrets are left out"""
+
+        keys = [key.public_jwk for key in self._keys.values() if key.public_jwk is not None]
+
+        return {"keys": keys}
+
+
+def _key_files(keys_dir: str) -> list[os.DirEntry]:
+    """Returns the key files in the directory"""
+
+    with os.scandir(keys_dir) as entries:
+        return [
+            entry
+            for entry in entries
+            if entry.is_file()
+            and entry.name.endswith((SECRET_KEY_EXTENSION, PRIVATE_KEY_EXTENSION))
+        ]
+
+
+def directory_fingerprint(keys_dir: str) -> tuple[tuple[str, int, int], ...]:
+    """Returns the name, modification time and size of every file in the directory, this changes
+    whenever a key is added, removed or replaced"""
+
+    with os.scandir(keys_dir) as entries:
+        return tuple(
+            sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries
+                if entry.is_file()
+            )
+        )
+
+
+def load_key_ring_from_dir(keys_dir: str, algorithm: str) -> KeyRing:
+    """Loads every key in the directory, each file is named after the id of the key it holds.
+
+    New tokens are signed with the key named in the `signing_kid` file, or with the most recently
+    added key when there is no such file."""
+
+    extension = SECRET_KEY_EXTENSION if algorithm in HMAC_ALGORITHMS else PRIVATE_KEY_EXTENSION
+    files = sorted(
+        (entry for entry in _key_files(keys_dir) if entry.name.endswith(extension)),
+        key=lambda entry: entry.stat().st_mtime_ns,
+    )
+
+    if not files:
+        raise ValueError(f"No {extension} keys found in {keys_dir}")
+
+    keys = []
+
+    for entry in files:
+        with open(entry.path) as file:
+            material = file.read()
+
+        if extension == SECRET_KEY_EXTENSION:
+            material = material.strip()
+
+        keys.append(load_key(algorithm, material, entry.name[: -len(extension)]))
+
+    # pick the key to sign with ===
+    signing_kid_path = os.path.join(keys_dir, SIGNING_KID_FILE)
+
+    if os.path.isfile(signing_kid_path):
+        with open(signing_kid_path) as file:
+            signing_kid = file.read().strip()
+
+    else:
+        signing_kid = keys[-1].kid
+
+    signing_key = next((key for key in keys if key.kid == signing_kid), None)
+
+    if signing_key is None:
+        raise ValueError(f"The signing key {signing_kid} was not found in {keys_dir}")
+    # ===
+
+    return KeyRing(signing_key, keys)
+
+
+class KeyRingLoader:
+    """Holds the key ring and keeps it in sync with the key directory.
+
+    The keys are parsed once per change of the directory, not per token. The directory is checked
+    for changes at most every `reload_seconds`, and straight away when a token names a key id the
+    ring doesn't know, so a key added on one replica is picked up without restarting the others.
+
+    Only the first load reads the directory on the calling thread. On an event loop the later ones
+    run on a worker thread, the periodic checks in the background while the current ring is used."""
+
+    def __init__(self, algorithm: str, keys_dir: str, reload_seconds: float) -> None:
+        self.algorithm = algorithm
+        self.keys_dir = keys_dir
+        self.reload_seconds = reload_seconds
+
+        self._lock = threading.Lock()
+        self._ring: Optional[KeyRing] = None
+        self._fingerprint: tuple = ()
+        self._checked_at = 0.0
+        self._forced_at = 0.0
+        self._reloading: Optional[asyncio.Task] = None
+
+    def ring(self) -> KeyRing:
+        """Returns the current key ring, starting a check of the directory if it's time to"""
+
+        if self._ring is None:
+            self._reload()
+
+        elif self.keys_dir and time.monotonic() - self._checked_at >= self.reload_seconds:
+            self._reload_in_background()
+
+        return self._ring
+
+    async def find(self, kid: str) -> Optional[SigningKey]:
+        """Returns the key with the given id, checking the directory for new keys if it's unknown"""
+
+        key = self.ring().get(kid)
+
+        if key is not None or not self.keys_dir:
+            return key
+
+        # the tokens naming the key while the directory is read wait for that same reload ===
+        reloading = self._reloading
+
+        if reloading is None or reloading.done():
+            if time.monotonic() - self._forced_at < MIN_FORCED_RELOAD_SECONDS:
+                return None
+
+            self._forced_at = time.monotonic()
+            reloading = self._reload_in_background()
+
+        if reloading is not None:
+            await asyncio.shield(reloading)
+        # ===
+
+        return self._ring.get(kid)
+
+    def _reload_in_background(self) -> Optional[asyncio.Task]:
+        """Starts a reload on a worker thread unless one is running, and returns it. Without an
+        event loop the reload is done right away"""
+
+        if self._reloading is not None and not self._reloading.done():
+            return self._reloading
+
+        try:
+            loop = asyncio.get_running_loop()
+
+        except RuntimeError:
+            self._reload()
+            return None
+
+        # so that the requests made during the reload don't start another one
+        self._checked_at = time.monotonic()
+        self._reloading = loop.create_task(asyncio.to_thread(self._reload))
+
+        return self._reloading
+
+    def _reload(self) -> None:
+        with self._lock:
+            self._checked_at = time.monotonic()
+
+            # without a key directory the keys come from the env vars and never change ===
+            if not self.keys_dir:
+                if self._ring is None:
+                    self._ring = KeyRing(load_key_from_env(), load_previous_keys_from_env())
+
+                return
+            # ===
+
+            # the first load has to succeed, later ones keep the old ring if the keys are bad ===
+            try:
+                fingerprint = directory_fingerprint(self.keys_dir)
+
+                if self._ring is not None and fingerprint == self._fingerprint:
+                    return
+
+                self._ring = load_key_ring_from_dir(self.keys_dir, self.algorithm)
+
+            except (OSError, ValueError) as err:
+                if self._ring is None:
+                    raise
+
+                logger.warning(
+                    "Keeping the current signing keys, reloading %s failed: %s", self.keys_dir, err
+                )
+                return
+            # ===
+
+            self._fingerprint = fingerprint
+            logger.info(
+                "Loaded keys %s, signing with %s", self._ring.kids(), self._ring.signing_key.kid
+            )
+
+
+# the key ring of the application, it is created and loaded on first use
+_key_ring_loader: Optional[KeyRingLoader] = None
+_key_ring_loader_lock = threading.Lock()
+
+
+def get_key_ring_loader() -> KeyRingLoader:
+    """Returns the loader of the key ring described by the env vars"""
+
+    global _key_ring_loader
+
+    if _key_ring_loader is None:
+        with _key_ring_loader_lock:
+            if _key_ring_loader is None:
+                _key_ring_loader = KeyRingLoader(
+                    algorithm=env_vars.ALGORITHM,
+                    keys_dir=env_vars.JWT_KEYS_DIR,
+                    reload_seconds=env_vars.JWT_KEYS_RELOAD_SECONDS,
+                )
+
+    return _key_ring_loader
+
+
+def get_signing_key() -> SigningKey:
+    """Returns the key new tokens are signed with"""
+
+    return get_key_ring_loader().ring().signing_key
+
+
+async def get_verification_key(kid: Optional[str]) -> Optional[SigningKey]:
+    """Returns the key a token with the given key id is verified with, or None if it isn't known.
+    Tokens issued before key ids were stamped in the header are verified with the signing key."""
+
+    if kid is None:
+        return get_signing_key()
+
+    return await get_key_ring_loader().find(kid)
+
+
+def get_jwks() -> dict[str, Any]:
+    """Returns the JSON Web Key Set with the public keys that can verify our tokens"""
+
+    return get_key_ring_loader().ring().jwks()
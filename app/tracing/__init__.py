@@ -0,0 +1,10 @@
+from tracing.tracing import (
+    traced,
+    span,
+    TracingMiddleware,
+    MongoCommandTracer,
+    add_tracing,
+    mongo_listeners,
+    start_tracing,
+    stop_tracing,
+)
@@ -0,0 +1,314 @@
+# std
+import contextlib
+import functools
+import inspect
+import os
+import threading
+from typing import Any, Callable, Optional, TypeVar
+
+# 3p
+import fastapi
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# user
+import env_vars
+import middleware
+
+try:
+    from opentelemetry import propagate, trace
+
+except ImportError:
+    trace = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# spans are created through the global tracer, it does nothing until start_tracing sets up the
+# provider, which has to happen in each worker since the exporting thread doesn't survive a fork.
+# It is created on first use when tracing is enabled
+_tracer: Optional[Any] = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+# the provider of this process, set by start_tracing
+_provider: Optional[Any] = None
+_provider_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Any]:
+    """Returns the tracer, or None when tracing is disabled. The settings are read on first use
+    rather than on import"""
+
+    global _tracer, _tracer_loaded
+
+    if not _tracer_loaded:
+        with _tracer_lock:
+            if not _tracer_loaded:
+                if env_vars.TRACING_ENABLED and trace is None:
+                    raise ValueError("Tracing needs opentelemetry-sdk, install the tracing extra")
+
+                _tracer = trace.get_tracer("greymint-auth") if env_vars.TRACING_ENABLED else None
+                _tracer_loaded = True
+
+    return _tracer
+
+
+def create_exporter(name: str, file_path: str) -> Any:
+    """Creates the exporter with the given name: `console`, `file` or `otlp`"""
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if name == "console":
+        return ConsoleSpanExporter()
+
+    if name == "file":
+        # one span per line, the file stays open for as long as the exporter
+        out = open(file_path, "a")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        except ImportError:
+            raise ValueError("The otlp exporter needs opentelemetry-exporter-otlp-proto-http")
+
+        # the endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* env vars
+        return OTLPSpanExporter()
+
+    raise ValueError(f"Unknown tracing exporter: {name}")
+
+
+def create_provider(sample_ratio: float, service_name: str) -> Any:
+    """Creates a tracer provider that samples the given ratio of the traces, unless the caller of
+    the request decided already, then its decision is kept"""
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    return TracerProvider(
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+        resource=Resource.create({"service.name": service_name, "process.pid": os.getpid()}),
+    )
+
+
+def start_tracing() -> None:
+    """Sets up the tracer provider of this process: sampled by TRACING_SAMPLE_RATIO, unless the
+    caller of the request sampled it already, and exported in batches from a background thread"""
+
+    global _provider
+
+    if get_tracer() is None:
+        return
+
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    with _provider_lock:
+        if _provider is not None:
+            return
+
+        _provider = create_provider(env_vars.TRACING_SAMPLE_RATIO, env_vars.TRACING_SERVICE_NAME)
+        exporter = create_exporter(env_vars.TRACING_EXPORTER, env_vars.TRACING_FILE_PATH)
+        _provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(_provider)
+
+
+def stop_tracing() -> None:
+    """Exports the spans still waiting in the batch"""
+
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def traced(layer: str, name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorator that wraps every call of the function in a span called `<layer>.<name>`, the name
+    defaults to the name of the function. When tracing is disabled the wrapper only calls the
+    function"""
+
+    def decorator(func: F) -> F:
+        span_name = f"{layer}.{name or func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                tracer = get_tracer()
+
+                if tracer is None:
+                    return await func(*args, **kwargs)
+
+                with tracer.start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            tracer = get_tracer()
+
+            if tracer is None:
+                return func(*args, **kwargs)
+
+            with tracer.start_as_current_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+_disabled_span = contextlib.nullcontext()
+
+
+def span(name: str) -> contextlib.AbstractContextManager:
+    """Context manager that wraps its block in a span"""
+
+    tracer = get_tracer()
+
+    if tracer is None:
+        return _disabled_span
+
+    return tracer.start_as_current_span(name)
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens the span of each request, the parent of every other span.
+
+    A trace started by the caller, sent in the traceparent header, is continued. The span is
+    named after the route's path template once the router has matched it"""
+
+    def __init__(self, app: ASGIApp, router: fastapi.routing.APIRouter) -> None:
+        self.app = app
+        self.router = router
+        self._route_paths: dict[Any, str] = {}
+
+        tracer = get_tracer()
+
+        if tracer is None:
+            raise ValueError("The tracing middleware needs TRACING_ENABLED")
+
+        self.tracer = tracer
+
+    def route_path(self, endpoint: Any) -> str:
+        if endpoint is None:
+            return "unmatched"
+
+        if endpoint not in self._route_paths:
+            for route in self.router.routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    self._route_paths[endpoint] = getattr(route, "path", "unmatched")
+                    break
+
+            else:
+                return "unmatched"
+
+        return self._route_paths[endpoint]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        # continue the trace of the caller, if it sent one
+        headers = {}
+
+        for key, value in scope["headers"]:
+            headers[key.decode("latin-1")] = value.decode("latin-1")
+
+        parent = propagate.extract(headers)
+
+        with self.tracer.start_as_current_span(
+            method,
+            context=parent,
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.method": method, "http.target": scope["path"]},
+        ) as request_span:
+
+            async def send_and_record_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+
+                    if message["status"] >= 500:
+                        request_span.set_status(trace.Status(trace.StatusCode.ERROR))
+
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_and_record_status)
+
+            finally:
+                route = self.route_path(scope.get("endpoint"))
+                request_span.update_name(f"{method} {route}")
+                request_span.set_attribute("http.route", route)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Opens a span for every command sent to MongoDB. Motor runs the commands on its threads with
+    the context of the caller, so the spans nest under the query that sent them"""
+
+    def __init__(self, tracer: Any) -> None:
+        self.tracer = tracer
+        self._spans: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        command_span = self.tracer.start_span(
+            f"mongo.{event.command_name}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.mongodb.collection": collection if isinstance(collection, str) else "",
+                "net.peer.name": str(event.connection_id[0]),
+                "net.peer.port": event.connection_id[1],
+            },
+        )
+
+        with self._lock:
+            self._spans[(event.request_id, event.connection_id)] = command_span
+
+    def _end(self, event: Any, error: Optional[str] = None) -> None:
+        with self._lock:
+            command_span = self._spans.pop((event.request_id, event.connection_id), None)
+
+        if command_span is None:
+            return
+
+        if error is not None:
+            command_span.set_status(trace.Status(trace.StatusCode.ERROR, error))
+
+        command_span.end()
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._end(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._end(event, str(event.failure.get("errmsg", "")))
+
+
+def mongo_listeners() -> list[monitoring.CommandListener]:
+    """Returns the listeners the Motor client needs for tracing, none when it's disabled"""
+
+    tracer = get_tracer()
+
+    if tracer is None:
+        return []
+
+    return [MongoCommandTracer(tracer)]
+
+
+def add_tracing(app: fastapi.FastAPI) -> None:
+    """Opens a span for every request, when tracing is enabled. That is decided once the server
+    starts"""
+
+    def build(inner: ASGIApp) -> ASGIApp:
+        if get_tracer() is None:
+            return inner
+
+        return TracingMiddleware(inner, router=app.router)
+
+    app.add_middleware(middleware.DeferredMiddleware, build=build)
@@ -2,13 +2,33 @@ from utils.utils import (
     oauth2_scheme,
     hash_password,
     validate_password,
+    validate_and_rehash_password,
     validate_username,
+    create_user_claims,
     create_token,
+    get_claims_from_jwt,
     get_data_from_jwt,
 )
 
+from utils.current_user import (
+    get_token_claims,
+    get_current_user_details,
+    invalidate_user,
+)
+
+from utils.passwords import (
+    configure_password_hashing,
+    pin_password_hashing,
+    describe_context_settings,
+    get_password_pool,
+    password_pool_stats,
+    shutdown_password_pool,
+)
+
 from utils.res_req_models import (
     UserDetails,
+    user_details_from,
+    user_details_from_claims,
     UserCreateStepTwo,
     UserUpdate,
     UserUpdatePassword,
@@ -16,4 +36,5 @@ from utils.res_req_models import (
     UserResetPasswordRequest,
     Token,
     TokenData,
+    model_response,
 )
@@ -0,0 +1,81 @@
+# standard imports
+import collections
+import time
+from typing import Any, Callable, Hashable, Optional, Union
+
+
+class TTLCache:
+    """A size bounded LRU cache where every entry also expires at its own time.
+
+    Expiry times are unix timestamps so they can come straight from the `exp` claim of a token. The
+    cache is only used from the event loop thread so it doesn't lock."""
+
+    def __init__(self, max_size: Union[int, Callable[[], int]]) -> None:
+        # the size can be a function called on first use, so that a cache sized by the settings can
+        # be created before they are loaded
+        self._max_size = max_size
+        self._entries: collections.OrderedDict[Hashable, tuple[Any, float]] = (
+            collections.OrderedDict()
+        )
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_size(self) -> int:
+        if callable(self._max_size):
+            self._max_size = self._max_size()
+
+        return self._max_size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value for the key, or None if it is missing or has expired"""
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self._misses += 1
+            return None
+
+        value, expires_at = entry
+
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        """Stores the value until the expiry time, evicting the least recently used entry if full"""
+
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Removes the key from the cache if it is there"""
+
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every entry from the cache"""
+
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the size of the cache and how often it was hit"""
+
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
@@ -0,0 +1,34 @@
+# standard imports
+import argparse
+
+# user imports
+from utils import passwords
+
+
+def main() -> None:
+    """Measures the password hash time on this machine and prints the cost that hits the target"""
+
+    parser = argparse.ArgumentParser(
+        description="Picks the password hashing cost that takes the target time on this machine"
+    )
+    parser.add_argument("--target-ms", type=float, required=True, help="target hash time in ms")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--argon2-memory-cost", type=int, default=19456, help="memory in KiB")
+    parser.add_argument("--argon2-parallelism", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        rounds = passwords.calibrate_bcrypt_rounds(args.target_ms)
+        print(f"BCRYPT_ROUNDS={rounds}")
+
+    else:
+        time_cost = passwords.calibrate_argon2_time_cost(
+            args.target_ms, args.argon2_memory_cost, args.argon2_parallelism
+        )
+        print(f"ARGON2_MEMORY_COST={args.argon2_memory_cost}")
+        print(f"ARGON2_TIME_COST={time_cost}")
+        print(f"ARGON2_PARALLELISM={args.argon2_parallelism}")
+
+
+if __name__ == "__main__":
+    main()
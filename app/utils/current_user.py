@@ -0,0 +1,79 @@
+# standard imports
+import time
+from typing import Any
+
+# third party imports
+import fastapi
+import jose
+
+# user imports
+import env_vars
+import exceptions
+import models
+import queries
+from utils import utils
+from utils.cache import TTLCache
+
+# verified token -> claims, every entry expires with its token
+token_cache = TTLCache(max_size=lambda: env_vars.TOKEN_CACHE_SIZE)
+
+# email -> user details, these are only kept for a short time since other replicas can change the
+# user. The cache is per process: a change made through one gunicorn worker only drops the entry
+# of that worker, the others can serve the old details for up to USER_CACHE_TTL_SECONDS
+details_cache = TTLCache(max_size=lambda: env_vars.USER_CACHE_SIZE)
+
+
+async def get_token_claims(token: str = fastapi.Depends(utils.oauth2_scheme)) -> dict[str, Any]:
+    """Dependency that returns the claims of the bearer token, only verifying each token once"""
+
+    claims = token_cache.get(token)
+
+    if claims is not None:
+        return claims
+
+    # verify the token: if it isn't valid, raise exception ===
+    try:
+        claims = await utils.get_claims_from_jwt(token)
+
+    except (jose.JWTError, jose.jwt.ExpiredSignatureError, jose.jwt.JWTClaimsError) as err:
+        raise exceptions.create_http_jwterror(err)
+    # ===
+
+    token_cache.set(token, claims, expires_at=claims.get("exp", 0))
+
+    return claims
+
+
+async def get_current_user_details(
+    claims: dict[str, Any] = fastapi.Depends(get_token_claims),
+) -> models.UserDetailsView | models.UserDetailsRecord:
+    """Dependency that returns the details of the user the bearer token belongs to, reading only
+    the fields of the details instead of the whole user"""
+
+    email = claims.get("sub")
+    details = details_cache.get(email)
+
+    if details is not None:
+        return details
+
+    # get the user details from email: if no user found, raise exception ===
+    details = await queries.get_user_details_by_email(email)
+
+    if details is None:
+        raise exceptions.HTTPUserWasNotFound
+    # ===
+
+    details_cache.set(email, details, expires_at=time.time() + env_vars.USER_CACHE_TTL_SECONDS)
+
+    return details
+
+
+def invalidate_user(*emails: str) -> None:
+    """Drops the cached details of the users, this has to be called whenever a user is changed.
+
+    Only the cache of this process is cleared. The other workers and replicas keep serving the
+    details they cached, a disabled user included, until their entry expires after
+    USER_CACHE_TTL_SECONDS"""
+
+    for email in emails:
+        details_cache.delete(email)
@@ -0,0 +1,393 @@
+# standard imports
+import asyncio
+import concurrent.futures
+import math
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# third party imports
+from passlib.context import CryptContext
+
+# user imports
+import env_vars
+import exceptions
+import metrics
+import tracing
+
+# bcrypt stores its cost as a power of two, these are the limits the format allows
+MIN_BCRYPT_ROUNDS = 4
+MAX_BCRYPT_ROUNDS = 31
+
+
+def build_context_settings(
+    scheme: str,
+    bcrypt_rounds: int,
+    argon2_memory_cost: int,
+    argon2_time_cost: int,
+    argon2_parallelism: int,
+) -> dict[str, Any]:
+    """Returns the CryptContext settings for the given scheme and costs.
+
+    The chosen scheme hashes new passwords and every other scheme is deprecated. The costs are also
+    the minimum accepted, so hashes made with another scheme or a lower cost are reported as needing
+    an update and get upgraded the next time the user logs in."""
+
+    if scheme == "bcrypt":
+        schemes = ["bcrypt", "argon2"]
+
+    elif scheme == "argon2":
+        schemes = ["argon2", "bcrypt"]
+
+    else:
+        raise ValueError(f"Unknown password scheme: {scheme}")
+
+    return {
+        "schemes": schemes,
+        "deprecated": "auto",
+        "bcrypt__default_rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "argon2__type": "ID",
+        "argon2__memory_cost": argon2_memory_cost,
+        "argon2__time_cost": argon2_time_cost,
+        "argon2__min_rounds": argon2_time_cost,
+        "argon2__parallelism": argon2_parallelism,
+    }
+
+
+def describe_context_settings(settings: dict[str, Any]) -> str:
+    """Returns a short description of the scheme and cost new passwords are hashed with"""
+
+    scheme = settings["schemes"][0]
+
+    if scheme == "bcrypt":
+        return f"bcrypt with {settings['bcrypt__default_rounds']} rounds"
+
+    return (
+        f"argon2id with memory_cost={settings['argon2__memory_cost']} "
+        f"time_cost={settings['argon2__time_cost']} parallelism={settings['argon2__parallelism']}"
+    )
+
+
+# settings of the context used for hashing passwords, kept so process workers can rebuild it
+_context_settings = build_context_settings(
+    scheme="bcrypt",
+    bcrypt_rounds=12,
+    argon2_memory_cost=19456,
+    argon2_time_cost=2,
+    argon2_parallelism=1,
+)
+
+# context used for hashing passwords
+pwd_context = CryptContext(**_context_settings)
+
+
+def configure_password_context(settings: dict[str, Any]) -> None:
+    """Replaces the context used for hashing passwords"""
+
+    global _context_settings, pwd_context
+
+    _context_settings = settings
+    pwd_context = CryptContext(**settings)
+
+
+def hash_password_sync(password: str) -> str:
+    """Returns the hashed password, this blocks for the whole cost of the hash"""
+
+    return pwd_context.hash(password)
+
+
+def verify_password_sync(password: str, hashed_password: str) -> bool:
+    """Returns True if the password matches the hash, this blocks for the whole cost of the hash"""
+
+    return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update_password_sync(
+    password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Returns whether the password matches the hash and, when the hash was made with outdated
+    settings, a new hash of the password made with the current ones"""
+
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def _time_hash(settings: dict[str, Any], samples: int = 3) -> float:
+    """Returns the fastest of a few hashes made with the settings, in milliseconds"""
+
+    context = CryptContext(**settings)
+    fastest = math.inf
+
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        fastest = min(fastest, time.perf_counter() - start)
+
+    return fastest * 1000
+
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Returns the bcrypt rounds whose hash time on this machine is the closest to the target"""
+
+    def settings_for(rounds: int) -> dict[str, Any]:
+        return build_context_settings("bcrypt", rounds, 19456, 2, 1)
+
+    # every extra round doubles the cost, so time a cheap hash and extrapolate from it ===
+    base_rounds = 8
+    base_ms = _time_hash(settings_for(base_rounds))
+    rounds = base_rounds + round(math.log2(max(target_ms, 1) / base_ms))
+    rounds = min(max(rounds, MIN_BCRYPT_ROUNDS), MAX_BCRYPT_ROUNDS)
+    # ===
+
+    # the extrapolation can be off by one, check the neighbour on the side of the target ===
+    measured_ms = _time_hash(settings_for(rounds), samples=1)
+    neighbour = rounds + 1 if measured_ms < target_ms else rounds - 1
+
+    if MIN_BCRYPT_ROUNDS <= neighbour <= MAX_BCRYPT_ROUNDS:
+        neighbour_ms = _time_hash(settings_for(neighbour), samples=1)
+
+        if abs(neighbour_ms - target_ms) < abs(measured_ms - target_ms):
+            rounds = neighbour
+    # ===
+
+    return rounds
+
+
+def calibrate_argon2_time_cost(target_ms: float, memory_cost: int, parallelism: int) -> int:
+    """Returns the argon2 time cost whose hash time on this machine is the closest to the target,
+    keeping the memory cost and parallelism fixed"""
+
+    def measure(time_cost: int) -> float:
+        settings = build_context_settings("argon2", 12, memory_cost, time_cost, parallelism)
+        return _time_hash(settings, samples=1)
+
+    # the cost grows linearly with the time cost, so walk up until we go past the target ===
+    time_cost = 1
+    measured_ms = measure(time_cost)
+
+    while measured_ms < target_ms:
+        next_ms = measure(time_cost + 1)
+
+        if abs(next_ms - target_ms) >= abs(measured_ms - target_ms):
+            break
+
+        time_cost += 1
+        measured_ms = next_ms
+    # ===
+
+    return time_cost
+
+
+def password_context_settings_from_env() -> dict[str, Any]:
+    """Returns the context settings described by the env vars, calibrating the cost of the chosen
+    scheme first when a target hash time is set"""
+
+    scheme = env_vars.PASSWORD_SCHEME
+    bcrypt_rounds = env_vars.BCRYPT_ROUNDS
+    argon2_time_cost = env_vars.ARGON2_TIME_COST
+    target_ms = env_vars.PASSWORD_HASH_TARGET_MS
+
+    if target_ms > 0 and scheme == "bcrypt":
+        bcrypt_rounds = calibrate_bcrypt_rounds(target_ms)
+
+    elif target_ms > 0 and scheme == "argon2":
+        argon2_time_cost = calibrate_argon2_time_cost(
+            target_ms, env_vars.ARGON2_MEMORY_COST, env_vars.ARGON2_PARALLELISM
+        )
+
+    return build_context_settings(
+        scheme=scheme,
+        bcrypt_rounds=bcrypt_rounds,
+        argon2_memory_cost=env_vars.ARGON2_MEMORY_COST,
+        argon2_time_cost=argon2_time_cost,
+        argon2_parallelism=env_vars.ARGON2_PARALLELISM,
+    )
+
+
+# the settings pinned by the gunicorn master, the workers it forks inherit them
+_pinned_settings: Optional[dict[str, Any]] = None
+
+
+def pin_password_hashing() -> dict[str, Any]:
+    """Works out the context settings from the env vars once, calibrating if a target hash time is
+    set, and keeps them for this process and the ones it forks. serve.py calls this before forking
+    so that every worker hashes with the same cost, instead of each worker calibrating while they
+    all compete for the CPUs at boot"""
+
+    global _pinned_settings
+
+    _pinned_settings = password_context_settings_from_env()
+
+    return _pinned_settings
+
+
+async def configure_password_hashing() -> dict[str, Any]:
+    """Configures the password context from the env vars, or with the pinned settings, and returns
+    the settings it used.
+
+    This has to run before the password pool is first used, so that process workers start with the
+    same settings. Calibration takes a few hashes worth of time so it's done off the event loop."""
+
+    settings = _pinned_settings
+
+    if settings is None:
+        settings = await asyncio.to_thread(password_context_settings_from_env)
+
+    configure_password_context(settings)
+
+    return settings
+
+
+class PasswordWorkerPool:
+    """Runs the CPU bound password work on an executor so that it doesn't block the event loop.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more are allowed to wait for a
+    worker, anything past that is rejected with a PasswordPoolSaturatedError instead of growing the
+    backlog without bound."""
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int) -> None:
+        if max_workers < 1:
+            raise ValueError("The password pool needs at least one worker")
+
+        if max_queue < 0:
+            raise ValueError("The password pool queue size can't be negative")
+
+        if kind == "thread":
+            self._executor: concurrent.futures.Executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="password-worker"
+            )
+
+        elif kind == "process":
+            # spawn instead of fork so the workers don't inherit the event loop or driver threads,
+            # the workers then rebuild the password context with the settings in use right now
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_password_context,
+                initargs=(_context_settings,),
+            )
+
+        else:
+            raise ValueError(f"Unknown password pool kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        # counters are updated from the worker threads when a job finishes
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Runs the function on the pool and waits for the result without blocking the loop"""
+
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                metrics.count_shed("password_pool")
+                raise exceptions.PasswordPoolSaturatedError("Password pool queue is full")
+
+            self._pending += 1
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self._pending - self.max_workers)
+            self._observe()
+
+        try:
+            future = self._executor.submit(func, *args)
+
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+                self._submitted -= 1
+                self._observe()
+            raise
+
+        future.add_done_callback(self._job_done)
+
+        # the time waited for a worker counts too, it's part of what hashing costs a request
+        operation = func.__name__.removesuffix("_sync")
+
+        with metrics.timer("password", operation), tracing.span(f"password.{operation}"):
+            return await asyncio.wrap_future(future)
+
+    def _job_done(self, _: Optional[concurrent.futures.Future]) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._observe()
+
+    def _observe(self) -> None:
+        # called with the lock held, so that the gauges are set in the order the counts changed
+        pending = self._pending
+        metrics.observe_password_pool(
+            min(pending, self.max_workers), max(pending - self.max_workers, 0)
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Returns a snapshot of the pool usage, used to expose the queue depth"""
+
+        with self._lock:
+            pending = self._pending
+
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": min(pending, self.max_workers),
+                "queued": max(pending - self.max_workers, 0),
+                "peak_queued": self._peak_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        """Waits for the running jobs to finish and then stops the workers"""
+
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# the pool shared by the whole application, it is created on first use
+_password_pool: Optional[PasswordWorkerPool] = None
+_password_pool_lock = threading.Lock()
+
+
+def get_password_pool() -> PasswordWorkerPool:
+    """Returns the application password pool, creating it from the env vars if needed"""
+
+    global _password_pool
+
+    if _password_pool is None:
+        with _password_pool_lock:
+            if _password_pool is None:
+                _password_pool = PasswordWorkerPool(
+                    kind=env_vars.PASSWORD_POOL_KIND,
+                    max_workers=env_vars.PASSWORD_POOL_SIZE,
+                    max_queue=env_vars.PASSWORD_POOL_MAX_QUEUE,
+                )
+
+    return _password_pool
+
+
+def password_pool_stats() -> Optional[dict[str, Any]]:
+    """Returns the usage of the application password pool, None until it is first used"""
+
+    pool = _password_pool
+
+    return pool.stats() if pool is not None else None
+
+
+def shutdown_password_pool() -> None:
+    """Stops the application password pool if it was ever started"""
+
+    global _password_pool
+
+    with _password_pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown()
+            _password_pool = None
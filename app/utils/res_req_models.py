@@ -1,8 +1,9 @@
 # standard imports
-from typing import Literal
+from typing import Any, Literal
 
 # third party imports
 import pydantic
+from fastapi.responses import ORJSONResponse
 
 # user imports
 
@@ -16,6 +17,30 @@ class UserDetails(pydantic.BaseModel):
     role: Literal["standard", "admin"] | None = "standard"
 
 
+def user_details_from(user: Any) -> UserDetails:
+    """Returns the user details of a user, a view of one or a record of one. What we stored was
+    validated when it was written, so the fields aren't validated again"""
+
+    return UserDetails.construct(
+        username=user.username,
+        email=user.email,
+        disabled=user.disabled,
+        role=user.role,
+    )
+
+
+def user_details_from_claims(claims: dict[str, Any]) -> UserDetails:
+    """Returns the user details carried by a claims-bearing token, which we signed so the fields
+    aren't validated again"""
+
+    return UserDetails.construct(
+        username=claims["username"],
+        email=claims["sub"],
+        disabled=claims["disabled"],
+        role=claims["role"],
+    )
+
+
 class UserCreateStepTwo(pydantic.BaseModel):
     """The model that represents what is expected from the client when completeing their signup"""
 
@@ -68,3 +93,13 @@ class TokenData(pydantic.BaseModel):
     """Model of a decoded token"""
 
     username: str | None = None
+
+
+def model_response(model: pydantic.BaseModel, status_code: int) -> ORJSONResponse:
+    """Returns the response serializing the model as it is.
+
+    FastAPI turns a returned model back into a dict and validates it against the response_model
+    before encoding it, returning a response skips that for models we built from trusted data. The
+    response_model of the route is still what the docs show"""
+
+    return ORJSONResponse(model.dict(), status_code=status_code)
@@ -1,19 +1,16 @@
 # standard imports
-from typing import Optional
+from typing import Any, Optional
 from datetime import datetime, timedelta
 
 # third party imports
 import fastapi
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 # user imports
 import models
 import exceptions
-from utils import res_req_models
-
-# context used for hashing passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import tokens
+from utils import passwords, res_req_models
 
 # tells your endpoints where to go to get a token if a valid token wasn't already
 # provided by the client
@@ -23,21 +20,58 @@ oauth2_scheme = fastapi.security.OAuth2PasswordBearer(tokenUrl="/api/v1/user/tok
 async def hash_password(password: str) -> str:
     """Returns the hashed password"""
 
-    # hashes the password
-    return pwd_context.hash(password)
+    # hashes the password on the password pool so the event loop isn't blocked
+    return await passwords.get_password_pool().run(passwords.hash_password_sync, password)
 
 
 async def validate_password(user: models.User, password: str) -> bool:
     """Returns True if the password matches the password in the database"""
 
-    if not pwd_context.verify(password, user.hashed_password):
+    is_valid = await passwords.get_password_pool().run(
+        passwords.verify_password_sync, password, user.hashed_password
+    )
+
+    if not is_valid:
         return False
 
     return True
 
 
-async def create_token(data: str, expires_in: int, secret: str, algorithm: str) -> str:
-    """Returns a JWT"""
+async def validate_and_rehash_password(
+    user: models.User | models.UserAuthView | models.UserRecord | models.UserAuthRecord,
+    password: str,
+) -> tuple[bool, Optional[str]]:
+    """Returns True if the password matches the password in the database, along with a new hash of
+    the password when the stored one was made with outdated settings"""
+
+    return await passwords.get_password_pool().run(
+        passwords.verify_and_update_password_sync, password, user.hashed_password
+    )
+
+
+def create_user_claims(user: models.User | models.UserRecord) -> dict[str, Any]:
+    """Returns the claims that describe the user in a claims-bearing token.
+
+    `ver` is the users token version, it goes up every time the user changes so that a consumer
+    can tell the claims in a token are out of date."""
+
+    return {
+        "username": user.username,
+        "role": user.role,
+        "disabled": user.disabled,
+        "ver": user.token_version,
+    }
+
+
+async def create_token(
+    data: str,
+    expires_in: int,
+    secret: Optional[str] = None,
+    algorithm: Optional[str] = None,
+    claims: Optional[dict[str, Any]] = None,
+) -> str:
+    """Returns a JWT, any extra claims are signed along with the subject. The token is signed with
+    the application signing key unless a secret and algorithm are provided"""
 
     # create the data to be encoded
     try:
@@ -47,26 +81,45 @@ async def create_token(data: str, expires_in: int, secret: str, algorithm: str)
         raise ValueError("Time to expire not integer")
 
     data_to_encode = {
+        **(claims or {}),
         "sub": data,
         "exp": datetime.utcnow() + access_token_expires,
     }
 
-    # create the access token
+    # create the access token, the application key also stamps its id in the header
     try:
-        return jwt.encode(data_to_encode, secret, algorithm=algorithm)
+        if secret is None:
+            return tokens.get_signing_key().encode(data_to_encode)
+
+        key = tokens.load_secret_key(algorithm, secret)
+        return key.backend.encode(data_to_encode, key.private_key, key.algorithm, None)
 
     except JWTError:
         raise JWTError("Error Creating a JWT")
 
 
-async def get_data_from_jwt(
-    token: res_req_models.TokenData, secret: str, algorithm: str
-) -> Optional[str]:
-    """Return the username of the user in the token"""
+async def get_claims_from_jwt(
+    token: res_req_models.TokenData,
+    secret: Optional[str] = None,
+    algorithm: Optional[str] = None,
+) -> dict[str, Any]:
+    """Return all of the claims in the token, verifying it with the application key named by the
+    token unless a secret and algorithm are provided"""
 
     try:
+        # find the key the token was signed with by the key id in its header
+        if secret is None:
+            header = tokens.get_backend().get_unverified_header(token)
+            key = await tokens.get_verification_key(header.get("kid"))
+
+            if key is None:
+                raise JWTError("Unknown key id")
+
+        else:
+            key = tokens.load_secret_key(algorithm, secret)
+
         # decode the JWT
-        payload = jwt.decode(token, secret, algorithms=algorithm)
+        return key.decode(token)
 
     except jwt.JWTError:
         raise JWTError("Something went wrong when decoding the token")
@@ -77,6 +130,16 @@ async def get_data_from_jwt(
     except jwt.JWTClaimsError:
         raise jwt.JWTClaimsError("Claim was invalid")
 
+
+async def get_data_from_jwt(
+    token: res_req_models.TokenData,
+    secret: Optional[str] = None,
+    algorithm: Optional[str] = None,
+) -> Optional[str]:
+    """Return the username of the user in the token"""
+
+    payload = await get_claims_from_jwt(token, secret, algorithm)
+
     # return the username, if it doesn't exist return None
     data: str = payload.get("sub")
 